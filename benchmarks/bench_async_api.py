@@ -0,0 +1,176 @@
+"""
+Нагрузочный тест: sync-эндпоинты против /api/async/... (AsyncSession + aiosqlite).
+
+Поднимает uvicorn на временной копии БД, затем с заданной конкурентностью
+гоняет одни и те же запросы в обе версии и печатает RPS и p50/p99: чтение
+платежей и сотрудника, запись платежа, правку сотрудника (PUT) и правку
+своей карточки сотрудником. Остальные async-эндпоинты (создание/удаление
+сотрудника, фото, история карточки) устроены так же и здесь не меряются.
+Лимиты классов маршрутов (LoadSheddingMiddleware) на время теста подняты,
+чтобы мерить сами эндпоинты, а не отказ по 503.
+
+    python benchmarks/bench_async_api.py --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+N_PAYMENTS = 300
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare_db(url: str) -> tuple[str, str, int]:
+    """Создаём схему, сотрудника с историей платежей; возвращаем (токен админа, токен сотрудника, id)."""
+    os.environ["LW_DATABASE_URL"] = url
+    import main  # после LW_DATABASE_URL, чтобы движок смотрел во временную БД
+
+    main.init_db()
+    with main.SessionLocal() as db:
+        adm = main.Admin(login="bench-admin", password_hash="x", name="Bench")
+        emp = main.Employee(
+            login="bench-emp",
+            password_hash="x",
+            initials="ББ",
+            name="Bench Employee",
+            position="bench",
+            salary="0 ₽",
+            balance_int=0,
+        )
+        db.add_all([adm, emp])
+        db.flush()
+        db.add_all(
+            main.Payment(employee_id=emp.id, type="bonus", amount=100, comment="seed")
+            for _ in range(N_PAYMENTS)
+        )
+        db.commit()
+        return (
+            main.issue_session_token("admin", adm.id, adm.session_version or 0),
+            main.issue_session_token("employee", emp.id, emp.session_version or 0),
+            emp.id,
+        )
+
+
+async def run_scenario(client, method, url, headers, body, total, concurrency):
+    latencies = []
+    errors = 0
+    queue = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            started = time.perf_counter()
+            try:
+                resp = await client.request(method, url, headers=headers, json=body)
+                ok = resp.status_code == 200
+            except httpx.TransportError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def bench(
+    base: str, token: str, employee_token: str, emp_id: int, total: int, concurrency: int
+) -> None:
+    admin = {"Authorization": f"Bearer {token}"}
+    employee = {"Authorization": f"Bearer {employee_token}"}
+    payment = {"type": "bonus", "amount": 1, "comment": "bench"}
+    scenarios = [
+        ("read  payments", "GET", f"/employees/{emp_id}/payments", admin, None),
+        ("read  employee", "GET", f"/employees/{emp_id}", admin, None),
+        ("write payment ", "POST", f"/employees/{emp_id}/payments", admin, payment),
+        ("write employee", "PUT", f"/employees/{emp_id}", admin, {"position": "bench"}),
+        ("write card    ", "POST", "/employee/card/update", employee, {"skills": ["bench"]}),
+    ]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as client:
+        for name, method, path, headers, body in scenarios:
+            for flavor, prefix in (("sync ", "/api"), ("async", "/api/async")):
+                # прогрев (соединения, кэш страниц SQLite)
+                await run_scenario(client, method, prefix + path, headers, body, concurrency, concurrency)
+                res = await run_scenario(
+                    client, method, prefix + path, headers, body, total, concurrency
+                )
+                print(
+                    f"{name} {flavor}  rps={res['rps']:8.1f}  p50={res['p50_ms']:7.1f} ms  "
+                    f"p99={res['p99_ms']:7.1f} ms  errors={res['errors']}"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp, 'bench.db').as_posix()}"
+        token, employee_token, emp_id = prepare_db(url)
+
+        port = free_port()
+        env = dict(
+            os.environ,
+            LW_DATABASE_URL=url,
+            LW_HASH_WORKERS="0",
+            LW_ACCRUAL_INTERVAL_SEC="3600",
+            LW_LIMIT_AUTH="10000:60",
+            LW_LIMIT_READ="10000:60",
+            LW_LIMIT_WRITE="10000:60",
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+             "--log-level", "warning", "--timeout-keep-alive", "120"],
+            cwd=str(ROOT),
+            env=env,
+        )
+        base = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.time() + 30
+            while True:
+                try:
+                    if httpx.get(base + "/api/health").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.time() > deadline:
+                    raise RuntimeError("uvicorn не поднялся за 30 с")
+                time.sleep(0.2)
+            asyncio.run(
+                bench(base, token, employee_token, emp_id, args.requests, args.concurrency)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
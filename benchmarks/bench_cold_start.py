@@ -0,0 +1,112 @@
+"""
+Холодный старт приложения: импорт main + on_startup.
+
+Два прогона в отдельных процессах:
+  fresh — пустая БД (create_all + все миграции);
+  warm  — та же БД повторно (схема актуальна, миграции не запускаются).
+Печатает время импорта и старта и проверяет, что тяжёлые модули
+(openpyxl, passlib) не загружены при старте. С --max-warm-ms код возврата 1,
+если warm-старт дольше бюджета. Те же проверки в CI — tests/test_startup.py.
+
+    python benchmarks/bench_cold_start.py --runs 5 --max-warm-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.on_startup()
+ready = time.perf_counter()
+main.on_shutdown()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "init_db_ms": main.STARTUP_STATS["init_db_ms"],
+    "migrations": main.STARTUP_STATS["migrations_applied"],
+    "heavy_loaded": [m for m in ("openpyxl", "passlib") if m in sys.modules],
+}))
+"""
+
+
+def run_child(url: str) -> dict:
+    env = dict(
+        os.environ,
+        LW_DATABASE_URL=url,
+        LW_HASH_WORKERS="0",
+        LW_ACCRUAL_INTERVAL_SEC="3600",
+    )
+    env.pop("LW_SEED_DEMO", None)
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=str(ROOT),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure(runs: int) -> tuple[dict, list]:
+    """Один fresh-старт на пустой БД и runs warm-стартов на ней же."""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp, 'cold.db').as_posix()}"
+        fresh = run_child(url)
+        warm = [run_child(url) for _ in range(runs)]
+    return fresh, warm
+
+
+def find_failures(fresh: dict, warm: list, max_warm_ms: Optional[float] = None) -> list:
+    """Нарушения: тяжёлые импорты на старте, повторные миграции, бюджет warm-старта."""
+    failures = []
+    heavy = sorted({m for r in [fresh, *warm] for m in r["heavy_loaded"]})
+    if heavy:
+        failures.append(f"тяжёлые модули загружены при старте: {', '.join(heavy)}")
+    if any(r["migrations"] for r in warm):
+        failures.append("миграции применялись повторно на актуальной схеме")
+    warm_ms = statistics.median(r["import_ms"] + r["startup_ms"] for r in warm)
+    if max_warm_ms is not None and warm_ms > max_warm_ms:
+        failures.append(f"warm-старт {warm_ms:.0f} ms > бюджета {max_warm_ms:.0f} ms")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-warm-ms", type=float, default=None,
+                        help="бюджет import+startup для warm-старта, мс")
+    args = parser.parse_args()
+
+    fresh, warm = measure(args.runs)
+    print(
+        f"fresh  import={fresh['import_ms']:7.1f} ms  startup={fresh['startup_ms']:7.1f} ms  "
+        f"init_db={fresh['init_db_ms']} ms  migrations={fresh['migrations']}"
+    )
+    warm_import = statistics.median(r["import_ms"] for r in warm)
+    warm_startup = statistics.median(r["startup_ms"] for r in warm)
+    print(
+        f"warm   import={warm_import:7.1f} ms  startup={warm_startup:7.1f} ms  "
+        f"init_db={statistics.median(r['init_db_ms'] for r in warm)} ms  "
+        f"migrations={warm[-1]['migrations']}  (медиана из {args.runs})"
+    )
+
+    failures = find_failures(fresh, warm, args.max_warm_ms)
+    for msg in failures:
+        print("FAIL:", msg)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
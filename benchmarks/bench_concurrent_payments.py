@@ -0,0 +1,192 @@
+"""
+Параллельные платежи нескольким сотрудникам: прежний read-modify-write
+баланса в Python против UPDATE ... RETURNING (apply_payment_to_balance).
+
+N потоков, у каждого своя сессия, по K платежей случайному из E «горячих»
+сотрудников через create_payment_for_employee; затем те же потоки удаляют
+половину платежей, причём каждый удаляемый платёж пытаются удалить два
+потока сразу. В конце сверяем balance_int / salary / месяцы с журналом
+платежей (ledger.reconcile). Для atomic код возврата 1 при любом дрейфе.
+
+    python benchmarks/bench_concurrent_payments.py --threads 16 --ops 250
+"""
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import ledger  # noqa: E402
+from main import (  # noqa: E402
+    Base,
+    Employee,
+    Payment,
+    PaymentCreate,
+    build_engine,
+    create_payment_for_employee,
+    delete_payment_for_employee,
+    int_to_money,
+    update_month_stat_on_payment,
+)
+
+AMOUNTS = [100, 250, 1000, -300]
+
+
+def legacy_create(db, emp_id: int, payload: PaymentCreate) -> None:
+    """Прежняя реализация: баланс читается в Python и пишется обратно."""
+    emp = db.get(Employee, emp_id)
+    balance = (emp.balance_int or 0) + payload.amount
+    emp.balance_int = balance
+    emp.salary = int_to_money(balance)
+    payment = Payment(employee_id=emp_id, type=payload.type, amount=payload.amount)
+    db.add(payment)
+    db.flush()
+    update_month_stat_on_payment(db, emp_id, payload.amount, payment.created_at, payload.type)
+    db.commit()
+
+
+def legacy_delete(db, payment_id: int) -> None:
+    payment = db.get(Payment, payment_id)
+    if not payment:
+        raise HTTPException(status_code=404)
+    emp = db.get(Employee, payment.employee_id)
+    balance = (emp.balance_int or 0) - payment.amount
+    emp.balance_int = balance
+    emp.salary = int_to_money(balance)
+    update_month_stat_on_payment(
+        db, emp.id, payment.amount, payment.created_at, payment.type, reverse=True
+    )
+    db.delete(payment)
+    db.commit()
+
+
+def run_parallel(threads: int, target) -> float:
+    started = time.perf_counter()
+    pool = [threading.Thread(target=target, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - started
+
+
+def run(mode: str, url: str, threads: int, ops: int, employees: int) -> bool:
+    engine = build_engine(url, pool_size=threads)
+    Session = sessionmaker(bind=engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Employee),
+            [
+                {
+                    "login": f"hot{i}",
+                    "password_hash": "x",
+                    "initials": "ББ",
+                    "name": f"Hot {i}",
+                    "position": "bench",
+                    "salary": int_to_money(10_000),
+                    "balance_int": 10_000,
+                    "balance_base": 10_000,
+                }
+                for i in range(employees)
+            ],
+        )
+
+    errors = {"create": 0, "delete": 0, "delete_404": 0}
+    lock = threading.Lock()
+
+    def create_worker(n: int) -> None:
+        rnd = random.Random(n)
+        for i in range(ops):
+            emp_id = rnd.randint(1, employees)
+            payload = PaymentCreate(
+                type="salary" if i % 2 == 0 else "bonus", amount=rnd.choice(AMOUNTS)
+            )
+            with Session() as db:
+                try:
+                    if mode == "legacy":
+                        legacy_create(db, emp_id, payload)
+                    else:
+                        create_payment_for_employee(emp_id, payload, admin=None, db=db)
+                except Exception:
+                    db.rollback()
+                    with lock:
+                        errors["create"] += 1
+
+    create_s = run_parallel(threads, create_worker)
+
+    with engine.connect() as conn:
+        ids = conn.execute(select(Payment.id).order_by(Payment.id)).scalars().all()
+    to_delete = ids[::2]
+
+    # потоки 2k и 2k+1 получают один и тот же кусок — каждый платёж удаляют дважды
+    pairs = max(threads // 2, 1)
+    chunks = [to_delete[k::pairs] for k in range(pairs)]
+
+    def delete_worker(n: int) -> None:
+        for payment_id in chunks[min(n // 2, pairs - 1)]:
+            with Session() as db:
+                try:
+                    if mode == "legacy":
+                        legacy_delete(db, payment_id)
+                    else:
+                        delete_payment_for_employee(0, payment_id, admin=None, db=db)
+                except HTTPException:
+                    db.rollback()
+                    with lock:
+                        errors["delete_404"] += 1
+                except Exception:
+                    db.rollback()
+                    with lock:
+                        errors["delete"] += 1
+
+    delete_s = run_parallel(threads, delete_worker)
+
+    report = ledger.reconcile(engine, sample=3)
+    with engine.connect() as conn:
+        payments_left = conn.execute(select(Payment.id)).all()
+    engine.dispose()
+
+    created = threads * ops - errors["create"]
+    drift = (
+        report["balance_drift_count"],
+        report["salary_text_drift_count"],
+        report["month_drift_count"],
+    )
+    print(
+        f"{mode:7} create {created / create_s:7.1f} оп/с  delete {len(to_delete) / delete_s:7.1f} оп/с  "
+        f"платежей осталось {len(payments_left)}  ошибки {errors}  "
+        f"дрейф balance/salary/month {drift}  сумма дрейфа {report['balance_drift_total']}"
+    )
+    return drift == (0, 0, 0) and errors["create"] == 0 and errors["delete"] == 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=250)
+    parser.add_argument("--employees", type=int, default=4)
+    args = parser.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("legacy", "atomic"):
+            url = f"sqlite:///{Path(tmp, mode + '.db').as_posix()}"
+            result = run(mode, url, args.threads, args.ops, args.employees)
+            if mode == "atomic":
+                ok = result
+    if not ok:
+        print("FAIL: atomic потерял платежи или баланс разошёлся с журналом")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
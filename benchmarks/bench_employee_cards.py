@@ -0,0 +1,146 @@
+"""
+Карточка сотрудника: employee_cards.json целиком против строки в таблице.
+
+Во временной базе E сотрудников с карточками в JSON-файле (как до
+миграции 5). Меряем чтение и правку одной карточки старым способом
+(json.load всего файла / json.dump всего файла с indent=2) и после
+миграций 5-6 (load_employee_card / apply_employee_card_update — одна строка
+карточки и последние правки из журнала employee_card_events).
+Проверяем, что миграции перенесли все карточки и всю историю без потерь.
+Код возврата 1, если данные разошлись.
+
+    python benchmarks/bench_employee_cards.py --employees 5000
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import migrations  # noqa: E402
+from main import (  # noqa: E402
+    Base,
+    Employee,
+    EmployeeCardEvent,
+    EmployeeSelfCardUpdateRequest,
+    apply_employee_card_update,
+    build_engine,
+    int_to_money,
+    load_employee_card,
+)
+
+
+def make_card(i: int) -> dict:
+    return {
+        "responsibilities": [f"участок {i % 40}", "приёмка", "отгрузка"],
+        "skills": [f"навык {j}" for j in range(i % 6)],
+        "roles": ["старший смены"] if i % 10 == 0 else [],
+        "history": [
+            {"timestamp": "2025-12-09T12:26:54", "field": "skills", "old": [], "new": [f"навык {j}"]}
+            for j in range(i % 6)
+        ],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = Path(tmp, "employee_cards.json")
+        cards = {str(i + 1): make_card(i + 1) for i in range(args.employees)}
+        legacy_path.write_text(json.dumps(cards, ensure_ascii=False, indent=2), encoding="utf-8")
+        size_kb = legacy_path.stat().st_size // 1024
+
+        # до миграции: каждый запрос читает (и при правке — переписывает) весь файл
+        started = time.perf_counter()
+        for n in range(args.requests):
+            with legacy_path.open("r", encoding="utf-8") as f:
+                json.load(f).get(str(n % args.employees + 1))
+        legacy_read = (time.perf_counter() - started) / args.requests * 1000
+        started = time.perf_counter()
+        for n in range(args.requests):
+            with legacy_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            data[str(n % args.employees + 1)]["skills"] = [f"правка {n}"]
+            with legacy_path.open("w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        legacy_write = (time.perf_counter() - started) / args.requests * 1000
+        legacy_path.write_text(json.dumps(cards, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        engine = build_engine(f"sqlite:///{Path(tmp, 'cards.db').as_posix()}")
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                insert(Employee),
+                [
+                    {
+                        "login": f"card{i}",
+                        "password_hash": "x",
+                        "initials": "ББ",
+                        "name": f"Card {i}",
+                        "position": "bench",
+                        "salary": int_to_money(0),
+                        "balance_int": 0,
+                    }
+                    for i in range(args.employees)
+                ],
+            )
+        migrations.LEGACY_EMPLOYEE_CARDS_JSON = legacy_path
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            migrations._m005_employee_cards_table(conn)
+            migrations._m006_employee_card_events(conn)
+        migrate_s = time.perf_counter() - started
+
+        Session = sessionmaker(autoflush=False, bind=engine)
+        with Session() as db:
+            fields = ("responsibilities", "skills", "roles")
+            migrated_ok = all(
+                {f: extra[f] for f in fields} == {f: card[f] for f in fields}
+                # старые правки make_card — только добавления: new целиком уходит в added
+                and extra["history"][-1:] == [
+                    {"timestamp": e["timestamp"], "field": e["field"], "added": e["new"], "removed": []}
+                    for e in card["history"][-1:]
+                ]
+                for key, card in cards.items()
+                for extra in [load_employee_card(db, int(key))]
+            )
+            events = db.execute(select(func.count()).select_from(EmployeeCardEvent)).scalar()
+            migrated_ok = migrated_ok and events == sum(len(c["history"]) for c in cards.values())
+
+            started = time.perf_counter()
+            for n in range(args.requests):
+                load_employee_card(db, n % args.employees + 1)
+            table_read = (time.perf_counter() - started) / args.requests * 1000
+
+            started = time.perf_counter()
+            for n in range(args.requests):
+                apply_employee_card_update(
+                    db, n % args.employees + 1, EmployeeSelfCardUpdateRequest(skills=[f"правка {n}"])
+                )
+                db.commit()
+            table_write = (time.perf_counter() - started) / args.requests * 1000
+            # последняя правка сотрудника 1 — запрос с наибольшим n, кратным числу сотрудников
+            last = (args.requests - 1) // args.employees * args.employees
+            updated_ok = load_employee_card(db, 1)["skills"] == [f"правка {last}"]
+        engine.dispose()
+
+    print(f"{args.employees} карточек, JSON {size_kb} КБ; миграция {migrate_s:.2f} с, перенесено без потерь: {migrated_ok}")
+    print(f"чтение:  JSON {legacy_read:8.2f} мс  таблица {table_read:6.2f} мс")
+    print(f"правка:  JSON {legacy_write:8.2f} мс  таблица {table_write:6.2f} мс")
+    ok = migrated_ok and updated_ok
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
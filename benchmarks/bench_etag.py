@@ -0,0 +1,127 @@
+"""
+Условные запросы: полный ответ против 304 по If-None-Match.
+
+Временная база (LW_DATABASE_URL) с E сотрудниками и P платежами у одного
+из них; приложение поднимается через TestClient (init_db + миграции, в том
+числе триггеры row_version). Для списка сотрудников, карточки сотрудника и
+страницы платежей меряем среднее время ответа 200 и 304. Затем проверяем,
+что запись любым путём (ORM, Core-UPDATE мимо ORM, новый платёж) меняет
+ETag. Код возврата 1, если 304 пришёл на изменённые данные.
+
+    python benchmarks/bench_etag.py --employees 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def timed(client, repeat: int, method: str, url: str, **kwargs):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        response = client.request(method, url, **kwargs)
+    return response, (time.perf_counter() - started) / repeat * 1000
+
+
+def main_bench() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=5000)
+    parser.add_argument("--payments", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["LW_DATABASE_URL"] = f"sqlite:///{Path(tmp.name, 'etag.db').as_posix()}"
+    os.environ.setdefault("LW_SEED_DEMO", "1")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert, select, update
+
+    import main
+    from main import Employee, Payment, engine, int_to_money
+
+    ok = True
+    with TestClient(main.app) as client:
+        with engine.begin() as conn:
+            conn.execute(
+                insert(Employee),
+                [
+                    {
+                        "login": f"etag{i}",
+                        "password_hash": "x",
+                        "initials": "ББ",
+                        "name": f"Etag {i}",
+                        "position": "bench",
+                        "salary": int_to_money(0),
+                        "balance_int": 0,
+                    }
+                    for i in range(args.employees)
+                ],
+            )
+            emp_id = conn.execute(select(Employee.id).where(Employee.login == "ivan")).scalar()
+            conn.execute(
+                insert(Payment),
+                [{"employee_id": emp_id, "type": "bonus", "amount": 10} for _ in range(args.payments)],
+            )
+
+        token = client.post(
+            "/api/login", json={"role": "admin", "login": "admin", "password": "admin123"}
+        ).json()["token"]
+        admin = {"Authorization": "Bearer " + token}
+        # карточка — по токену: иначе время съедает argon2 на проверке пароля
+        employee_token = client.post(
+            "/api/login", json={"role": "employee", "login": "ivan", "password": "1234"}
+        ).json()["token"]
+        employee = {"headers": {"Authorization": "Bearer " + employee_token}, "json": {}}
+        cases = [
+            ("список сотрудников", "GET", "/api/employees", {"headers": admin}),
+            ("сотрудник", "GET", f"/api/employees/{emp_id}", {"headers": admin}),
+            ("платежи, 200 шт.", "GET", f"/api/employees/{emp_id}/payments?limit=200", {"headers": admin}),
+            ("карточка (POST)", "POST", "/api/employee/card", employee),
+        ]
+        etags = {}
+        for label, method, url, kwargs in cases:
+            full, full_ms = timed(client, args.repeat, method, url, **kwargs)
+            etag = full.headers["etag"]
+            headers = {**kwargs.get("headers", {}), "If-None-Match": etag}
+            cached, cached_ms = timed(
+                client, args.repeat, method, url, **{**kwargs, "headers": headers}
+            )
+            etags[url] = etag
+            print(
+                f"{label:20} 200: {full_ms:7.2f} мс, {len(full.content):8} байт   "
+                f"304: {cached_ms:6.2f} мс  ({cached.status_code})"
+            )
+            ok = ok and cached.status_code == 304
+
+        def changed(method, url, kwargs) -> bool:
+            headers = {**kwargs.get("headers", {}), "If-None-Match": etags[url]}
+            response = client.request(method, url, **{**kwargs, "headers": headers})
+            etags[url] = response.headers.get("etag")
+            return response.status_code == 200
+
+        # Core-UPDATE мимо ORM — как фоновое начисление и пачки платежей
+        with engine.begin() as conn:
+            conn.execute(update(Employee).where(Employee.id == emp_id).values(balance_int=Employee.balance_int + 1))
+        core_ok = changed(*cases[1][1:]) and changed(*cases[0][1:])
+        # новый платёж — страница платежей и сам сотрудник (баланс)
+        client.post(f"/api/employees/{emp_id}/payments", headers=admin, json={"type": "bonus", "amount": 5})
+        payment_ok = changed(*cases[2][1:]) and changed(*cases[1][1:])
+        # правка карточки — только карточка, список платежей прежний
+        client.post("/api/employee/card/update", headers=employee["headers"], json={"skills": ["x"]})
+        card_ok = changed(*cases[3][1:]) and not changed(*cases[2][1:])
+        print(f"ETag меняется: Core-UPDATE {core_ok}, платёж {payment_ok}, карточка {card_ok}")
+        ok = ok and core_ok and payment_ok and card_ok
+
+    engine.dispose()
+    tmp.cleanup()
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
@@ -0,0 +1,159 @@
+"""
+Параллельные платежи в один месяц: прежний SELECT + income += delta против
+INSERT ... ON CONFLICT DO UPDATE (update_month_stat_on_payment).
+
+N потоков, у каждого своя сессия, по K платежей (чётные — salary) одному
+сотруднику в один месяц, коммит после каждого. В конце сверяем income и
+salary с ожидаемыми суммами и считаем строки месяца. Для legacy ждём
+потерянные приращения/дубли; для upsert код возврата 1, если что-то потеряно.
+
+    python benchmarks/bench_month_stat_upsert.py --threads 8 --ops 200
+
+Проверка upsert в CI — tests/test_month_stat_upsert.py.
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, func, select  # noqa: E402
+from sqlalchemy.orm import registry, sessionmaker  # noqa: E402
+
+from main import (  # noqa: E402
+    MONTH_META,
+    EmployeeMonthStat,
+    build_engine,
+    update_month_stat_on_payment,
+)
+
+EMP_ID = 1
+MOMENT = datetime(2025, 3, 15, 12, 0)
+
+
+def legacy_update(db, emp_id, amount, created_at, payment_type):
+    """Прежняя реализация: прочитать строку, при отсутствии вставить, += в Python."""
+    stat = (
+        db.query(LegacyStat)
+        .filter_by(employee_id=emp_id, year=created_at.year, month=created_at.month)
+        .first()
+    )
+    if not stat:
+        stat = LegacyStat(
+            employee_id=emp_id,
+            year=created_at.year,
+            month=created_at.month,
+            month_key=MONTH_META[created_at.month]["key"],
+            income=0,
+            salary=0,
+        )
+        db.add(stat)
+        db.flush()
+    stat.income = (stat.income or 0) + amount
+    if payment_type == "salary":
+        stat.salary = (stat.salary or 0) + amount
+
+
+# та же таблица, но без уникального индекса — как было до миграции
+legacy_metadata = MetaData()
+legacy_table = Table(
+    "legacy_month_stats",
+    legacy_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("employee_id", Integer, nullable=False),
+    Column("year", Integer, nullable=False),
+    Column("month", Integer, nullable=False),
+    Column("month_key", String(8), nullable=False),
+    Column("income", Integer, nullable=False, default=0),
+    Column("salary", Integer),
+)
+
+
+class LegacyStat:
+    pass
+
+
+def run(mode: str, url: str, threads: int, ops: int) -> bool:
+    engine = build_engine(url, pool_size=threads)
+    Session = sessionmaker(bind=engine)
+    if mode == "legacy":
+        legacy_metadata.create_all(engine)
+    else:
+        EmployeeMonthStat.metadata.create_all(engine, tables=[EmployeeMonthStat.__table__])
+
+    errors = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal errors
+        for i in range(ops):
+            payment_type = "salary" if i % 2 == 0 else "bonus"
+            with Session() as db:
+                try:
+                    if mode == "legacy":
+                        legacy_update(db, EMP_ID, 10, MOMENT, payment_type)
+                    else:
+                        update_month_stat_on_payment(db, EMP_ID, 10, MOMENT, payment_type)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    with lock:
+                        errors += 1
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    table = legacy_table if mode == "legacy" else EmployeeMonthStat.__table__
+    with engine.connect() as conn:
+        rows, income, salary = conn.execute(
+            select(func.count(), func.sum(table.c.income), func.sum(table.c.salary)).where(
+                table.c.employee_id == EMP_ID
+            )
+        ).one()
+    engine.dispose()
+
+    total = threads * ops
+    committed = total - errors
+    expected_income = committed * 10
+    # при ошибках неизвестно, какие из упавших были salary
+    expected_salary = threads * ((ops + 1) // 2) * 10 if not errors else None
+    lost = expected_income - (income or 0)
+    print(
+        f"{mode:7} ops/s={total / elapsed:8.1f}  rows={rows}  income={income} (ожидалось {expected_income}, "
+        f"потеряно {lost // 10} платежей)  salary={salary}"
+        f"{'' if expected_salary is None else f' (ожидалось {expected_salary})'}  errors={errors}"
+    )
+    return rows == 1 and lost == 0 and (expected_salary is None or salary == expected_salary)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200)
+    args = parser.parse_args()
+
+    registry().map_imperatively(LegacyStat, legacy_table)
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("legacy", "upsert"):
+            url = f"sqlite:///{Path(tmp, mode + '.db').as_posix()}"
+            result = run(mode, url, args.threads, args.ops)
+            if mode == "upsert":
+                ok = result
+    if not ok:
+        print("FAIL: upsert потерял приращения или создал дубли")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Одновременный старт нескольких воркеров на пустой БД (как uvicorn --workers N).
+
+Каждый процесс импортирует main и выполняет on_startup с LW_SEED_DEMO=1.
+Проверяется, что все поднялись без ошибок, миграции применил ровно один,
+версии схемы записаны по одному разу, демо-данные не задублированы.
+Печатает время до готовности каждого воркера; код возврата 1 при нарушении.
+Те же проверки в CI — tests/test_startup.py.
+
+    python benchmarks/bench_multiworker_startup.py --workers 4
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.on_startup()
+ready = time.perf_counter()
+main.on_shutdown()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "migrations": main.STARTUP_STATS["migrations_applied"],
+    "lock_wait_ms": main.LOCK_STATS["wait_ms"],
+}))
+"""
+
+
+def run_workers(workers: int) -> tuple[list, list, list]:
+    """
+    Стартует workers процессов на одной пустой БД.
+    Возвращает (результаты воркеров, версии схемы, нарушения).
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = Path(tmp, "multi.db")
+        env = dict(
+            os.environ,
+            LW_DATABASE_URL=f"sqlite:///{db_file.as_posix()}",
+            LW_SEED_DEMO="1",
+            LW_HASH_WORKERS="0",
+            LW_ACCRUAL_INTERVAL_SEC="3600",
+        )
+        procs = [
+            subprocess.Popen(
+                [sys.executable, "-c", CHILD],
+                cwd=str(ROOT),
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            for _ in range(workers)
+        ]
+        results = []
+        for i, proc in enumerate(procs):
+            out, err = proc.communicate(timeout=300)
+            if proc.returncode != 0:
+                failures.append(f"воркер {i} упал:\n{err.strip().splitlines()[-1]}")
+                continue
+            results.append(json.loads(out.strip().splitlines()[-1]))
+
+        conn = sqlite3.connect(db_file)
+        try:
+            versions = [row[0] for row in conn.execute("SELECT version FROM schema_version")]
+            demo = conn.execute(
+                "SELECT login, COUNT(*) FROM employees WHERE login IN ('ivan', 'anna') GROUP BY login"
+            ).fetchall()
+            admins = conn.execute(
+                "SELECT login, COUNT(*) FROM admins WHERE login IN ('admin', 'manager') GROUP BY login"
+            ).fetchall()
+            month_rows = conn.execute("SELECT COUNT(*) FROM employee_month_stats").fetchone()[0]
+        finally:
+            conn.close()
+
+    migrating = [r for r in results if r["migrations"]]
+    if len(migrating) != 1:
+        failures.append(f"миграции применили {len(migrating)} воркеров, ожидался 1")
+    if len(versions) != len(set(versions)):
+        failures.append(f"версии схемы задублированы: {versions}")
+    for login, count in [*demo, *admins]:
+        if count != 1:
+            failures.append(f"{login}: {count} записей")
+    if month_rows != 12:
+        failures.append(f"помесячной статистики {month_rows} строк, ожидалось 12")
+    return results, versions, failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    results, versions, failures = run_workers(args.workers)
+    for i, res in enumerate(results):
+        print(
+            f"worker {i}: import={res['import_ms']:7.1f} ms  startup={res['startup_ms']:7.1f} ms  "
+            f"lock_wait={res['lock_wait_ms']:7.1f} ms  migrations={res['migrations']}"
+        )
+    for msg in failures:
+        print("FAIL:", msg)
+    if not failures:
+        print("OK: схема", versions, "демо-данные без дублей")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
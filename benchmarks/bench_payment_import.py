@@ -0,0 +1,150 @@
+"""
+Массовый импорт платежей (import_payments_from_file) на больших файлах.
+
+Во временной базе E сотрудников; генерируем CSV и XLSX по R строк, из них
+каждая bad_every-я — с ошибкой (неизвестный сотрудник / тип / сумма).
+Меряем время импорта, сверяем число импортированных строк и ошибок,
+а после — балансы и месяцы с журналом платежей (ledger.reconcile).
+Код возврата 1, если что-то не сошлось.
+
+    python benchmarks/bench_payment_import.py --rows 100000
+"""
+import argparse
+import csv
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import ledger  # noqa: E402
+from main import (  # noqa: E402
+    Base,
+    Employee,
+    Payment,
+    build_engine,
+    import_payments_from_file,
+    int_to_money,
+)
+
+HEADER = ["employee_id", "login", "type", "amount", "comment", "date"]
+TYPES = ["salary", "bonus", "overtime", "night", "fine", "other"]
+
+
+def generate_rows(n_rows: int, n_employees: int, bad_every: int):
+    rnd = random.Random(7)
+    start = datetime(2025, 1, 1)
+    bad = 0
+    rows = []
+    for i in range(n_rows):
+        emp = rnd.randint(1, n_employees)
+        kind = rnd.choice(TYPES)
+        amount = rnd.randint(100, 5000) * (-1 if kind == "fine" else 1)
+        day = start + timedelta(days=rnd.randrange(365))
+        row = [emp, "", kind, amount, f"корректировка {i}", day.strftime("%Y-%m-%d")]
+        if i % 2:
+            # половина строк — по логину
+            row[0], row[1] = "", f"imp{emp}"
+        if bad_every and i % bad_every == bad_every - 1:
+            bad += 1
+            row[[0, 2, 3][bad % 3]] = ["99999999", "premium", "12,5"][bad % 3]
+            if bad % 3 == 0:
+                row[0], row[1] = "99999999", ""
+        rows.append(row)
+    return rows, bad
+
+
+def write_csv(path: Path, rows) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def write_xlsx(path: Path, rows) -> None:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(HEADER)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def run(label: str, path: Path, url: str, n_employees: int, expected_ok: int, expected_bad: int) -> bool:
+    engine = build_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Employee),
+            [
+                {
+                    "login": f"imp{i + 1}",
+                    "password_hash": "x",
+                    "initials": "ББ",
+                    "name": f"Import {i + 1}",
+                    "position": "bench",
+                    "salary": int_to_money(1000),
+                    "balance_int": 1000,
+                    "balance_base": 1000,
+                }
+                for i in range(n_employees)
+            ],
+        )
+
+    with sessionmaker(bind=engine)() as db, path.open("rb") as f:
+        started = time.perf_counter()
+        report = import_payments_from_file(db, f, path.name)
+        elapsed = time.perf_counter() - started
+
+    drift = ledger.reconcile(engine, sample=3)
+    with engine.connect() as conn:
+        stored = conn.execute(select(func.count()).select_from(Payment)).scalar()
+    engine.dispose()
+
+    counts = (
+        drift["balance_drift_count"],
+        drift["salary_text_drift_count"],
+        drift["month_drift_count"],
+    )
+    print(
+        f"{label:4} {report['rows']} строк за {elapsed:6.2f} с ({report['rows'] / elapsed:8.0f} строк/с)  "
+        f"импортировано {report['imported']} (в БД {stored})  ошибок {report['error_count']}  "
+        f"дрейф {counts}"
+    )
+    return (
+        report["imported"] == expected_ok == stored
+        and report["error_count"] == expected_bad
+        and counts == (0, 0, 0)
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--bad-every", type=int, default=1000)
+    args = parser.parse_args()
+
+    rows, bad = generate_rows(args.rows, args.employees, args.bad_every)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {"csv": Path(tmp, "payments.csv"), "xlsx": Path(tmp, "payments.xlsx")}
+        write_csv(files["csv"], rows)
+        write_xlsx(files["xlsx"], rows)
+        for label, path in files.items():
+            url = f"sqlite:///{Path(tmp, label + '.db').as_posix()}"
+            ok = run(label, path, url, args.employees, args.rows - bad, bad) and ok
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Бенчмарк векторного прогноза начислений (payroll_projection.py).
+
+Синтетика: N сотрудников с разными окнами смен и складами, последнее
+начисление — до 60 дней назад, прогноз до конца следующего месяца.
+Сравнивается с поштучным расчётом через WorkCalendar.working_hours_between.
+
+    python benchmarks/bench_payroll_projection.py --employees 100000
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from payroll_projection import project_payroll  # noqa: E402
+from work_calendar import load_work_calendar  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=100_000)
+    parser.add_argument("--loop-sample", type=int, default=10_000,
+                        help="сколько сотрудников считать поштучно для сравнения")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    n = args.employees
+    calendar = load_work_calendar()
+    now = datetime(2026, 10, 17, 12)
+    until = datetime(2026, 12, 1)
+    warehouses = [f"Склад №{i}" for i in range(1, 21)]
+
+    balances = rng.integers(0, 200_000, n)
+    rates = rng.integers(300, 900, n)
+    windows = np.array([(8, 17), (8, 19), (9, 18), (20, 8), (22, 6)])
+    window = windows[rng.integers(0, len(windows), n)]
+    warehouse_idx = rng.integers(0, len(warehouses), n)
+    starts = np.datetime64(now, "h") - rng.integers(0, 60 * 24, n).astype("timedelta64[h]")
+
+    started = time.perf_counter()
+    result = project_payroll(
+        calendar, balances, rates, starts, np.datetime64(until, "h"),
+        window[:, 0], window[:, 1], warehouse_idx, warehouses,
+    )
+    vector_s = time.perf_counter() - started
+
+    sample = min(args.loop_sample, n)
+    started = time.perf_counter()
+    loop_hours = []
+    for i in range(sample):
+        start = starts[i].astype(datetime)
+        loop_hours.append(
+            calendar.working_hours_between(
+                start, until, int(window[i, 0]), int(window[i, 1]), warehouses[warehouse_idx[i]]
+            )
+        )
+    loop_s = (time.perf_counter() - started) * n / sample
+
+    assert loop_hours == result["hours"][:sample].tolist(), "векторный расчёт разошёлся с поштучным"
+    print(f"employees:           {n}")
+    print(f"vectorized:          {vector_s * 1000:.1f} ms")
+    print(f"per-employee loop:   {loop_s * 1000:.1f} ms (экстраполяция по {sample})")
+    print(f"projected accrual:   {int(result['accrual'].sum()):,} ₽")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Ведомость на всех сотрудников: N вызовов create_payment_for_employee против
+одного run_payroll (apply_payment_chunk в одной транзакции).
+
+Во временной базе E активных сотрудников со shift_rate. Меряем обе схемы,
+затем проверяем «всё или ничего»:
+  - lines с несуществующим сотрудником — 400, в базе ничего не меняется;
+  - сбой после записи пачки (подменённый apply_payment_chunk) — откат целиком.
+После всех прогонов балансы и месяцы сверяются с журналом (ledger.reconcile).
+Код возврата 1, если что-то не так.
+
+    python benchmarks/bench_payroll_run.py --employees 2000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import ledger  # noqa: E402
+import main  # noqa: E402
+from main import (  # noqa: E402
+    Base,
+    Employee,
+    Payment,
+    PaymentCreate,
+    PayrollRunLine,
+    PayrollRunRequest,
+    build_engine,
+    create_payment_for_employee,
+    int_to_money,
+    run_payroll,
+)
+
+
+def state(engine) -> tuple:
+    with engine.connect() as conn:
+        payments = conn.execute(select(func.count()).select_from(Payment)).scalar()
+        balances = conn.execute(select(func.sum(Employee.balance_int))).scalar()
+    return payments, balances
+
+
+def main_bench() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--shifts", type=int, default=20)
+    args = parser.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{Path(tmp, 'run.db').as_posix()}")
+        Session = sessionmaker(bind=engine)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                insert(Employee),
+                [
+                    {
+                        "login": f"run{i}",
+                        "password_hash": "x",
+                        "initials": "ББ",
+                        "name": f"Run {i}",
+                        "position": "bench",
+                        "warehouse": f"Склад {i % 3 + 1}",
+                        "shift_role": "loader" if i % 2 else "receiver",
+                        "shift_rate": 1800 + i % 5 * 100,
+                        "salary": int_to_money(0),
+                        "balance_int": 0,
+                    }
+                    for i in range(args.employees)
+                ],
+            )
+            rows = conn.execute(select(Employee.id, Employee.shift_rate)).all()
+
+        # 1) по одному платежу на сотрудника — как N HTTP-запросов
+        started = time.perf_counter()
+        for row in rows:
+            with Session() as db:
+                create_payment_for_employee(
+                    row.id,
+                    PaymentCreate(type="salary", amount=row.shift_rate * args.shifts),
+                    admin=None,
+                    db=db,
+                )
+        single_s = time.perf_counter() - started
+
+        # 2) одна ведомость
+        with Session() as db:
+            started = time.perf_counter()
+            summary = run_payroll(
+                PayrollRunRequest(type="salary", rule="shift_rate", shifts=args.shifts),
+                admin=None,
+                db=db,
+            )
+            run_s = time.perf_counter() - started
+        print(f"по одному: {len(rows)} платежей за {single_s:6.2f} с")
+        print(f"ведомость: {summary['employees']} платежей за {run_s:6.2f} с "
+              f"(x{single_s / run_s:.0f}), итого {summary['total']}")
+        ok = ok and summary["employees"] == len(rows)
+
+        # 3) «всё или ничего»: плохая строка в lines
+        before = state(engine)
+        with Session() as db:
+            try:
+                run_payroll(
+                    PayrollRunRequest(
+                        type="bonus",
+                        lines=[
+                            PayrollRunLine(employee_id=rows[0].id, amount=500),
+                            PayrollRunLine(employee_id=10**9, amount=500),
+                        ],
+                    ),
+                    admin=None,
+                    db=db,
+                )
+                rejected = False
+            except HTTPException as exc:
+                rejected = exc.status_code == 400
+        unchanged = state(engine) == before
+        print(f"плохая строка: отклонено={rejected}, база не изменилась={unchanged}")
+        ok = ok and rejected and unchanged
+
+        # 4) сбой после записи пачки — откат всей ведомости
+        original = main.apply_payment_chunk
+
+        def failing_chunk(db, payments):
+            original(db, payments)
+            raise RuntimeError("сбой посреди ведомости")
+
+        main.apply_payment_chunk = failing_chunk
+        try:
+            with Session() as db:
+                try:
+                    run_payroll(
+                        PayrollRunRequest(type="bonus", rule="fixed", amount=1000),
+                        admin=None,
+                        db=db,
+                    )
+                    failed = False
+                except RuntimeError:
+                    failed = True
+        finally:
+            main.apply_payment_chunk = original
+        unchanged = state(engine) == before
+        print(f"сбой в транзакции: исключение={failed}, база не изменилась={unchanged}")
+        ok = ok and failed and unchanged
+
+        report = ledger.reconcile(engine, sample=3)
+        drift = (report["balance_drift_count"], report["month_drift_count"])
+        print(f"дрейф balance/month {drift}")
+        ok = ok and drift == (0, 0)
+        engine.dispose()
+
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
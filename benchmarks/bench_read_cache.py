@@ -0,0 +1,102 @@
+"""
+Кэш read-моделей: сотрудник в админке и карточка сотрудника — из БД
+против READ_CACHE.
+
+Временная база (LW_DATABASE_URL) с P платежами у одного сотрудника.
+Меряем среднее время GET /api/employees/{id} и POST /api/employee/card при
+выключенном кэше (max_entries = 0) и при включённом. Затем проверяем, что
+запись через API (платёж, правка сотрудника, правка карточки) и Core-UPDATE
+мимо API не оставляют в кэше старых данных. Код возврата 1, если из кэша
+пришли устаревшие данные.
+
+    python benchmarks/bench_read_cache.py --payments 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def timed(client, repeat: int, method: str, url: str, **kwargs):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        response = client.request(method, url, **kwargs)
+    return response, (time.perf_counter() - started) / repeat * 1000
+
+
+def main_bench() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payments", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["LW_DATABASE_URL"] = f"sqlite:///{Path(tmp.name, 'read_cache.db').as_posix()}"
+    os.environ.setdefault("LW_SEED_DEMO", "1")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert, select, update
+
+    import main
+    from main import READ_CACHE, Employee, Payment, engine
+
+    ok = True
+    with TestClient(main.app) as client:
+        with engine.begin() as conn:
+            emp_id = conn.execute(select(Employee.id).where(Employee.login == "ivan")).scalar()
+            conn.execute(
+                insert(Payment),
+                [{"employee_id": emp_id, "type": "bonus", "amount": 10} for _ in range(args.payments)],
+            )
+
+        token = client.post(
+            "/api/login", json={"role": "admin", "login": "admin", "password": "admin123"}
+        ).json()["token"]
+        admin = {"Authorization": "Bearer " + token}
+        employee_token = client.post(
+            "/api/login", json={"role": "employee", "login": "ivan", "password": "1234"}
+        ).json()["token"]
+        employee = {"Authorization": "Bearer " + employee_token}
+        cases = [
+            ("сотрудник", "GET", f"/api/employees/{emp_id}", {"headers": admin}),
+            ("карточка (POST)", "POST", "/api/employee/card", {"headers": employee, "json": {}}),
+        ]
+
+        size = READ_CACHE.max_entries
+        for label, method, url, kwargs in cases:
+            READ_CACHE.max_entries = 0
+            cold, cold_ms = timed(client, args.repeat, method, url, **kwargs)
+            READ_CACHE.max_entries = size
+            warm, warm_ms = timed(client, args.repeat, method, url, **kwargs)
+            print(f"{label:16} БД: {cold_ms:6.2f} мс   кэш: {warm_ms:6.2f} мс")
+            ok = ok and cold.json() == warm.json()
+        print(f"read_cache: {READ_CACHE.stats()}")
+
+        detail = lambda: client.get(cases[0][2], headers=admin).json()  # noqa: E731
+        card = lambda: client.post(cases[1][2], headers=employee, json={}).json()  # noqa: E731
+        before = detail()
+        client.post(f"/api/employees/{emp_id}/payments", headers=admin, json={"type": "bonus", "amount": 5})
+        payment_ok = detail()["salary"] != before["salary"]
+        client.put(f"/api/employees/{emp_id}", headers=admin, json={"position": "кэш 1"})
+        put_ok = detail()["position"] == "кэш 1"
+        # Core-UPDATE мимо API — ловится по row_version, без явного сброса
+        with engine.begin() as conn:
+            conn.execute(update(Employee).where(Employee.id == emp_id).values(position="кэш 2"))
+        core_ok = detail()["position"] == "кэш 2"
+        client.post("/api/employee/card/update", headers=employee, json={"skills": ["кэш"]})
+        card_ok = card()["skills"] == ["кэш"]
+        print(f"свежие данные: платёж {payment_ok}, правка {put_ok}, Core-UPDATE {core_ok}, карточка {card_ok}")
+        ok = ok and payment_ok and put_ok and core_ok and card_ok
+
+    engine.dispose()
+    tmp.cleanup()
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
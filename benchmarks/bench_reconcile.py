@@ -0,0 +1,171 @@
+"""
+Сверка и починка балансов на большом журнале платежей (ledger.py).
+
+Во временной базе: E сотрудников, P платежей за год, согласованные balance_int /
+salary / помесячная статистика. Меряем:
+  1) reconcile на чистых данных — дрейфа быть не должно;
+  2) портим D балансов, D месяцев и удаляем D строк месяцев;
+  3) reconcile находит ровно их, repair чинит, повторный reconcile — ноль.
+Код возврата 1, если что-то из этого не так.
+
+    python benchmarks/bench_reconcile.py --payments 1000000 --drift 500
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import insert, text  # noqa: E402
+
+import ledger  # noqa: E402
+from main import (  # noqa: E402
+    Base,
+    Employee,
+    build_engine,
+    int_to_money,
+    month_key_for,
+)
+
+PAYMENT_TYPES = ["salary", "salary", "bonus", "overtime", "fine"]
+
+
+def seed(engine, n_employees: int, n_payments: int, chunk: int = 100_000) -> None:
+    Base.metadata.create_all(engine)
+    rnd = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Employee),
+            [
+                {
+                    "login": f"bench{i}",
+                    "password_hash": "x",
+                    "initials": "ББ",
+                    "name": f"Bench {i}",
+                    "position": "bench",
+                    "balance_int": 0,
+                    "balance_base": rnd.randint(0, 50_000),
+                }
+                for i in range(n_employees)
+            ],
+        )
+
+    start = datetime(2025, 1, 1)
+    seconds_in_year = 365 * 24 * 3600
+    insert_payment = text(
+        "INSERT INTO payments (employee_id, type, amount, created_at) "
+        "VALUES (:employee_id, :type, :amount, :created_at)"
+    )
+    left = n_payments
+    while left > 0:
+        size = min(chunk, left)
+        rows = []
+        for _ in range(size):
+            kind = rnd.choice(PAYMENT_TYPES)
+            amount = rnd.randint(100, 5000)
+            rows.append({
+                "employee_id": rnd.randint(1, n_employees),
+                "type": kind,
+                "amount": -amount if kind == "fine" else amount,
+                "created_at": start + timedelta(seconds=rnd.randrange(seconds_in_year)),
+            })
+        with engine.begin() as conn:
+            conn.execute(insert_payment, rows)
+        left -= size
+
+    # согласованное состояние: баланс = база + платежи, месяцы = суммы платежей
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE employees SET balance_int = balance_base + COALESCE(
+                (SELECT SUM(amount) FROM payments WHERE payments.employee_id = employees.id), 0)
+        """))
+        rows = conn.execute(text("SELECT id, balance_int FROM employees")).all()
+        conn.execute(
+            text("UPDATE employees SET salary = :salary WHERE id = :id"),
+            [{"id": r.id, "salary": int_to_money(r.balance_int)} for r in rows],
+        )
+        conn.execute(text("""
+            INSERT INTO employee_month_stats
+                (employee_id, year, month, month_key, income, salary, income_base, salary_base,
+                 created_at)
+            SELECT employee_id,
+                   CAST(substr(created_at, 1, 4) AS INTEGER),
+                   CAST(substr(created_at, 6, 2) AS INTEGER),
+                   '', SUM(amount),
+                   SUM(CASE WHEN type = 'salary' THEN amount ELSE 0 END), 0, 0,
+                   CURRENT_TIMESTAMP
+            FROM payments GROUP BY 1, 2, 3
+        """))
+
+
+def inject_drift(engine, n: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE employees SET balance_int = balance_int + 777 "
+            "WHERE id IN (SELECT id FROM employees ORDER BY id LIMIT :n)"
+        ), {"n": n})
+        conn.execute(text(
+            "UPDATE employee_month_stats SET income = income - 13 "
+            "WHERE id IN (SELECT id FROM employee_month_stats ORDER BY id LIMIT :n)"
+        ), {"n": n})
+        conn.execute(text(
+            "DELETE FROM employee_month_stats "
+            "WHERE id IN (SELECT id FROM employee_month_stats ORDER BY id DESC LIMIT :n)"
+        ), {"n": n})
+
+
+def drift_counts(report: dict) -> tuple:
+    return (
+        report["balance_drift_count"],
+        report["salary_text_drift_count"],
+        report["month_drift_count"],
+        report["missing_months_count"],
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--payments", type=int, default=200_000)
+    parser.add_argument("--drift", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=ledger.DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{tmp}/bench.db")
+        t0 = time.perf_counter()
+        seed(engine, args.employees, args.payments)
+        print(f"seed: {args.employees} сотрудников, {args.payments} платежей "
+              f"за {time.perf_counter() - t0:.1f} с")
+
+        clean = ledger.reconcile(engine)
+        print(f"reconcile (чисто):   {clean['elapsed_ms']:>9.1f} мс  дрейф {drift_counts(clean)}")
+
+        inject_drift(engine, args.drift)
+        dirty = ledger.reconcile(engine)
+        print(f"reconcile (дрейф):   {dirty['elapsed_ms']:>9.1f} мс  дрейф {drift_counts(dirty)}")
+
+        fixed = ledger.repair(engine, int_to_money, month_key_for, batch_size=args.batch_size)
+        print(f"repair:              {fixed['elapsed_ms']:>9.1f} мс  исправлено {fixed['fixed']}")
+
+        after = ledger.reconcile(engine)
+        print(f"reconcile (после):   {after['elapsed_ms']:>9.1f} мс  дрейф {drift_counts(after)}")
+        engine.dispose()
+
+    ok = (
+        drift_counts(clean) == (0, 0, 0, 0)
+        and dirty["balance_drift_count"] == args.drift
+        and dirty["month_drift_count"] == args.drift
+        and dirty["missing_months_count"] == args.drift
+        and drift_counts(after) == (0, 0, 0, 0)
+    )
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
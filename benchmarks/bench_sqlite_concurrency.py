@@ -0,0 +1,152 @@
+"""
+Конкурентные чтения/записи в SQLite: настройки по умолчанию против
+SQLITE_PRAGMAS из main.py (WAL, synchronous=NORMAL, busy_timeout, кэш, mmap).
+
+Читатели листают историю платежей случайного сотрудника, писатели
+добавляют платёж и меняют баланс (как create_payment_for_employee).
+
+    python benchmarks/bench_sqlite_concurrency.py --seconds 5 --readers 8 --writers 2
+"""
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import insert, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from main import SQLITE_PRAGMAS, Base, Employee, Payment, build_engine  # noqa: E402
+
+N_EMPLOYEES = 200
+N_PAYMENTS = 50_000
+
+
+def seed(url: str) -> None:
+    engine = build_engine(url, pragmas={})
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        db.execute(
+            insert(Employee),
+            [
+                {
+                    "login": f"bench{i}",
+                    "password_hash": "x",
+                    "initials": "ББ",
+                    "name": f"Bench {i}",
+                    "position": "bench",
+                    "balance_int": 0,
+                }
+                for i in range(N_EMPLOYEES)
+            ],
+        )
+        db.execute(
+            insert(Payment),
+            [
+                {
+                    "employee_id": random.randint(1, N_EMPLOYEES),
+                    "type": "bonus",
+                    "amount": 100,
+                    "created_at": datetime(2025, 1, 1),
+                }
+                for _ in range(N_PAYMENTS)
+            ],
+        )
+        db.commit()
+    engine.dispose()
+
+
+def run(url: str, pragmas: dict, seconds: float, readers: int, writers: int) -> dict:
+    engine = build_engine(url, pragmas=pragmas, pool_size=readers + writers)
+    Session = sessionmaker(bind=engine)
+    stop = time.perf_counter() + seconds
+    counters = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def reader():
+        done = 0
+        errors = 0
+        while time.perf_counter() < stop:
+            with Session() as db:
+                try:
+                    db.execute(
+                        text(
+                            "SELECT id, amount, created_at FROM payments WHERE employee_id = :e "
+                            "ORDER BY created_at DESC, id DESC LIMIT 50"
+                        ),
+                        {"e": random.randint(1, N_EMPLOYEES)},
+                    ).all()
+                    done += 1
+                except Exception:
+                    errors += 1
+        with lock:
+            counters["reads"] += done
+            counters["errors"] += errors
+
+    def writer():
+        done = 0
+        errors = 0
+        while time.perf_counter() < stop:
+            emp = random.randint(1, N_EMPLOYEES)
+            with Session() as db:
+                try:
+                    db.execute(
+                        text(
+                            "INSERT INTO payments (employee_id, type, amount, created_at) "
+                            "VALUES (:e, 'bonus', 10, :ts)"
+                        ),
+                        {"e": emp, "ts": datetime.utcnow()},
+                    )
+                    db.execute(
+                        text("UPDATE employees SET balance_int = balance_int + 10 WHERE id = :e"),
+                        {"e": emp},
+                    )
+                    db.commit()
+                    done += 1
+                except Exception:
+                    db.rollback()
+                    errors += 1
+        with lock:
+            counters["writes"] += done
+            counters["errors"] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    return {k: v / seconds if k != "errors" else v for k, v in counters.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+
+    configs = {
+        # как было до настройки: rollback journal, synchronous=FULL
+        "default": {"journal_mode": "DELETE", "synchronous": "FULL"},
+        "tuned": SQLITE_PRAGMAS,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, pragmas in configs.items():
+            url = f"sqlite:///{Path(tmp, name + '.db').as_posix()}"
+            seed(url)
+            res = run(url, pragmas, args.seconds, args.readers, args.writers)
+            print(
+                f"{name:8} reads/s={res['reads']:9.1f}  writes/s={res['writes']:8.1f}  "
+                f"errors={res['errors']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Данные входа в кошелёк: сборка на каждый вход против снимка wallet_snapshots.
+
+Временная база (LW_DATABASE_URL) с E сотрудниками по M месяцев статистики.
+Без argon2 (его время одинаково в обоих вариантах) меряем среднее время
+подготовки ответа /api/login сотрудника: раньше — сотрудник, месяцы,
+разбор JSON-колонок и сериализация LoginResponse; теперь — сотрудник вместе
+со снимком одним запросом и готовый JSON. Плюс время rebuild_all_wallet_snapshots.
+Код возврата 1, если ответы разошлись.
+
+    python benchmarks/bench_wallet_snapshot.py --employees 5000 --months 24
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def main_bench() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=5000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["LW_DATABASE_URL"] = f"sqlite:///{Path(tmp.name, 'snapshots.db').as_posix()}"
+    os.environ["LW_SEED_DEMO"] = "0"
+
+    from fastapi.encoders import jsonable_encoder
+    from sqlalchemy import insert, select
+
+    import main
+    from main import (
+        Employee,
+        EmployeeMonthStat,
+        LoginResponse,
+        SessionLocal,
+        WalletSnapshot,
+        build_employee_login_data,
+        build_months_for_employee,
+        employee_login_response,
+        engine,
+        int_to_money,
+        month_key_for,
+        rebuild_all_wallet_snapshots,
+        wallet_snapshot_json,
+    )
+
+    main.init_db()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Employee),
+            [
+                {
+                    "login": f"snap{i}",
+                    "password_hash": "x",
+                    "initials": "ББ",
+                    "name": f"Snap {i}",
+                    "position": "bench",
+                    "salary": int_to_money(1000 + i),
+                    "balance_int": 1000 + i,
+                    "penalties_json": json.dumps(["Опоздание 5 мин"], ensure_ascii=False),
+                    "absences_json": "[]",
+                }
+                for i in range(args.employees)
+            ],
+        )
+        employee_ids = conn.execute(select(Employee.id)).scalars().all()
+        conn.execute(
+            insert(EmployeeMonthStat),
+            [
+                {
+                    "employee_id": emp_id,
+                    "year": 2024 + m // 12,
+                    "month": m % 12 + 1,
+                    "month_key": month_key_for(m % 12 + 1),
+                    "income": 50000 + m,
+                    "salary": 40000,
+                    "hours": 160,
+                    "penalties_json": json.dumps([f"штраф {m}"], ensure_ascii=False),
+                    "absences_json": "[]",
+                }
+                for emp_id in employee_ids
+                for m in range(args.months)
+            ],
+        )
+
+    started = time.perf_counter()
+    rebuild_all_wallet_snapshots()
+    rebuild_s = time.perf_counter() - started
+
+    logins = [f"snap{n % args.employees}" for n in range(args.requests)]
+    ok = True
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        legacy = []
+        for login in logins:
+            emp = db.query(Employee).filter(Employee.login == login).first()
+            data = build_employee_login_data(emp, build_months_for_employee(db, emp.id))
+            body = LoginResponse(role="employee", login=login, data=data, token="t", expires_in=1)
+            legacy.append(json.dumps(jsonable_encoder(body), ensure_ascii=False))
+        legacy_ms = (time.perf_counter() - started) / args.requests * 1000
+
+        started = time.perf_counter()
+        served = []
+        for login in logins:
+            emp, snapshot = (
+                db.query(Employee, WalletSnapshot)
+                .outerjoin(WalletSnapshot, WalletSnapshot.employee_id == Employee.id)
+                .filter(Employee.login == login)
+                .first()
+            )
+            served.append(employee_login_response(login, emp, wallet_snapshot_json(db, emp, snapshot)).body)
+        snapshot_ms = (time.perf_counter() - started) / args.requests * 1000
+
+    for old, new in zip(legacy, served):
+        ok = ok and json.loads(old)["data"] == json.loads(new)["data"]
+    print(f"{args.employees} сотрудников по {args.months} мес.; rebuild_all: {rebuild_s:.2f} с")
+    print(f"подготовка ответа входа: сборка {legacy_ms:6.2f} мс   снимок {snapshot_ms:6.2f} мс")
+    print(f"счётчики: {main.WALLET_SNAPSHOT_STATS}")
+    ok = ok and main.WALLET_SNAPSHOT_STATS["rebuilt_on_login"] == 0
+
+    engine.dispose()
+    tmp.cleanup()
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
@@ -0,0 +1,160 @@
+"""
+Всплеск записей: коммит на каждый запрос против очереди с групповым
+коммитом (WriteQueue, write_queue.py).
+
+N потоков (как потоки тредпула FastAPI) по K платежей через create_payment_op
+и правок профиля через apply_employee_update. В режиме direct каждая операция
+коммитится на своей сессии, в режиме queue — уходит в WriteQueue. Каждая
+десятая операция заведомо падает (несуществующий сотрудник): её ошибка
+должна вернуться только её вызывающему. Печатаем throughput, задержку
+p50/p99 и метрики очереди (размер пачки, время коммита); в конце —
+сверка с журналом (ledger.reconcile). Код возврата 1 при потерях или дрейфе.
+
+    python benchmarks/bench_write_queue.py --threads 32 --ops 100
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import ledger  # noqa: E402
+from main import (  # noqa: E402
+    Base,
+    Employee,
+    EmployeeUpdate,
+    Payment,
+    PaymentCreate,
+    apply_employee_update,
+    build_engine,
+    create_payment_op,
+    int_to_money,
+)
+from write_queue import WriteQueue  # noqa: E402
+
+EMPLOYEES = 8
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run(mode: str, url: str, threads: int, ops: int, batch: int, wait_ms: float) -> bool:
+    engine = build_engine(url, pool_size=threads + 2)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Employee),
+            [
+                {
+                    "login": f"wq{i}",
+                    "password_hash": "x",
+                    "initials": "ББ",
+                    "name": f"Queue {i}",
+                    "position": "bench",
+                    "salary": int_to_money(0),
+                    "balance_int": 0,
+                }
+                for i in range(EMPLOYEES)
+            ],
+        )
+    Session = sessionmaker(autoflush=False, bind=engine)
+    wq = WriteQueue(
+        sessionmaker(autoflush=False, expire_on_commit=False, bind=engine),
+        max_batch=batch,
+        max_wait_ms=wait_ms,
+    )
+    if mode == "queue":
+        wq.start()
+
+    latencies = []
+    counts = {"ok": 0, "expected_errors": 0, "unexpected_errors": 0}
+    lock = threading.Lock()
+
+    def worker(n: int) -> None:
+        for i in range(ops):
+            emp_id = (n + i) % EMPLOYEES + 1
+            if i % 10 == 9:
+                op = lambda s: create_payment_op(s, 10**9, PaymentCreate(type="bonus", amount=1))  # noqa: E731
+            elif i % 5 == 4:
+                update = EmployeeUpdate(status=f"смена {n}-{i}")
+                op = lambda s, e=emp_id, u=update: apply_employee_update(s, e, u, None)  # noqa: E731
+            else:
+                payload = PaymentCreate(type="salary" if i % 2 else "bonus", amount=100)
+                op = lambda s, e=emp_id, p=payload: create_payment_op(s, e, p)  # noqa: E731
+            started = time.perf_counter()
+            with Session() as db:
+                try:
+                    wq.run(op, db)
+                    kind = "ok"
+                except HTTPException:
+                    kind = "expected_errors"
+                except Exception:
+                    kind = "unexpected_errors"
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+                counts[kind] += 1
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    stats = wq.stats()
+    wq.stop()
+
+    expected_payments = sum(1 for n in range(threads) for i in range(ops) if i % 10 != 9 and i % 5 != 4)
+    with engine.connect() as conn:
+        stored = conn.execute(select(func.count()).select_from(Payment)).scalar()
+    report = ledger.reconcile(engine, sample=3)
+    engine.dispose()
+
+    total = threads * ops
+    print(
+        f"{mode:6} {total / elapsed:8.1f} оп/с  p50={percentile(latencies, 0.5):7.1f} мс  "
+        f"p99={percentile(latencies, 0.99):7.1f} мс  {counts}  платежей {stored}/{expected_payments}"
+    )
+    if mode == "queue":
+        print(
+            f"       пачек {stats['batches']}, средняя {stats['avg_batch_size']}, "
+            f"макс {stats['max_batch_size']}, commit_ms {stats['commit_ms']}, "
+            f"ожидание в очереди {stats['queue_wait_ms']}"
+        )
+    return (
+        counts["unexpected_errors"] == 0
+        and counts["expected_errors"] == threads * (ops // 10)
+        and stored == expected_payments
+        and report["balance_drift_count"] == 0
+        and report["month_drift_count"] == 0
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("direct", "queue"):
+            url = f"sqlite:///{Path(tmp, mode + '.db').as_posix()}"
+            ok = run(mode, url, args.threads, args.ops, args.batch, args.wait_ms) and ok
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
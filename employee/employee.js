@@ -1,9 +1,49 @@
 const API_BASE = ""; // тот же домен/порт, что и backend
 
-let employeeAuth = null; // { login, password }
+let employeeAuth = null; // { token } после входа
 
 /* ===== утилиты ===== */
 
+function authHeaders() {
+  const headers = { "Content-Type": "application/json" };
+  if (employeeAuth && employeeAuth.token) {
+    headers.Authorization = `Bearer ${employeeAuth.token}`;
+  }
+  return headers;
+}
+
+// ETag-кэш чтений: ответ с ETag запоминаем, следующий такой же запрос уходит
+// с If-None-Match, а на 304 возвращаем сохранённое тело как обычный 200-ответ
+const etagCache = new Map();
+
+function etagCacheKey(url, options = {}) {
+  return `${options.method || "GET"} ${url} ${options.body || ""}`;
+}
+
+async function storeEtagResponse(key, resp) {
+  const etag = resp.headers.get("ETag");
+  if (!resp.ok || !etag) return;
+  etagCache.set(key, {
+    etag,
+    body: await resp.clone().text(),
+    headers: Object.fromEntries(resp.headers.entries()),
+  });
+}
+
+async function fetchWithEtag(url, options = {}) {
+  const key = etagCacheKey(url, options);
+  const cached = etagCache.get(key);
+  const headers = { ...(options.headers || {}) };
+  if (cached) headers["If-None-Match"] = cached.etag;
+
+  const resp = await fetch(url, { ...options, headers });
+  if (resp.status === 304 && cached) {
+    return new Response(cached.body, { status: 200, headers: cached.headers });
+  }
+  await storeEtagResponse(key, resp);
+  return resp;
+}
+
 function splitLines(value) {
   if (!value) return [];
   return value
@@ -62,7 +102,43 @@ function setEmployeeCardMode(mode) {
 
 /* ===== рендер истории ===== */
 
-function renderEmployeeCardHistory(history) {
+// правка карточки: для списков — что добавлено/удалено, для статуса — было/стало
+function cardHistoryItem(item) {
+  const li = document.createElement("li");
+  const lines = [
+    `<div><strong>${item.timestamp || ""}</strong></div>`,
+    `<div>Поле: <strong>${item.field || ""}</strong></div>`,
+  ];
+  if (item.field === "status") {
+    lines.push(`<div>Было: ${item.old ?? "—"}</div>`, `<div>Стало: ${item.new ?? "—"}</div>`);
+  } else {
+    if (item.added && item.added.length) lines.push(`<div>Добавлено: ${item.added.join(", ")}</div>`);
+    if (item.removed && item.removed.length) lines.push(`<div>Удалено: ${item.removed.join(", ")}</div>`);
+  }
+  li.innerHTML = lines.join("");
+  return li;
+}
+
+// «Показать ещё» в конце списка: старые правки с /api/employee/card/history
+function renderCardHistoryMore(cursor) {
+  const old = cardHistoryList.querySelector(".history-more");
+  if (old) old.remove();
+  if (!cursor) return;
+
+  const li = document.createElement("li");
+  li.className = "history-empty history-more";
+  li.innerHTML = `<button type="button" class="btn-small btn-gray">Показать ещё</button>`;
+  const btn = li.querySelector("button");
+  btn.addEventListener("click", () => {
+    btn.disabled = true;
+    btn.textContent = "Загрузка...";
+    loadEmployeeCardHistoryPage(cursor);
+  });
+  cardHistoryList.appendChild(li);
+}
+
+// history — последние правки (старые -> новые), cursor — если есть правки старше
+function renderEmployeeCardHistory(history, cursor) {
   if (!cardHistoryList) return;
 
   cardHistoryList.innerHTML = "";
@@ -78,21 +154,8 @@ function renderEmployeeCardHistory(history) {
   history
     .slice()
     .reverse()
-    .forEach(item => {
-      const li = document.createElement("li");
-      const ts = item.timestamp || "";
-      const field = item.field || "";
-      const oldVal = item.old ?? "—";
-      const newVal = item.new ?? "—";
-
-      li.innerHTML =
-        `<div><strong>${ts}</strong></div>` +
-        `<div>Поле: <strong>${field}</strong></div>` +
-        `<div>Было: ${oldVal}</div>` +
-        `<div>Стало: ${newVal}</div>`;
-
-      cardHistoryList.appendChild(li);
-    });
+    .forEach(item => cardHistoryList.appendChild(cardHistoryItem(item)));
+  renderCardHistoryMore(cursor);
 }
 
 /* ===== рендер карточки ===== */
@@ -129,7 +192,7 @@ function applyEmployeeCard(card) {
     cardRolesInput.value = (card.roles || []).join("\n");
   }
 
-  renderEmployeeCardHistory(card.history || []);
+  renderEmployeeCardHistory(card.history || [], card.history_cursor);
   setEmployeeCardMode("view");
 }
 
@@ -164,7 +227,8 @@ try{
 
     const data = await resp.json();
 
-    employeeAuth = { login, password };
+    // дальше работаем по токену сессии, пароль не пересылаем
+    employeeAuth = data.token ? { token: data.token } : { login, password };
 
     // прячем форму логина, показываем карточку
     loginCard.style.display = "none";
@@ -181,10 +245,10 @@ async function loadEmployeeCardSelf() {
   if (!employeeAuth) return;
 
   try {
-    const resp = await fetch(`${API_BASE}/api/employee/card`, {
+    const resp = await fetchWithEtag(`${API_BASE}/api/employee/card`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(employeeAuth),
+      headers: authHeaders(),
+      body: JSON.stringify(employeeAuth.token ? {} : employeeAuth),
     });
 
     if (!resp.ok) {
@@ -212,9 +276,9 @@ async function saveEmployeeCard() {
   try {
     const resp = await fetch(`${API_BASE}/api/employee/card/update`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: authHeaders(),
       body: JSON.stringify({
-        ...employeeAuth,
+        ...(employeeAuth.token ? {} : employeeAuth),
         responsibilities,
         skills,
         roles,
@@ -227,6 +291,14 @@ async function saveEmployeeCard() {
       return;
     }
 
+    // ответ — уже новая карточка со своим ETag: следующая загрузка получит 304
+    await storeEtagResponse(
+      etagCacheKey(`${API_BASE}/api/employee/card`, {
+        method: "POST",
+        body: JSON.stringify(employeeAuth.token ? {} : employeeAuth),
+      }),
+      resp,
+    );
     const card = await resp.json();
     applyEmployeeCard(card);
   } catch (e) {
@@ -237,6 +309,36 @@ async function saveEmployeeCard() {
   }
 }
 
+async function loadEmployeeCardHistoryPage(cursor) {
+  if (!employeeAuth || !cardHistoryList) return;
+
+  try {
+    const resp = await fetchWithEtag(`${API_BASE}/api/employee/card/history`, {
+      method: "POST",
+      headers: authHeaders(),
+      body: JSON.stringify({
+        ...(employeeAuth.token ? {} : employeeAuth),
+        cursor,
+      }),
+    });
+
+    if (!resp.ok) {
+      console.error("card history error", await resp.text());
+      renderCardHistoryMore(cursor);
+      return;
+    }
+
+    const list = await resp.json();
+    const more = cardHistoryList.querySelector(".history-more");
+    if (more) more.remove();
+    list.forEach(item => cardHistoryList.appendChild(cardHistoryItem(item)));
+    renderCardHistoryMore(resp.headers.get("X-Next-Cursor"));
+  } catch (e) {
+    console.error("Ошибка загрузки истории карточки:", e);
+    renderCardHistoryMore(cursor);
+  }
+}
+
 /* ===== события ===== */
 
 loginBtn.addEventListener("click", loginEmployee);
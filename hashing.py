@@ -0,0 +1,314 @@
+"""
+Хэширование паролей (argon2) в отдельном пуле процессов.
+
+Argon2 грузит CPU, а FastAPI выполняет sync-эндпоинты в общем тредпуле:
+пачка логинов в начале смены съедала одно ядро и тормозила все остальные
+запросы. Здесь операции CryptContext уходят в ProcessPoolExecutor:
+  - число процессов — LW_HASH_WORKERS (по умолчанию = числу ядер,
+    0 — считать прямо в вызывающем потоке, как раньше);
+  - очередь ограничена LW_HASH_QUEUE задачами (в работе + ожидающие),
+    при переполнении сразу бросаем HashPoolBusy, а не копим очередь.
+
+Параметры argon2 (time/memory/parallelism) берутся из профиля
+argon2_profile.json, который подбирается под бюджет задержки командой
+`python hashing.py calibrate --target-ms 80` (или на старте приложения
+при LW_ARGON2_CALIBRATE=1, если профиля ещё нет). Старые хэши с другими
+параметрами перехэшируются при успешном входе (needs_update).
+
+Модуль отдельный от main.py, чтобы spawn-процессы пула импортировали
+только passlib, а не всё приложение. Скрипты, которые хэшируют пароли
+(add_employee.py и т.п.), должны держать код под `if __name__ == "__main__":`
+— spawn заново импортирует запускаемый файл.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+
+
+BASE_DIR = Path(__file__).resolve().parent
+ARGON2_PROFILE_FILE = Path(os.getenv("LW_ARGON2_PROFILE", str(BASE_DIR / "argon2_profile.json")))
+ARGON2_TARGET_MS = float(os.getenv("LW_ARGON2_TARGET_MS", "80"))
+
+HASH_POOL_WORKERS = int(os.getenv("LW_HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_POOL_QUEUE = int(os.getenv("LW_HASH_QUEUE", str(max(HASH_POOL_WORKERS, 1) * 16)))
+
+
+class HashPoolBusy(RuntimeError):
+    """Очередь пула argon2 заполнена — запрос нужно отклонить."""
+
+
+# ===============================
+#     ПРОФИЛЬ ПАРАМЕТРОВ ARGON2
+# ===============================
+
+def load_profile() -> Optional[dict]:
+    if not ARGON2_PROFILE_FILE.exists():
+        return None
+    try:
+        with ARGON2_PROFILE_FILE.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def save_profile(profile: dict) -> None:
+    with ARGON2_PROFILE_FILE.open("w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+
+
+def _context_settings(profile: Optional[dict]) -> dict:
+    if not profile:
+        return {}
+    return {
+        "argon2__time_cost": int(profile["time_cost"]),
+        "argon2__memory_cost": int(profile["memory_cost"]),
+        "argon2__parallelism": int(profile["parallelism"]),
+    }
+
+
+_pwd_context = None
+_pwd_context_lock = threading.Lock()
+
+
+def get_pwd_context():
+    """
+    CryptContext создаётся при первом обращении: passlib и argon2 не
+    грузятся при импорте модуля (холодный старт, spawn-процессы пула).
+    """
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+
+                _pwd_context = CryptContext(
+                    schemes=["argon2"], deprecated="auto", **_context_settings(load_profile())
+                )
+    return _pwd_context
+
+
+def apply_profile(profile: dict) -> None:
+    """Меняем параметры контекста на месте (ссылки на него остаются валидными)."""
+    get_pwd_context().update(**_context_settings(profile))
+
+
+def measure_verify_ms(time_cost: int, memory_cost: int, parallelism: int, rounds: int = 3) -> float:
+    """Медианное время одной проверки пароля с заданными параметрами, мс."""
+    from passlib.context import CryptContext
+
+    ctx = CryptContext(
+        schemes=["argon2"],
+        argon2__time_cost=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
+    hashed = ctx.hash("calibration-password")
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        ctx.verify("calibration-password", hashed)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def calibrate(
+    target_ms: float = ARGON2_TARGET_MS,
+    max_memory_kib: int = 64 * 1024,
+    min_memory_kib: int = 8 * 1024,
+    parallelism: int = 1,
+    max_time_cost: int = 10,
+) -> dict:
+    """
+    Подбираем параметры под бюджет target_ms на одну проверку:
+      1) берём максимум памяти и уменьшаем её вдвое, пока t=1 не уложится;
+      2) при найденной памяти наращиваем time_cost, пока укладываемся.
+    parallelism=1: пул процессов и так занимает все ядра.
+    """
+    memory = max_memory_kib
+    measured = measure_verify_ms(1, memory, parallelism)
+    while measured > target_ms and memory > min_memory_kib:
+        memory = max(memory // 2, min_memory_kib)
+        measured = measure_verify_ms(1, memory, parallelism)
+
+    time_cost = 1
+    while time_cost < max_time_cost:
+        next_ms = measure_verify_ms(time_cost + 1, memory, parallelism)
+        if next_ms > target_ms:
+            break
+        time_cost += 1
+        measured = next_ms
+
+    return {
+        "time_cost": time_cost,
+        "memory_cost": memory,
+        "parallelism": parallelism,
+        "target_ms": target_ms,
+        "measured_ms": round(measured, 1),
+        "calibrated_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+
+
+def needs_calibration() -> bool:
+    return os.getenv("LW_ARGON2_CALIBRATE") == "1" and not ARGON2_PROFILE_FILE.exists()
+
+
+def ensure_calibrated() -> None:
+    """На старте: при LW_ARGON2_CALIBRATE=1 и отсутствии профиля — калибруем."""
+    if not needs_calibration():
+        return
+    profile = calibrate()
+    save_profile(profile)
+    apply_profile(profile)
+
+
+# ===============================
+#   ФУНКЦИИ, ВЫПОЛНЯЕМЫЕ В ПУЛЕ
+# ===============================
+
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+
+def _verify_and_rehash(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(пароль верный, новый хэш — если старый посчитан с устаревшим профилем)."""
+    ctx = get_pwd_context()
+    if not ctx.verify(plain_password, hashed_password):
+        return False, None
+    if ctx.needs_update(hashed_password):
+        return True, ctx.hash(plain_password)
+    return True, None
+
+
+# ===============================
+#            ПУЛ
+# ===============================
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(HASH_POOL_QUEUE, 1))
+
+
+def start_pool() -> None:
+    """Поднимаем процессы заранее (на старте приложения), а не на первом логине."""
+    global _executor
+    if HASH_POOL_WORKERS <= 0:
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=HASH_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+
+def shutdown_pool() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+
+def _submit(fn: Callable[..., Any], *args: Any) -> Future:
+    if HASH_POOL_WORKERS <= 0:
+        fut: Future = Future()
+        try:
+            fut.set_result(fn(*args))
+        except Exception as exc:
+            fut.set_exception(exc)
+        return fut
+
+    if not _slots.acquire(blocking=False):
+        raise HashPoolBusy("argon2 pool queue is full")
+    try:
+        start_pool()
+        assert _executor is not None
+        fut = _executor.submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    fut.add_done_callback(lambda _: _slots.release())
+    return fut
+
+
+# ===============================
+#     СИНХРОННЫЕ / ASYNC ОБЁРТКИ
+# ===============================
+
+def hash_password(password: str) -> str:
+    return _submit(_hash, password).result()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _submit(_verify, plain_password, hashed_password).result()
+
+
+def verify_and_rehash(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return _submit(_verify_and_rehash, plain_password, hashed_password).result()
+
+
+async def _run_async(fn: Callable[..., Any], *args: Any) -> Any:
+    # без пула (LW_HASH_WORKERS=0) не считаем argon2 в event loop — уходим в поток
+    if HASH_POOL_WORKERS <= 0:
+        return await asyncio.to_thread(fn, *args)
+    return await asyncio.wrap_future(_submit(fn, *args))
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_async(_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_async(_verify, plain_password, hashed_password)
+
+
+async def verify_and_rehash_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return await _run_async(_verify_and_rehash, plain_password, hashed_password)
+
+
+def pool_stats() -> dict:
+    """Текущее состояние пула (для метрик)."""
+    # у BoundedSemaphore нет публичного счётчика, _value — свободные слоты
+    free = getattr(_slots, "_value", 0)
+    return {
+        "workers": HASH_POOL_WORKERS,
+        "queue_limit": HASH_POOL_QUEUE,
+        "in_flight": max(HASH_POOL_QUEUE - free, 0),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Калибровка параметров argon2")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cal = sub.add_parser("calibrate", help="подобрать параметры под бюджет задержки")
+    cal.add_argument("--target-ms", type=float, default=ARGON2_TARGET_MS)
+    cal.add_argument("--max-memory-mib", type=int, default=64)
+    cal.add_argument("--min-memory-mib", type=int, default=8)
+    cal.add_argument("--dry-run", action="store_true", help="не сохранять профиль")
+    args = parser.parse_args()
+
+    result = calibrate(
+        target_ms=args.target_ms,
+        max_memory_kib=args.max_memory_mib * 1024,
+        min_memory_kib=args.min_memory_mib * 1024,
+    )
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if not args.dry_run:
+        save_profile(result)
+        print("Профиль сохранён:", ARGON2_PROFILE_FILE)
@@ -0,0 +1,287 @@
+"""
+Сверка балансов с журналом платежей (payments) и пересборка расхождений.
+
+Баланс и помесячная статистика меняются инкрементально (платежи, откаты,
+фоновое начисление), поэтому проверяем инварианты:
+
+  employees.balance_int  = balance_base + SUM(payments.amount)
+  employees.salary       = balance_int (строка, сверяем значение, не формат)
+  month_stats.income     = income_base + SUM(amount платежей месяца)
+  month_stats.salary     = salary_base + SUM(amount платежей месяца с type='salary')
+
+*_base — часть, не объяснённая платежами: оклад при создании, ручная правка
+админом, почасовые начисления ACCRUAL_JOB, демо-данные.
+
+Все суммы по журналу считаются set-based (GROUP BY на стороне SQLite), в
+Python приходят только агрегаты по сотрудникам/месяцам — это держит
+миллионы платежей. Починка идёт пачками по batch_size, каждая пачка — своя
+короткая транзакция, и значения пересчитываются в самом UPDATE, так что
+параллельные платежи не затираются.
+
+    python ledger.py               # отчёт
+    python ledger.py --repair      # отчёт + починка
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection, Engine
+
+
+DEFAULT_SAMPLE = 20
+DEFAULT_BATCH_SIZE = 500
+
+MONTH_RANGE_SQL = (
+    "p.employee_id = employee_month_stats.employee_id "
+    "AND p.created_at >= printf('%04d-%02d-01', employee_month_stats.year, employee_month_stats.month) "
+    "AND p.created_at < date(printf('%04d-%02d-01', employee_month_stats.year, "
+    "employee_month_stats.month), '+1 month')"
+)
+
+
+# ===============================
+#           ПОИСК ДРЕЙФА
+# ===============================
+
+def _build_month_ledger(conn: Connection) -> None:
+    """Временная таблица: суммы платежей по (сотрудник, год, месяц)."""
+    conn.execute(text("DROP TABLE IF EXISTS temp.ledger_month"))
+    conn.execute(text("""
+        CREATE TEMP TABLE ledger_month AS
+        SELECT employee_id,
+               CAST(substr(created_at, 1, 4) AS INTEGER) AS year,
+               CAST(substr(created_at, 6, 2) AS INTEGER) AS month,
+               SUM(amount) AS income,
+               SUM(CASE WHEN type = 'salary' THEN amount ELSE 0 END) AS salary
+        FROM payments
+        GROUP BY employee_id, year, month
+    """))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX temp.ix_ledger_month ON ledger_month (employee_id, year, month)"
+    ))
+
+
+def _salary_value(salary: Optional[str]) -> Optional[int]:
+    """'-12 430 ₽' / '12430' -> число; формат строки сверке не важен, важно значение."""
+    digits = "".join(ch for ch in salary or "" if ch.isdigit())
+    if not digits:
+        return None
+    return -int(digits) if salary.lstrip().startswith("-") else int(digits)
+
+
+def find_drift(conn: Connection) -> Dict[str, object]:
+    """Полные списки расхождений (для отчёта и починки)."""
+    balances = conn.execute(text("""
+        WITH ledger AS (
+            SELECT employee_id, SUM(amount) AS total FROM payments GROUP BY employee_id
+        )
+        SELECT e.id, e.balance_int, e.balance_base, e.salary, COALESCE(l.total, 0) AS total
+        FROM employees e LEFT JOIN ledger l ON l.employee_id = e.id
+    """)).all()
+
+    balance_drift: List[dict] = []
+    salary_text_drift: List[int] = []
+    for row in balances:
+        if row.balance_int is None:
+            # баланс ещё не инициализирован (ensure_emp_balance_initialized)
+            continue
+        expected = (row.balance_base or 0) + row.total
+        if row.balance_int != expected:
+            balance_drift.append({
+                "employee_id": row.id,
+                "balance_int": row.balance_int,
+                "expected": expected,
+                "diff": row.balance_int - expected,
+            })
+        elif _salary_value(row.salary) != row.balance_int:
+            salary_text_drift.append(row.id)
+
+    orphan_payments = conn.execute(text("""
+        SELECT COUNT(*) FROM payments
+        WHERE employee_id NOT IN (SELECT id FROM employees)
+    """)).scalar() or 0
+
+    _build_month_ledger(conn)
+    month_drift = [
+        {
+            "id": row.id,
+            "employee_id": row.employee_id,
+            "year": row.year,
+            "month": row.month,
+            "income": row.income,
+            "expected_income": row.expected_income,
+            "salary": row.salary,
+            "expected_salary": row.expected_salary,
+        }
+        for row in conn.execute(text("""
+            SELECT s.id, s.employee_id, s.year, s.month, s.income, s.salary,
+                   s.income_base + COALESCE(l.income, 0) AS expected_income,
+                   s.salary_base + COALESCE(l.salary, 0) AS expected_salary
+            FROM employee_month_stats s
+            LEFT JOIN temp.ledger_month l
+              ON l.employee_id = s.employee_id AND l.year = s.year AND l.month = s.month
+            WHERE COALESCE(s.income, 0) != s.income_base + COALESCE(l.income, 0)
+               OR COALESCE(s.salary, 0) != s.salary_base + COALESCE(l.salary, 0)
+        """))
+    ]
+    missing_months = [
+        dict(row._mapping)
+        for row in conn.execute(text("""
+            SELECT l.employee_id, l.year, l.month, l.income, l.salary
+            FROM temp.ledger_month l
+            JOIN employees e ON e.id = l.employee_id
+            LEFT JOIN employee_month_stats s
+              ON s.employee_id = l.employee_id AND s.year = l.year AND s.month = l.month
+            WHERE s.id IS NULL AND (l.income != 0 OR l.salary != 0)
+        """))
+    ]
+    conn.execute(text("DROP TABLE IF EXISTS temp.ledger_month"))
+
+    return {
+        "employees_checked": len(balances),
+        "balance_drift": balance_drift,
+        "salary_text_drift": salary_text_drift,
+        "orphan_payments": orphan_payments,
+        "month_drift": month_drift,
+        "missing_months": missing_months,
+    }
+
+
+def summarize(drift: Dict[str, object], sample: Optional[int] = DEFAULT_SAMPLE) -> dict:
+    """Счётчики + первые sample записей каждого вида расхождений."""
+    def cut(items):
+        return items if sample is None else items[:sample]
+
+    return {
+        "employees_checked": drift["employees_checked"],
+        "orphan_payments": drift["orphan_payments"],
+        "balance_drift_count": len(drift["balance_drift"]),
+        "balance_drift_total": sum(d["diff"] for d in drift["balance_drift"]),
+        "salary_text_drift_count": len(drift["salary_text_drift"]),
+        "month_drift_count": len(drift["month_drift"]),
+        "missing_months_count": len(drift["missing_months"]),
+        "balance_drift": cut(drift["balance_drift"]),
+        "month_drift": cut(drift["month_drift"]),
+        "missing_months": cut(drift["missing_months"]),
+    }
+
+
+def reconcile(engine: Engine, sample: Optional[int] = DEFAULT_SAMPLE) -> dict:
+    """Отчёт о расхождениях; ничего не меняет."""
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        drift = find_drift(conn)
+    report = summarize(drift, sample)
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return report
+
+
+# ===============================
+#             ПОЧИНКА
+# ===============================
+
+def _batches(items: List, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def repair(
+    engine: Engine,
+    format_money: Callable[[int], str],
+    month_key: Callable[[int], str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict:
+    """
+    Пересобирает разошедшиеся балансы и месяцы из журнала платежей.
+    Возвращает число исправленных строк по видам.
+    """
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        drift = find_drift(conn)
+
+    fixed = {"balances": 0, "months": 0, "months_created": 0}
+
+    employee_ids = sorted(
+        {d["employee_id"] for d in drift["balance_drift"]} | set(drift["salary_text_drift"])
+    )
+    balance_stmt = text("""
+        UPDATE employees SET balance_int = balance_base + COALESCE(
+            (SELECT SUM(amount) FROM payments WHERE payments.employee_id = employees.id), 0
+        )
+        WHERE id IN :ids
+        RETURNING id, balance_int
+    """).bindparams(bindparam("ids", expanding=True))
+    for batch in _batches(employee_ids, batch_size):
+        with engine.begin() as conn:
+            rows = conn.execute(balance_stmt, {"ids": batch}).all()
+            if rows:
+                conn.execute(
+                    text("UPDATE employees SET salary = :salary WHERE id = :id"),
+                    [{"id": r.id, "salary": format_money(r.balance_int)} for r in rows],
+                )
+        fixed["balances"] += len(rows)
+
+    month_ids = [d["id"] for d in drift["month_drift"]]
+    month_stmt = text(f"""
+        UPDATE employee_month_stats SET
+            income = income_base + COALESCE(
+                (SELECT SUM(p.amount) FROM payments p WHERE {MONTH_RANGE_SQL}), 0),
+            salary = CASE
+                WHEN salary IS NULL AND salary_base = 0 AND NOT EXISTS (
+                    SELECT 1 FROM payments p WHERE p.type = 'salary' AND {MONTH_RANGE_SQL}
+                ) THEN NULL
+                ELSE salary_base + COALESCE(
+                    (SELECT SUM(p.amount) FROM payments p
+                     WHERE p.type = 'salary' AND {MONTH_RANGE_SQL}), 0)
+            END
+        WHERE id IN :ids
+    """).bindparams(bindparam("ids", expanding=True))
+    for batch in _batches(month_ids, batch_size):
+        with engine.begin() as conn:
+            fixed["months"] += conn.execute(month_stmt, {"ids": batch}).rowcount or 0
+
+    now = datetime.utcnow()
+    insert_stmt = text("""
+        INSERT INTO employee_month_stats
+            (employee_id, year, month, month_key, income, salary, income_base, salary_base,
+             penalties_json, absences_json, created_at)
+        VALUES (:employee_id, :year, :month, :month_key, :income, :salary, 0, 0, '[]', '[]', :now)
+        ON CONFLICT (employee_id, year, month) DO NOTHING
+    """)
+    for batch in _batches(drift["missing_months"], batch_size):
+        with engine.begin() as conn:
+            result = conn.execute(
+                insert_stmt,
+                [dict(m, month_key=month_key(m["month"]), now=now) for m in batch],
+            )
+        fixed["months_created"] += result.rowcount or 0
+
+    return {
+        "before": summarize(drift),
+        "fixed": fixed,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сверка балансов с журналом платежей")
+    parser.add_argument("--repair", action="store_true", help="исправить расхождения")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE,
+                        help="сколько примеров каждого расхождения печатать")
+    args = parser.parse_args()
+
+    # main — только для CLI: движок, формат денег и ключи месяцев приложения
+    from main import engine, init_db, int_to_money, month_key_for, rebuild_all_wallet_snapshots
+
+    init_db()
+    if args.repair:
+        result = repair(engine, int_to_money, month_key_for, args.batch_size)
+        result["wallet_snapshots"] = rebuild_all_wallet_snapshots()
+        result["after"] = reconcile(engine, args.sample)
+    else:
+        result = reconcile(engine, args.sample)
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
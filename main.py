@@ -1,25 +1,49 @@
 from pathlib import Path
-from typing import cast
-from openpyxl.worksheet.worksheet import Worksheet
-from fastapi import FastAPI, Depends, HTTPException, Header, UploadFile, File
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Header, UploadFile, File, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import asyncio
+import base64
+import hashlib
+import hmac
 import io
 import json
+import logging
+import math
 import os
-from typing import List, Optional, cast
+import re
+import secrets
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import asynccontextmanager
+from typing import Annotated, Callable, Dict, Iterable, List, Optional, cast
 from pydantic import BaseModel, Field
 
 from sqlalchemy import (
+    bindparam,
+    case,
     create_engine,
+    delete,
+    event,
+    func,
+    insert,
+    select,
+    tuple_,
+    update,
     String,
     Text,
     DateTime,
     Boolean,
     Integer,
+    Index,
     text,
 )
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import (
     sessionmaker,
     declarative_base,
@@ -28,86 +52,211 @@ from sqlalchemy.orm import (
     mapped_column,
 )
 
-from passlib.context import CryptContext
-from openpyxl import Workbook
 from fastapi.middleware.cors import CORSMiddleware
 
+import hashing
+import ledger
+import migrations
+import payment_import
+from startup_lock import LOCK_STATS, startup_lock
+from read_cache import ReadCache
+from write_queue import WriteOp, WriteQueue, WriteQueueTimeout
+from work_calendar import load_work_calendar
+
 
 # ===============================
 #   ПУТИ / НАСТРОЙКИ
 # ===============================
 
+logger = logging.getLogger("luchwallet")
+
 BASE_DIR = Path(__file__).resolve().parent
 CARD_DIST = BASE_DIR / "card" / "dist"
 
 DB_PATH = BASE_DIR / "luchwallet.db"
-DATABASE_URL = f"sqlite:///{DB_PATH.as_posix()}"
-
-print("USING DB:", DB_PATH)
+DATABASE_URL = os.getenv("LW_DATABASE_URL", f"sqlite:///{DB_PATH.as_posix()}")
 
 PHOTOS_DIR = BASE_DIR / "photos"
 os.makedirs(PHOTOS_DIR, exist_ok=True)
 
-# JSON для расширенных данных карточки сотрудника
-EMPLOYEE_CARD_JSON = BASE_DIR / "employee_cards.json"
+# Производственный календарь (праздники, переносы, правила складов)
+WORK_CALENDAR = load_work_calendar()
 
+# ===============================
+#   НАСТРОЙКА БАЗЫ ДАННЫХ
+# ===============================
 
-def load_employee_cards() -> dict:
-    """
-    Загружаем дополнительные данные для карточек сотрудников
-    из employee_cards.json.
+# PRAGMA для каждого нового соединения SQLite.
+# WAL: читатели не ждут писателя; synchronous=NORMAL в WAL безопасен
+# для целостности и не делает fsync на каждый коммит.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("LW_SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("LW_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("LW_SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    # отрицательное значение — размер в КиБ
+    "cache_size": int(os.getenv("LW_SQLITE_CACHE_SIZE", "-20000")),
+    "mmap_size": int(os.getenv("LW_SQLITE_MMAP_SIZE", str(128 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
 
-    Формат файла:
-    {
-      "1": {
-        "responsibilities": [...],
-        "skills": [...],
-        "roles": [...],
-        "history": [
-          { "timestamp": "...", "field": "...", "old": "...", "new": "..." }
-        ]
-      },
-      "2": { ... }
-    }
-    """
-    if not EMPLOYEE_CARD_JSON.exists():
-        return {}
+DB_POOL_SIZE = int(os.getenv("LW_DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("LW_DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("LW_DB_POOL_TIMEOUT", "10"))
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: dict) -> None:
+    cursor = dbapi_connection.cursor()
     try:
-        with EMPLOYEE_CARD_JSON.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
 
 
-def save_employee_cards(data: dict) -> None:
+def build_engine(
+    url: str,
+    pragmas: Optional[dict] = None,
+    pool_size: int = DB_POOL_SIZE,
+    max_overflow: int = DB_MAX_OVERFLOW,
+    pool_timeout: float = DB_POOL_TIMEOUT,
+):
     """
-    Сохраняем словарь в employee_cards.json.
+    Движок с явными настройками пула; для SQLite на каждое соединение
+    применяются pragmas (по умолчанию SQLITE_PRAGMAS).
     """
-    with EMPLOYEE_CARD_JSON.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    is_sqlite = url.startswith("sqlite")
+    new_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if is_sqlite else {},
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+    )
+    if is_sqlite:
+        effective = SQLITE_PRAGMAS if pragmas is None else pragmas
 
+        @event.listens_for(new_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            apply_sqlite_pragmas(dbapi_connection, effective)
 
-# ===============================
-#   НАСТРОЙКА БАЗЫ ДАННЫХ
-# ===============================
+    return new_engine
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
+
+def async_database_url(url: str) -> str:
+    """sqlite:///... -> sqlite+aiosqlite:///... (прочие URL не трогаем)."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url
+
+
+def build_async_engine(
+    url: str,
+    pragmas: Optional[dict] = None,
+    pool_size: int = DB_POOL_SIZE,
+    max_overflow: int = DB_MAX_OVERFLOW,
+    pool_timeout: float = DB_POOL_TIMEOUT,
+):
+    """То же, что build_engine, но для асинхронного слоя (aiosqlite)."""
+    new_engine = create_async_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+    )
+    if url.startswith("sqlite"):
+        effective = SQLITE_PRAGMAS if pragmas is None else pragmas
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            apply_sqlite_pragmas(dbapi_connection, effective)
+
+    return new_engine
+
+
+engine = build_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# платежи и правки профиля пишет один поток с групповым коммитом (write_queue.py)
+WRITE_QUEUE_ENABLED = os.getenv("LW_WRITE_QUEUE", "1") == "1"
+WRITE_QUEUE = WriteQueue(
+    sessionmaker(autoflush=False, expire_on_commit=False, bind=engine),
+    max_batch=int(os.getenv("LW_WRITE_QUEUE_BATCH", "64")),
+    max_wait_ms=float(os.getenv("LW_WRITE_QUEUE_WAIT_MS", "2")),
+    begin_sql="BEGIN IMMEDIATE" if engine.dialect.name == "sqlite" else None,
+)
+
+# кэш read-моделей сотрудника (detail / card), см. read_cache.py;
+# LW_READ_CACHE_SIZE=0 — выключен
+READ_CACHE = ReadCache(
+    max_entries=int(os.getenv("LW_READ_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.getenv("LW_READ_CACHE_TTL", "60")),
+)
+
+# асинхронный слой для /api/async/...: запрос не держит поток, пока ждёт БД
+ASYNC_DATABASE_URL = os.getenv("LW_ASYNC_DATABASE_URL", async_database_url(DATABASE_URL))
+async_engine = build_async_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# argon2 считается в отдельном пуле процессов (см. hashing.py)
+HASH_POOL_BUSY_DETAIL = "Сервер перегружен, повторите попытку позже"
+
+
+def hash_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503, detail=HASH_POOL_BUSY_DETAIL, headers={"Retry-After": "1"}
+    )
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    try:
+        return hashing.hash_password(password)
+    except hashing.HashPoolBusy:
+        raise hash_pool_busy()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return hashing.verify_password(plain_password, hashed_password)
+    except hashing.HashPoolBusy:
+        raise hash_pool_busy()
+
+
+def verify_and_rehash_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """
+    Проверка пароля + новый хэш, если старый посчитан не с текущим
+    профилем argon2 (CryptContext.needs_update).
+    """
+    try:
+        return hashing.verify_and_rehash(plain_password, hashed_password)
+    except hashing.HashPoolBusy:
+        raise hash_pool_busy()
+
+
+async def get_password_hash_async(password: str) -> str:
+    try:
+        return await hashing.hash_password_async(password)
+    except hashing.HashPoolBusy:
+        raise hash_pool_busy()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await hashing.verify_password_async(plain_password, hashed_password)
+    except hashing.HashPoolBusy:
+        raise hash_pool_busy()
+
+
+async def verify_and_rehash_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    try:
+        return await hashing.verify_and_rehash_async(plain_password, hashed_password)
+    except hashing.HashPoolBusy:
+        raise hash_pool_busy()
 
 
 def get_db():
@@ -118,6 +267,252 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# ===============================
+#        СЕССИОННЫЕ ТОКЕНЫ
+# ===============================
+
+# Файл с секретом используется, если LW_SESSION_SECRET не задан,
+# чтобы токены переживали рестарт и были общими для всех воркеров.
+SESSION_SECRET_FILE = BASE_DIR / ".session_secret"
+SESSION_TTL_SECONDS = int(os.getenv("LW_SESSION_TTL", str(12 * 3600)))
+
+
+def load_session_secret() -> bytes:
+    env_secret = os.getenv("LW_SESSION_SECRET")
+    if env_secret:
+        return env_secret.encode("utf-8")
+    if not SESSION_SECRET_FILE.exists():
+        SESSION_SECRET_FILE.write_text(secrets.token_hex(32), encoding="utf-8")
+    return SESSION_SECRET_FILE.read_text(encoding="utf-8").strip().encode("utf-8")
+
+
+SESSION_SECRET = load_session_secret()
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def issue_session_token(kind: str, subject_id: int, version: int) -> str:
+    """
+    Подписанный токен вида <payload>.<hmac>.
+    kind — "employee" или "admin", version — session_version владельца:
+    смена пароля/деактивация увеличивают её, и старые токены перестают проходить.
+    """
+    payload = {
+        "k": kind,
+        "sub": subject_id,
+        "v": version,
+        "exp": int(time.time()) + SESSION_TTL_SECONDS,
+    }
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    sig = hmac.new(SESSION_SECRET, body.encode("ascii"), hashlib.sha256).digest()
+    return f"{body}.{_b64encode(sig)}"
+
+
+def decode_session_token(token: str) -> Optional[dict]:
+    """Проверяем подпись и срок действия. None — токен невалиден."""
+    body, _, sig = token.partition(".")
+    if not body or not sig:
+        return None
+    try:
+        # не-ASCII в заголовке — просто чужой токен, а не 500
+        expected = hmac.new(SESSION_SECRET, body.encode("ascii"), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(sig)):
+            return None
+        claims = json.loads(_b64decode(body))
+    except Exception:
+        return None
+    if not isinstance(claims, dict) or claims.get("exp", 0) < time.time():
+        return None
+    return claims
+
+
+def get_session_claims(
+    authorization: Optional[str] = Header(None),
+) -> Optional[dict]:
+    """
+    Зависимость: разбирает `Authorization: Bearer <token>`.
+    Нет заголовка — None (эндпоинт сам решит, проверять ли логин/пароль).
+    """
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    claims = decode_session_token(token.strip())
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Сессия недействительна или истекла")
+    return claims
+
+
+# ===============================
+#   ОГРАНИЧЕНИЕ ПОПЫТОК ВХОДА
+# ===============================
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket по строковому ключу (логин, IP).
+    capacity — сколько попыток можно сделать подряд,
+    refill_per_sec — с какой скоростью попытки восстанавливаются.
+    clock подменяется в тестах фейковыми часами.
+    Хранит не больше max_keys корзин (самые давние вытесняются).
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_per_sec: float,
+        clock: Callable[[], float] = time.monotonic,
+        max_keys: int = 100_000,
+    ):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.clock = clock
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def _tokens(self, key: str, now: float) -> float:
+        tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated_at) * self.refill_per_sec)
+
+    def wait_time(self, key: str) -> float:
+        """
+        Сколько секунд ждать до следующей попытки, ничего не списывая
+        (0 — попытку можно сделать). Отказ засчитывается в rejected.
+        """
+        now = self.clock()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            if tokens >= 1:
+                return 0.0
+            self.rejected += 1
+            return (1 - tokens) / self.refill_per_sec
+
+    def try_acquire(self, key: str) -> float:
+        """
+        Списывает одну попытку. Возвращает 0, если попытка разрешена,
+        иначе — сколько секунд ждать до следующей.
+        """
+        now = self.clock()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            self._buckets.pop(key, None)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (1 - tokens) / self.refill_per_sec
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def refund(self, key: str) -> None:
+        """Возвращает попытку (успешный вход не должен расходовать лимит)."""
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at = self._buckets[key]
+                self._buckets[key] = (min(self.capacity, tokens + 1), updated_at)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+                "tracked_keys": len(self._buckets),
+            }
+
+
+def _env_number(name: str, raw: Optional[str], default, cast=float, allow_zero: bool = False):
+    """
+    Разбор числа из переменной окружения name (raw — её значение или часть).
+    Мусор, отрицательное или 0 (если не allow_zero) — default с предупреждением:
+    опечатка в окружении не должна ронять импорт main.
+    """
+    if raw is None:
+        return default
+    try:
+        value = cast(raw)
+    except (ValueError, OverflowError):
+        value = -1
+    if not (math.isfinite(value) and (value >= 0 if allow_zero else value > 0)):
+        bound = "не меньше 0" if allow_zero else "больше 0"
+        logger.warning("%s=%r: нужно число %s, берём %s", name, raw, bound, default)
+        return default
+    return value
+
+
+def _positive_env_float(name: str, default: float) -> float:
+    """Число > 0 из окружения; мусор или 0 — значение по умолчанию с предупреждением."""
+    return _env_number(name, os.getenv(name), default)
+
+
+def _login_throttle_limiter(name: str, default_burst: float, default_refill_sec: float) -> TokenBucketLimiter:
+    """Настройка через LW_<NAME>_BURST (попыток подряд) и LW_<NAME>_REFILL_SEC."""
+    return TokenBucketLimiter(
+        capacity=max(1.0, _positive_env_float(f"LW_{name}_BURST", default_burst)),
+        refill_per_sec=1 / _positive_env_float(f"LW_{name}_REFILL_SEC", default_refill_sec),
+    )
+
+
+# по логину: 5 попыток подряд, дальше одна в 12 секунд
+LOGIN_LIMITER = _login_throttle_limiter("LOGIN", 5, 12)
+# по IP: 30 попыток подряд, дальше одна в 2 секунды (склад за одним NAT)
+IP_LIMITER = _login_throttle_limiter("IP", 30, 2)
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def enforce_login_throttle(ip: str, login: Optional[str]) -> None:
+    """
+    Вызывается ДО verify_password: если лимит исчерпан — 429 без argon2.
+    Попытка списывается, только если её пропускают обе корзины: запертый
+    логин не должен расходовать лимит IP (всех, кто за тем же NAT).
+    """
+    login_key = login.strip().lower() if login else None
+    wait = IP_LIMITER.wait_time(ip)
+    if login_key and not wait:
+        wait = LOGIN_LIMITER.wait_time(login_key)
+    if not wait:
+        wait = IP_LIMITER.try_acquire(ip)
+        if login_key and not wait:
+            wait = LOGIN_LIMITER.try_acquire(login_key)
+            if wait:
+                # корзину логина успел опустошить параллельный запрос
+                IP_LIMITER.refund(ip)
+    if wait > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Слишком много попыток входа, попробуйте позже",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+def release_login_throttle(ip: str, login: Optional[str]) -> None:
+    """После успешной проверки пароля возвращаем списанные попытки."""
+    IP_LIMITER.refund(ip)
+    if login:
+        LOGIN_LIMITER.refund(login.strip().lower())
+
+
 # ===============================
 #            МОДЕЛИ БД
 # ===============================
@@ -172,6 +567,9 @@ class Employee(Base):
 
     # === динамический баланс ===
     balance_int: Mapped[int | None] = mapped_column(Integer, nullable=True)              # фактический баланс в рублях
+    # часть баланса, не объяснённая платежами (оклад, ручная правка, почасовые начисления):
+    # balance_int = balance_base + SUM(payments.amount), см. ledger.py
+    balance_base: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     contract_hours_per_month: Mapped[int | None] = mapped_column(Integer, nullable=True) # нормочасы в месяц
     hourly_rate: Mapped[int | None] = mapped_column(Integer, nullable=True)              # ₽/час
     schedule_type: Mapped[str | None] = mapped_column(String(50), nullable=True)         # "office" / None / ...
@@ -181,6 +579,10 @@ class Employee(Base):
     last_balance_update: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    # увеличивается при смене пароля / деактивации — отзывает выданные токены
+    session_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # +1 на каждый UPDATE строки (триггер из миграции 7, код его не трогает) — для ETag
+    row_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
@@ -191,6 +593,7 @@ class Admin(Base):
     login: Mapped[str] = mapped_column(String(50), unique=True, index=True, nullable=False)
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
+    session_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
@@ -210,6 +613,11 @@ class Payment(Base):
     comment: Mapped[str | None] = mapped_column(String(255), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
 
+    __table_args__ = (
+        # постраничная история: WHERE employee_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_payments_emp_created_id", "employee_id", "created_at", "id"),
+    )
+
 
 class EmployeeMonthStat(Base):
     """
@@ -217,6 +625,10 @@ class EmployeeMonthStat(Base):
     Хранится отдельно от основной карточки сотрудника.
     """
     __tablename__ = "employee_month_stats"
+    __table_args__ = (
+        # одна строка на сотрудника и месяц — на этом держится upsert
+        Index("uq_employee_month_stats_emp_month", "employee_id", "year", "month", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     employee_id: Mapped[int] = mapped_column(Integer, index=True, nullable=False)
@@ -226,6 +638,9 @@ class EmployeeMonthStat(Base):
 
     income: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # общий доход за месяц
     salary: Mapped[int | None] = mapped_column(Integer, nullable=True)       # начисленная зарплата
+    # части income/salary, не объяснённые платежами месяца (см. ledger.py)
+    income_base: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    salary_base: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     hours: Mapped[int | None] = mapped_column(Integer, nullable=True)        # отработанные часы
 
     penalties_json: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON-список строк
@@ -233,10 +648,73 @@ class EmployeeMonthStat(Base):
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
 
+
+class EmployeeCard(Base):
+    """
+    Расширенные данные карточки сотрудника (обязанности, навыки, роли,
+    история правок) — строка на сотрудника. Раньше лежали в
+    employee_cards.json, перенесены миграцией 5.
+    """
+    __tablename__ = "employee_cards"
+
+    employee_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    responsibilities_json: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON-список строк
+    skills_json: Mapped[str | None] = mapped_column(Text, nullable=True)            # JSON-список строк
+    roles_json: Mapped[str | None] = mapped_column(Text, nullable=True)             # JSON-список строк
+    # до миграции 6 — вся история правок; теперь она в employee_card_events, колонка пустая
+    history_json: Mapped[str | None] = mapped_column(Text, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # как employees.row_version: триггер миграции 7
+    row_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+
+class EmployeeCardEvent(Base):
+    """
+    Журнал правок карточки (только добавление). Для списков хранится
+    разница: что добавлено и что удалено; для статуса — старое и новое значение.
+    """
+    __tablename__ = "employee_card_events"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    employee_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    field: Mapped[str] = mapped_column(String(50), nullable=False)  # responsibilities / skills / roles / status
+    added_json: Mapped[str | None] = mapped_column(Text, nullable=True)    # JSON-список строк
+    removed_json: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON-список строк
+    old_value: Mapped[str | None] = mapped_column(Text, nullable=True)
+    new_value: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    __table_args__ = (
+        # последние правки и постраничная история: WHERE employee_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_employee_card_events_emp_created_id", "employee_id", "created_at", "id"),
+    )
+
+
+class WalletSnapshot(Base):
+    """
+    Готовый JSON поля data ответа /api/login — строка на сотрудника.
+    Пересобирается в транзакции каждой записи сотрудника; row_version —
+    версия employees, из которой снимок собран (см. write_wallet_snapshots).
+    """
+    __tablename__ = "wallet_snapshots"
+
+    employee_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    format_version: Mapped[int] = mapped_column(Integer, nullable=False)
+    row_version: Mapped[int] = mapped_column(Integer, nullable=False)
+    data_json: Mapped[str] = mapped_column(Text, nullable=False)
+    built_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
 # ===============================
 #         Pydantic-схемы
 # ===============================
 
+PAYMENTS_PAGE_DEFAULT = 50
+PAYMENTS_PAGE_MAX = 200
+
+# сколько последних правок отдаёт сама карточка; остальное — /api/employee/card/history
+CARD_HISTORY_LATEST = int(os.getenv("LW_CARD_HISTORY_LATEST", "20"))
+CARD_HISTORY_PAGE_MAX = 200
+
 
 class LoginRequest(BaseModel):
     role: str   # "employee" или "admin"/"manager"
@@ -248,6 +726,9 @@ class LoginResponse(BaseModel):
     role: str
     login: str
     data: dict
+    # сессионный токен для Authorization: Bearer ...
+    token: Optional[str] = None
+    expires_in: Optional[int] = None
 
 
 class EmployeeBase(BaseModel):
@@ -349,38 +830,97 @@ class PaymentOut(PaymentBaseSchema):
 
 
 class EmployeeSelfPaymentsRequest(BaseModel):
-    """Для /api/employee/payments — история операций по балансу."""
-    login: str
-    password: str
+    """
+    Для /api/employee/payments — история операций по балансу.
+    login/password можно не передавать, если есть Bearer-токен.
+    Страница: cursor из X-Next-Cursor предыдущего ответа, фильтры — как
+    у админского GET /api/employees/{id}/payments.
+    """
+    login: Optional[str] = None
+    password: Optional[str] = None
+    cursor: Optional[str] = None
+    limit: int = Field(PAYMENTS_PAGE_DEFAULT, ge=1, le=PAYMENTS_PAGE_MAX)
+    type: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+
+class PayrollRunLine(BaseModel):
+    employee_id: int
+    amount: int
+    comment: Optional[str] = None
+
+
+class PayrollRunRequest(BaseModel):
+    """
+    Для /api/admin/payroll/run — строка type каждому сотруднику одним пакетом.
+    Либо rule, либо явный список lines:
+      rule="shift_rate" — shift_rate × shifts (shifts_by_employee перекрывает shifts);
+      rule="fixed"      — amount_by_role[shift_role], иначе amount.
+    warehouse / shift_role сужают выборку активных сотрудников для rule.
+    Отрицательная сумма по rule — только для type="fine" (удержание).
+    """
+    type: str = "salary"
+    comment: Optional[str] = None
+    rule: Optional[str] = None
+    warehouse: Optional[str] = None
+    shift_role: Optional[str] = None
+    shifts: Optional[int] = Field(None, ge=0)
+    shifts_by_employee: Dict[int, Annotated[int, Field(ge=0)]] = {}
+    amount: Optional[int] = None
+    amount_by_role: Dict[str, int] = {}
+    lines: Optional[List[PayrollRunLine]] = None
+    dry_run: bool = False
 
 
 class EmployeeSelfCardRequest(BaseModel):
     """
     Для /api/employee/card — получение карточки сотрудника
-    по логину и паролю (как для /api/employee/payments).
+    по логину и паролю (как для /api/employee/payments) или по токену.
     """
-    login: str
-    password: str
+    login: Optional[str] = None
+    password: Optional[str] = None
 
 
 class EmployeeSelfCardUpdateRequest(BaseModel):
     """
     Для /api/employee/card/update — обновление карточки сотрудника
-    самим сотрудником (по логину и паролю).
+    самим сотрудником (по логину и паролю или по токену).
     """
-    login: str
-    password: str
+    login: Optional[str] = None
+    password: Optional[str] = None
     responsibilities: Optional[List[str]] = None
     skills: Optional[List[str]] = None
     roles: Optional[List[str]] = None
     status: Optional[str] = None
 
 
+class EmployeeSelfCardHistoryRequest(BaseModel):
+    """
+    Для /api/employee/card/history — старые правки карточки постранично.
+    cursor — history_cursor карточки или X-Next-Cursor предыдущей страницы.
+    """
+    login: Optional[str] = None
+    password: Optional[str] = None
+    cursor: Optional[str] = None
+    limit: int = Field(CARD_HISTORY_LATEST, ge=1, le=CARD_HISTORY_PAGE_MAX)
+
+
+class CardHistoryEntry(BaseModel):
+    """Одна правка: added/removed — для списков, old/new — для статуса."""
+    timestamp: str
+    field: str
+    added: Optional[List[str]] = None
+    removed: Optional[List[str]] = None
+    old: Optional[str] = None
+    new: Optional[str] = None
+
+
 class EmployeeCardResponse(BaseModel):
     """
     Объединённая карточка сотрудника:
-    - базовые данные из БД
-    - расширенные данные из JSON
+    - базовые данные из employees
+    - расширенные данные из employee_cards
     """
     id: int
     full_name: str
@@ -395,7 +935,10 @@ class EmployeeCardResponse(BaseModel):
     responsibilities: List[str] = []
     skills: List[str] = []
     roles: List[str] = []
-    history: List[dict] = []
+    # последние CARD_HISTORY_LATEST правок, старые -> новые
+    history: List[CardHistoryEntry] = []
+    # курсор для /api/employee/card/history, если есть правки старше
+    history_cursor: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -433,9 +976,35 @@ def int_to_money(value: int) -> str:
     return f"{s} ₽"
 
 
+def employee_card_extra(card: Optional[EmployeeCard]) -> dict:
+    """Строка employee_cards -> словарь responsibilities/skills/roles."""
+    if card is None:
+        return {"responsibilities": [], "skills": [], "roles": []}
+    return {
+        "responsibilities": json_loads_list(card.responsibilities_json),
+        "skills": json_loads_list(card.skills_json),
+        "roles": json_loads_list(card.roles_json),
+    }
+
+
+def load_employee_card(db: Session, emp_id: int) -> dict:
+    """
+    Расширенные данные карточки одного сотрудника: строка employee_cards по PK
+    и последние CARD_HISTORY_LATEST правок из журнала (по индексу).
+    """
+    extra = employee_card_extra(db.get(EmployeeCard, emp_id))
+    rows = db.execute(card_history_page_query(emp_id, None, CARD_HISTORY_LATEST)).scalars().all()
+    page = rows[:CARD_HISTORY_LATEST]
+    extra["history"] = [card_event_entry(event) for event in reversed(page)]
+    extra["history_cursor"] = (
+        encode_keyset_cursor(page[-1].created_at, page[-1].id) if len(rows) > CARD_HISTORY_LATEST else None
+    )
+    return extra
+
+
 def build_employee_card(emp: Employee, extra: Optional[dict]) -> EmployeeCardResponse:
     """
-    Собираем карточку сотрудника из ORM-модели и JSON-дополнения.
+    Собираем карточку сотрудника из ORM-модели и расширенных данных (employee_cards).
     Используем cast(...) чтобы Pylance не ругался на Column[int]/Column[str].
     """
     extra = extra or {}
@@ -453,29 +1022,121 @@ def build_employee_card(emp: Employee, extra: Optional[dict]) -> EmployeeCardRes
         skills=extra.get("skills") or [],
         roles=extra.get("roles") or [],
         history=extra.get("history") or [],
+        history_cursor=extra.get("history_cursor"),
+    )
+
+
+def build_employee_detail(emp: Employee) -> EmployeeDetail:
+    penalties = json_loads_list(emp.penalties_json)
+    absences = json_loads_list(emp.absences_json)
+    return EmployeeDetail(
+        id=emp.id,
+        login=emp.login,
+        initials=emp.initials,
+        name=emp.name,
+        position=emp.position,
+        rate=emp.rate,
+        experience=emp.experience,
+        status=emp.status,
+        salary=emp.salary,
+        hours=emp.hours,
+        hours_detail=emp.hours_detail,
+        penalties=penalties,
+        absences=absences,
+        error_text=emp.error_text,
+        photo_url=emp.photo_url,
+        is_active=emp.is_active,
+        password_plain=emp.password_plain,
     )
 
 
-def is_office_work_time(dt: datetime, start_hour: int, end_hour: int) -> bool:
+def build_employee_login_data(emp: Employee, months: List[dict]) -> dict:
+    """Данные кошелька сотрудника, которые отдаёт /api/login."""
+    return {
+        "id": emp.id,
+        "initials": emp.initials,
+        "name": emp.name,
+        "position": emp.position,
+        "rate": emp.rate,
+        "experience": emp.experience,
+        "status": emp.status,
+        "salary": emp.salary,
+        "hours": emp.hours,
+        "hoursDetail": emp.hours_detail,
+        "penalties": json_loads_list(emp.penalties_json),
+        "absences": json_loads_list(emp.absences_json),
+        "errorText": emp.error_text or "",
+        "photo_url": emp.photo_url,
+        "months": months,
+    }
+
+
+def build_employee_workbook(emp: Employee) -> io.BytesIO:
+    """XLSX-карточка сотрудника (openpyxl, CPU — вызывать вне event loop)."""
+    # openpyxl тяжёлый на импорт — грузим при первом экспорте, а не на старте
+    from openpyxl import Workbook
+    from openpyxl.worksheet.worksheet import Worksheet
+
+    wb = Workbook()
+    ws = cast(Worksheet, wb.active)
+    ws.title = "Карточка сотрудника"
+
+    penalties = json_loads_list(emp.penalties_json)
+    absences = json_loads_list(emp.absences_json)
+
+    data_rows = [
+        ("ФИО", emp.name),
+        ("Логин", emp.login),
+        ("Должность", emp.position),
+        ("Оклад", emp.rate),
+        ("Стаж", emp.experience),
+        ("Статус", emp.status),
+        ("Баланс", emp.salary),
+        ("Отработанное время", emp.hours),
+        ("Детализация времени", emp.hours_detail),
+        ("Штрафы и дисциплина", "\n".join(penalties)),
+        ("Больничные и отсутствия", "\n".join(absences)),
+        ("Примечание / ошибка", emp.error_text),
+    ]
+
+    row_idx = 1
+    for label, value in data_rows:
+        ws.cell(row=row_idx, column=1, value=label) # type: ignore
+        ws.cell(row=row_idx, column=2, value=value)
+        row_idx += 1
+
+    bio = io.BytesIO()
+    wb.save(bio)
+    bio.seek(0)
+    return bio
+
+
+def is_office_work_time(
+    dt: datetime, start_hour: int, end_hour: int, warehouse: Optional[str] = None
+) -> bool:
     """
-    Простейшая модель: офисники работают Пн–Пт с start_hour до end_hour (без учёта обеда).
+    Офисники работают с start_hour до end_hour (без учёта обеда) в рабочие дни
+    производственного календаря (праздники, переносы, сокращённые дни).
     """
-    if dt.weekday() >= 5:  # 5,6 = сб, вс
-        return False
-    h = dt.hour
-    if start_hour <= end_hour:
-        return start_hour <= h < end_hour
-    # если смена «через ночь»
-    return h >= start_hour or h < end_hour
+    return WORK_CALENDAR.is_working_hour(dt, start_hour, end_hour, warehouse)
 
 
+def set_balance_outside_ledger(emp: Employee, balance: int) -> None:
+    """
+    Баланс меняется не платежом (оклад при создании, ручная правка админом):
+    сдвигаем balance_base на ту же величину, чтобы сверка с журналом
+    платежей (ledger.py) сходилась.
+    """
+    emp.balance_base = (emp.balance_base or 0) + balance - (emp.balance_int or 0)
+    emp.balance_int = balance
+
 
 def ensure_emp_balance_initialized(emp: Employee) -> None:
     """
     Гарантируем, что balance_int и salary синхронизированы.
     """
     if emp.balance_int is None:
-        emp.balance_int = money_to_int(emp.salary or "0")
+        set_balance_outside_ledger(emp, money_to_int(emp.salary or "0"))
 
     balance: int = emp.balance_int or 0
     emp.balance_int = balance
@@ -484,49 +1145,47 @@ def ensure_emp_balance_initialized(emp: Employee) -> None:
         emp.salary = int_to_money(balance)
 
 
-def accrue_balance_for_employee(emp: Employee, now: Optional[datetime] = None) -> None:
+def compute_accrual(
+    last_balance_update: Optional[datetime],
+    balance_int: Optional[int],
+    salary: Optional[str],
+    hourly_rate: int,
+    work_start_hour: Optional[int],
+    work_end_hour: Optional[int],
+    warehouse: Optional[str],
+    now: datetime,
+) -> Optional[tuple[int, str, datetime]]:
     """
-    Обновляет баланс сотрудника в БД по почасовой ставке.
-    Для простоты:
-      - автоматом считаем только для schedule_type == 'office'
-      - берём каждый полный час между last_balance_update и now,
-        если час попадает в рабочее время – начисляем hourly_rate.
+    Почасовое начисление офисника на момент now.
+    За каждый полный час между last_balance_update и now, попадающий
+    в рабочее время по производственному календарю, — hourly_rate.
+    Возвращает (balance_int, salary, last_balance_update) или None, если
+    менять нечего.
     """
-    if emp.schedule_type != "office":
-        return
-    if not emp.hourly_rate:
-        return
-
-    if now is None:
-        now = datetime.utcnow()
+    # инициализация баланса (как ensure_emp_balance_initialized)
+    balance = balance_int if balance_int is not None else money_to_int(salary or "0")
+    salary_str = salary if salary is not None else int_to_money(balance)
 
-    # инициализация
-    if emp.last_balance_update is None:
-        emp.last_balance_update = now
-        ensure_emp_balance_initialized(emp)
-        return
+    if last_balance_update is None:
+        return balance, salary_str, now
 
-    cursor = emp.last_balance_update.replace(minute=0, second=0, microsecond=0)
+    cursor = last_balance_update.replace(minute=0, second=0, microsecond=0)
     if cursor >= now:
-        return
+        return None
 
-    hours_to_pay = 0
-    while cursor + timedelta(hours=1) <= now:
-        start_h = emp.work_start_hour or 8
-        end_h = emp.work_end_hour or 19
-        if is_office_work_time(cursor, start_h, end_h):
-            hours_to_pay += 1
-        cursor += timedelta(hours=1)
+    # сколько полных часов прошло — все они считаются закрытыми
+    slots = (now - cursor) // timedelta(hours=1)
+    end = cursor + timedelta(hours=slots)
+    if end == last_balance_update:
+        return None
 
+    hours_to_pay = WORK_CALENDAR.working_hours_between(
+        cursor, end, work_start_hour or 8, work_end_hour or 19, warehouse
+    )
     if hours_to_pay > 0:
-        ensure_emp_balance_initialized(emp)
-        balance: int = emp.balance_int or 0
-        rate: int = emp.hourly_rate or 0
-        balance += hours_to_pay * rate
-        emp.balance_int = balance
-        emp.salary = int_to_money(balance)
-
-    emp.last_balance_update = cursor
+        balance += hours_to_pay * hourly_rate
+        salary_str = int_to_money(balance)
+    return balance, salary_str, end
 
 
 MONTH_META = {
@@ -545,40 +1204,44 @@ MONTH_META = {
 }
 
 
-def build_months_for_employee(db: Session, emp_id: int) -> List[dict]:
-    """Отдаём месяцы в удобном для фронта формате."""
-    stats = (
-        db.query(EmployeeMonthStat)
+def month_key_for(month: int) -> str:
+    return MONTH_META.get(month, {"key": str(month)})["key"]
+
+
+def month_stat_entry(s: EmployeeMonthStat) -> dict:
+    """Месяц в удобном для фронта формате."""
+    meta = MONTH_META.get(s.month, None)
+    if meta:
+        key = s.month_key or meta["key"]
+        short = meta["short"]
+        full = meta["full"]
+    else:
+        key = s.month_key or str(s.month)
+        short = key
+        full = key
+    return {
+        "key": key,
+        "short": short,
+        "fullName": full,
+        "year": s.year,
+        "month": s.month,
+        "income": s.income,
+        "salary": s.salary,
+        "hours": s.hours,
+        "penalties": json_loads_list(s.penalties_json),
+        "absences": json_loads_list(s.absences_json),
+    }
+
+
+def build_months_for_employee(db: Session, emp_id: int) -> List[dict]:
+    """Отдаём месяцы в удобном для фронта формате."""
+    stats = (
+        db.query(EmployeeMonthStat)
         .filter(EmployeeMonthStat.employee_id == emp_id)
         .order_by(EmployeeMonthStat.year.asc(), EmployeeMonthStat.month.asc())
         .all()
     )
-    result: List[dict] = []
-    for s in stats:
-        meta = MONTH_META.get(s.month, None)
-        if meta:
-            key = s.month_key or meta["key"]
-            short = meta["short"]
-            full = meta["full"]
-        else:
-            key = s.month_key or str(s.month)
-            short = key
-            full = key
-        result.append(
-            {
-                "key": key,
-                "short": short,
-                "fullName": full,
-                "year": s.year,
-                "month": s.month,
-                "income": s.income,
-                "salary": s.salary,
-                "hours": s.hours,
-                "penalties": json_loads_list(s.penalties_json),
-                "absences": json_loads_list(s.absences_json),
-            }
-        )
-    return result
+    return [month_stat_entry(s) for s in stats]
 
 
 def seed_month_stats_for_employee(
@@ -605,6 +1268,8 @@ def seed_month_stats_for_employee(
             month_key=m["key"],
             income=m["income"],
             salary=m.get("salary"),
+            income_base=m["income"],
+            salary_base=m.get("salary") or 0,
             hours=m.get("hours"),
             penalties_json=json_dumps_list(m.get("penalties", [])),
             absences_json=json_dumps_list(m.get("absences", [])),
@@ -612,6 +1277,49 @@ def seed_month_stats_for_employee(
         db.add(stat)
 
 
+def apply_payment_to_balance(db: Session, emp_id: int, amount: int) -> Optional[int]:
+    """
+    balance_int += amount одним UPDATE ... RETURNING: приращение считает сама
+    БД, параллельные платежи не затирают друг друга (раньше баланс читался
+    в Python и писался обратно). salary форматируется из возвращённого значения.
+    Возвращает новый баланс или None, если сотрудника нет.
+    """
+    stmt = (
+        update(Employee)
+        .where(Employee.id == emp_id, Employee.balance_int.is_not(None))
+        .values(balance_int=Employee.balance_int + amount)
+        .returning(Employee.balance_int)
+    )
+    balance = db.execute(stmt).scalar()
+    if balance is None:
+        # баланс ещё не инициализирован из salary — разово, затем тот же UPDATE
+        emp = db.get(Employee, emp_id)
+        if emp is None:
+            return None
+        ensure_emp_balance_initialized(emp)
+        db.flush()
+        balance = db.execute(stmt).scalar_one()
+
+    db.execute(
+        update(Employee).where(Employee.id == emp_id).values(salary=int_to_money(balance))
+    )
+    return balance
+
+
+def delete_payment_returning(employee_id: int, payment_id: int):
+    """
+    DELETE платежа с возвратом полей, нужных для отката баланса и месяца.
+    Платёж чужого сотрудника не удаляется: id из URL — тот, чей кэш сбросится.
+    """
+    return (
+        delete(Payment)
+        .where(Payment.id == payment_id, Payment.employee_id == employee_id)
+        .returning(
+            Payment.employee_id, Payment.amount, Payment.created_at, Payment.type, Payment.comment
+        )
+    )
+
+
 def update_month_stat_on_payment(
     db: Session,
     emp_id: int,
@@ -629,82 +1337,609 @@ def update_month_stat_on_payment(
     year = created_at.year
     month = created_at.month
 
-    stat = (
-        db.query(EmployeeMonthStat)
-        .filter(
-            EmployeeMonthStat.employee_id == emp_id,
-            EmployeeMonthStat.year == year,
-            EmployeeMonthStat.month == month,
+    sign = -1 if reverse else 1
+    delta = sign * amount_diff
+    is_salary = payment_type == "salary"
+
+    if reverse:
+        # если удаляем операцию, а статы нет — UPDATE просто ничего не затронет
+        values = {"income": func.coalesce(EmployeeMonthStat.income, 0) + delta}
+        if is_salary:
+            values["salary"] = func.coalesce(EmployeeMonthStat.salary, 0) + delta
+        db.execute(
+            update(EmployeeMonthStat)
+            .where(
+                EmployeeMonthStat.employee_id == emp_id,
+                EmployeeMonthStat.year == year,
+                EmployeeMonthStat.month == month,
+            )
+            .values(**values)
+        )
+        return
+
+    # один INSERT ... ON CONFLICT DO UPDATE: приращение считает сама БД,
+    # параллельные платежи не теряют друг друга и не плодят дубли месяца
+    stmt = sqlite_insert(EmployeeMonthStat).values(
+        employee_id=emp_id,
+        year=year,
+        month=month,
+        month_key=month_key_for(month),
+        income=delta,
+        salary=delta if is_salary else 0,
+        hours=None,
+        penalties_json=json_dumps_list([]),
+        absences_json=json_dumps_list([]),
+        created_at=datetime.utcnow(),
+    )
+    on_conflict = {"income": func.coalesce(EmployeeMonthStat.income, 0) + stmt.excluded.income}
+    if is_salary:
+        on_conflict["salary"] = func.coalesce(EmployeeMonthStat.salary, 0) + stmt.excluded.salary
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["employee_id", "year", "month"],
+            set_=on_conflict,
         )
-        .first()
     )
 
-    if not stat:
-        # если удаляем операцию, а стата нет — ничего не делаем
-        if reverse:
-            return
-        meta = MONTH_META.get(month, {"key": str(month)})
-        stat = EmployeeMonthStat(
-            employee_id=emp_id,
-            year=year,
-            month=month,
-            month_key=meta["key"],
-            income=0,
-            salary=0,
-            hours=None,
-            penalties_json=json_dumps_list([]),
-            absences_json=json_dumps_list([]),
+
+# ---------- ПОСТРАНИЧНАЯ ИСТОРИЯ ПЛАТЕЖЕЙ ----------
+
+def encode_keyset_cursor(created_at: datetime, row_id: int) -> str:
+    """Непрозрачный курсор: позиция (created_at, id) последней строки страницы."""
+    raw = json.dumps({"t": created_at.isoformat(), "i": row_id}, separators=(",", ":"))
+    return _b64encode(raw.encode("utf-8"))
+
+
+def decode_keyset_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        data = json.loads(_b64decode(cursor))
+        return datetime.fromisoformat(data["t"]), int(data["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+def encode_payments_cursor(payment: Payment) -> str:
+    return encode_keyset_cursor(payment.created_at, payment.id)
+
+
+def decode_payments_cursor(cursor: str) -> tuple[datetime, int]:
+    return decode_keyset_cursor(cursor)
+
+
+def payments_page_query(
+    employee_id: int,
+    cursor: Optional[str],
+    limit: int,
+    payment_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """
+    Страница истории: новые сверху, keyset по (created_at, id) на индексе
+    ix_payments_emp_created_id. Берём limit + 1 строку — лишняя говорит,
+    что есть следующая страница. date_to включительно.
+    """
+    stmt = select(Payment).where(Payment.employee_id == employee_id)
+    if payment_type:
+        stmt = stmt.where(Payment.type == payment_type)
+    if date_from:
+        stmt = stmt.where(Payment.created_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        stmt = stmt.where(
+            Payment.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time())
         )
-        db.add(stat)
-        db.flush()
+    if cursor:
+        created_at, payment_id = decode_payments_cursor(cursor)
+        stmt = stmt.where(tuple_(Payment.created_at, Payment.id) < tuple_(created_at, payment_id))
+    return stmt.order_by(Payment.created_at.desc(), Payment.id.desc()).limit(limit + 1)
 
-    sign = -1 if reverse else 1
-    delta = sign * amount_diff
 
-    current_income = stat.income or 0
-    stat.income = current_income + delta
+def split_payments_page(rows: List[Payment], limit: int, response: Response) -> List[Payment]:
+    """Отрезаем лишнюю строку; если она была — курсор следующей страницы в X-Next-Cursor."""
+    page = list(rows[:limit])
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = encode_payments_cursor(page[-1])
+    return page
+
+
+# ---------- ИСТОРИЯ ПРАВОК КАРТОЧКИ ----------
+
+def list_diff(old: Optional[List[str]], new: List[str]) -> tuple[List[str], List[str]]:
+    """
+    (добавлено, удалено) между двумя списками с учётом повторов, в порядке
+    появления. Перестановка без изменения состава даёт две пустые части.
+    """
+    old_counts = Counter(old or [])
+    new_counts = Counter(new)
+    added = list((new_counts - old_counts).elements())
+    removed = list((old_counts - new_counts).elements())
+    return added, removed
+
+
+def card_event_entry(event: EmployeeCardEvent) -> dict:
+    entry = {"timestamp": event.created_at.isoformat(timespec="seconds"), "field": event.field}
+    if event.field == "status":
+        entry["old"] = event.old_value
+        entry["new"] = event.new_value
+    else:
+        entry["added"] = json_loads_list(event.added_json)
+        entry["removed"] = json_loads_list(event.removed_json)
+    return entry
+
 
-    if payment_type == "salary":
-        current_salary = stat.salary or 0
-        stat.salary = current_salary + delta
+def card_history_page_query(employee_id: int, cursor: Optional[str], limit: int):
+    """
+    Правки карточки, новые сверху, keyset по (created_at, id) на индексе
+    ix_employee_card_events_emp_created_id. limit + 1 строка — как у платежей.
+    """
+    stmt = select(EmployeeCardEvent).where(EmployeeCardEvent.employee_id == employee_id)
+    if cursor:
+        created_at, event_id = decode_keyset_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(EmployeeCardEvent.created_at, EmployeeCardEvent.id) < tuple_(created_at, event_id)
+        )
+    return stmt.order_by(EmployeeCardEvent.created_at.desc(), EmployeeCardEvent.id.desc()).limit(limit + 1)
 
 
 # ===============================
-#        ИНИЦИАЛИЗАЦИЯ БД
+#   СНИМКИ КОШЕЛЬКА (wallet_snapshots)
 # ===============================
+# data ответа /api/login хранится готовым JSON: вход после проверки пароля —
+# одно чтение строки без месяцев и разбора JSON-колонок. Снимок пишется в той
+# же транзакции, что и изменения сотрудника; запись мимо этих путей (другой
+# код, прямой SQL, почасовое начисление офисникам) меняет employees.row_version,
+# и вход пересобирает снимок сам.
+
+# меняется вместе с формой build_employee_login_data — старые снимки пересоберутся
+WALLET_SNAPSHOT_FORMAT = 1
+WALLET_SNAPSHOT_BATCH = 500
+
+WALLET_SNAPSHOT_STATS: dict = {
+    "served": 0,
+    "rebuilt_on_login": 0,
+    "write_failed": 0,
+    "last_rebuild_all": None,
+}
+
 
-def init_db():
-    """Создаём таблицы и демо-данные."""
-    Base.metadata.create_all(bind=engine)
+def write_wallet_snapshots(db: Session, employee_ids: Iterable[int]) -> Dict[int, str]:
+    """
+    Пересобирает снимки сотрудников в текущей транзакции (без коммита) и
+    возвращает JSON по id. Сотрудники перечитываются из БД: row_version
+    после UPDATE выставил триггер, ORM о нём не знает.
+    """
+    ids = sorted(set(employee_ids))
+    if not ids:
+        return {}
+    db.flush()
+    t = WalletSnapshot.__table__
+    stmt = sqlite_insert(t)
+    upsert = stmt.on_conflict_do_update(
+        index_elements=[t.c.employee_id],
+        set_={
+            "format_version": stmt.excluded.format_version,
+            "row_version": stmt.excluded.row_version,
+            "data_json": stmt.excluded.data_json,
+            "built_at": stmt.excluded.built_at,
+        },
+    )
+    now = datetime.utcnow()
+    built: Dict[int, str] = {}
+    for start in range(0, len(ids), WALLET_SNAPSHOT_BATCH):
+        batch = ids[start:start + WALLET_SNAPSHOT_BATCH]
+        employees = db.execute(
+            select(Employee)
+            .where(Employee.id.in_(batch))
+            .execution_options(populate_existing=True)
+        ).scalars().all()
+        months: Dict[int, List[dict]] = defaultdict(list)
+        stats = db.execute(
+            select(EmployeeMonthStat)
+            .where(EmployeeMonthStat.employee_id.in_(batch))
+            .order_by(EmployeeMonthStat.employee_id, EmployeeMonthStat.year, EmployeeMonthStat.month)
+        ).scalars()
+        for s in stats:
+            months[s.employee_id].append(month_stat_entry(s))
+
+        rows = []
+        for emp in employees:
+            data_json = json.dumps(
+                build_employee_login_data(emp, months[emp.id]),
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            built[emp.id] = data_json
+            rows.append({
+                "employee_id": emp.id,
+                "format_version": WALLET_SNAPSHOT_FORMAT,
+                "row_version": emp.row_version,
+                "data_json": data_json,
+                "built_at": now,
+            })
+        if rows:
+            db.execute(upsert, rows)
+    return built
+
+
+def rebuild_all_wallet_snapshots(batch_size: int = WALLET_SNAPSHOT_BATCH) -> int:
+    """
+    Все снимки заново, пачка — своя транзакция. Для смены формата,
+    массовых правок мимо API и ремонта журнала (месяцы без строки employees).
+    """
+    started = time.perf_counter()
     db = SessionLocal()
     try:
-        # добавляем колонку password_plain, если её нет
-        try:
-            db.execute(text("ALTER TABLE employees ADD COLUMN password_plain VARCHAR(255);"))
+        ids = db.execute(select(Employee.id).order_by(Employee.id)).scalars().all()
+        for start in range(0, len(ids), batch_size):
+            write_wallet_snapshots(db, ids[start:start + batch_size])
             db.commit()
-        except Exception:
-            db.rollback()
+            db.expunge_all()
+        db.execute(delete(WalletSnapshot).where(WalletSnapshot.employee_id.not_in(select(Employee.id))))
+        db.commit()
+    finally:
+        db.close()
+    WALLET_SNAPSHOT_STATS["last_rebuild_all"] = {
+        "at": datetime.utcnow().isoformat(timespec="seconds"),
+        "employees": len(ids),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    return len(ids)
 
-        # --- добавляем новые колонки, если их ещё нет ---
-        for ddl in [
-            "ALTER TABLE employees ADD COLUMN balance_int INTEGER;",
-            "ALTER TABLE employees ADD COLUMN contract_hours_per_month INTEGER;",
-            "ALTER TABLE employees ADD COLUMN hourly_rate INTEGER;",
-            "ALTER TABLE employees ADD COLUMN schedule_type VARCHAR(50);",
-            "ALTER TABLE employees ADD COLUMN work_start_hour INTEGER;",
-            "ALTER TABLE employees ADD COLUMN work_end_hour INTEGER;",
-            "ALTER TABLE employees ADD COLUMN last_balance_update DATETIME;",
-            "ALTER TABLE employees ADD COLUMN warehouse VARCHAR(255);",
-            "ALTER TABLE employees ADD COLUMN shift_role VARCHAR(50);",
-            "ALTER TABLE employees ADD COLUMN on_shift BOOLEAN DEFAULT 0;",
-            "ALTER TABLE employees ADD COLUMN shift_rate INTEGER;",
-        ]:
-            try:
-                db.execute(text(ddl))
-                db.commit()
-            except Exception:
-                db.rollback()
 
+def wallet_snapshot_json(db: Session, emp: Employee, snapshot: Optional[WalletSnapshot]) -> str:
+    """
+    data для /api/login: готовый снимок, если он собран из текущей версии
+    сотрудника, иначе пересобранный и сохранённый.
+    """
+    if (
+        snapshot is not None
+        and snapshot.format_version == WALLET_SNAPSHOT_FORMAT
+        and snapshot.row_version == emp.row_version
+    ):
+        WALLET_SNAPSHOT_STATS["served"] += 1
+        return snapshot.data_json
+
+    WALLET_SNAPSHOT_STATS["rebuilt_on_login"] += 1
+    data_json = write_wallet_snapshots(db, [emp.id])[emp.id]
+    try:
+        db.commit()
+    except OperationalError:
+        # база занята писателем — вход не ломаем, снимок соберёт следующий
+        db.rollback()
+        WALLET_SNAPSHOT_STATS["write_failed"] += 1
+    return data_json
+
+
+def employee_login_response(login_value: str, emp: Employee, data_json: str) -> Response:
+    """LoginResponse сотрудника с data из снимка — без повторной сериализации."""
+    head = json.dumps({"role": "employee", "login": login_value}, ensure_ascii=False, separators=(",", ":"))
+    tail = json.dumps(
+        {
+            "token": issue_session_token("employee", emp.id, emp.session_version or 0),
+            "expires_in": SESSION_TTL_SECONDS,
+        },
+        separators=(",", ":"),
+    )
+    return Response(content=f'{head[:-1]},"data":{data_json},{tail[1:]}', media_type="application/json")
+
+
+# ===============================
+#   ETag И УСЛОВНЫЕ ЗАПРОСЫ
+# ===============================
+# Клиент присылает ETag прошлого ответа в If-None-Match; если версия данных
+# не изменилась — 304 без тела, строки не читаются и не сериализуются.
+# ETag — хеш версии данных (row_version строк, COUNT/MAX(id) для журналов,
+# которые только дополняются; у платежей — ещё и row_version сотрудника, см.
+# payments_version) и параметров запроса, а не тела ответа.
+
+# меняется вместе с форматом ответов этих эндпоинтов — старые ETag перестают совпадать
+ETAG_FORMAT_VERSION = 1
+ETAG_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(kind: str, *parts) -> str:
+    raw = json.dumps([ETAG_FORMAT_VERSION, kind, *parts], default=str, separators=(",", ":"))
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match: список ETag через запятую или "*"; W/ при сравнении не учитывается."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def conditional_response(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Ставит ETag на ответ; если клиент прислал тот же — возвращает готовый 304,
+    который эндпоинт отдаёт сразу. POST-чтения (учётные данные сотрудника в
+    теле) обрабатываются так же — это безопасные запросы, а не изменения.
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL})
+    return None
+
+
+def employees_list_version(db: Session) -> tuple:
+    """
+    Версия списка сотрудников: любой UPDATE увеличивает сумму row_version,
+    новый сотрудник — COUNT и MAX(id). По всем строкам, не только активным:
+    деактивация — тоже UPDATE.
+    """
+    row = db.execute(
+        select(func.count(), func.max(Employee.id), func.sum(Employee.row_version))
+    ).one()
+    return tuple(row)
+
+
+def employee_row_version(db: Session, employee_id: int) -> Optional[int]:
+    return db.execute(select(Employee.row_version).where(Employee.id == employee_id)).scalar()
+
+
+def payments_version(db: Session, employee_id: int) -> tuple:
+    """
+    Платежи не меняются, только добавляются и удаляются. COUNT и MAX(id) одни
+    не годятся: без AUTOINCREMENT SQLite отдаёт id удалённого последнего
+    платежа следующему — «удалил и ввёл заново» дало бы ту же пару. Каждое
+    создание и удаление платежа меняет баланс сотрудника, а значит и
+    employees.row_version; COUNT/MAX(id) остаются для вставок мимо баланса.
+    """
+    row = db.execute(
+        select(
+            select(Employee.row_version).where(Employee.id == employee_id).scalar_subquery(),
+            func.count(),
+            func.max(Payment.id),
+        ).where(Payment.employee_id == employee_id)
+    ).one()
+    return tuple(row)
+
+
+def card_history_version(db: Session, employee_id: int) -> Optional[int]:
+    """Журнал правок только дополняется: хватает MAX(id)."""
+    return db.execute(
+        select(func.max(EmployeeCardEvent.id)).where(EmployeeCardEvent.employee_id == employee_id)
+    ).scalar()
+
+
+def card_version(db: Session, employee_id: int) -> tuple:
+    """Карточка = строка employees + строка employee_cards + последние правки."""
+    row = db.execute(
+        select(
+            Employee.row_version,
+            EmployeeCard.row_version,
+            select(func.max(EmployeeCardEvent.id))
+            .where(EmployeeCardEvent.employee_id == employee_id)
+            .scalar_subquery(),
+        )
+        .select_from(Employee)
+        .outerjoin(EmployeeCard, EmployeeCard.employee_id == Employee.id)
+        .where(Employee.id == employee_id)
+    ).one()
+    return tuple(row) + (CARD_HISTORY_LATEST,)
+
+
+def self_payments_etag(payload: EmployeeSelfPaymentsRequest, employee_id: int, version: tuple) -> str:
+    return make_etag(
+        "payments", employee_id, payload.cursor, payload.limit,
+        payload.type, payload.date_from, payload.date_to, *version,
+    )
+
+
+# ===============================
+#     ФОНОВОЕ НАЧИСЛЕНИЕ БАЛАНСА
+# ===============================
+
+ACCRUAL_INTERVAL_SEC = float(os.getenv("LW_ACCRUAL_INTERVAL_SEC", "300"))
+
+ACCRUAL_STATS: dict = {
+    "runs": 0,
+    "last_run_at": None,
+    "last_duration_ms": None,
+    "last_rows_touched": 0,
+    "last_error": None,
+}
+
+
+def accrue_all_office_employees(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Начисляет всем активным офисникам (schedule_type == 'office') за прошедшие часы.
+    Один SELECT нужных колонок, расчёт часов по календарю и один executemany UPDATE
+    в общей транзакции. UPDATE срабатывает, только если last_balance_update и
+    balance_int не изменились с момента чтения (иначе строка доначислится
+    в следующий прогон) — так параллельные платежи и другие воркеры
+    не приводят к двойному начислению. Снимки кошелька здесь не пишутся:
+    на тысячах сотрудников это держало бы блокировку записи секундами, а
+    row_version после UPDATE и так заставит вход пересобрать снимок.
+    Возвращает число обновлённых строк.
+    """
+    if now is None:
+        now = datetime.utcnow()
+
+    rows = db.execute(
+        select(
+            Employee.id,
+            Employee.last_balance_update,
+            Employee.balance_int,
+            Employee.salary,
+            Employee.hourly_rate,
+            Employee.work_start_hour,
+            Employee.work_end_hour,
+            Employee.warehouse,
+        ).where(
+            Employee.schedule_type == "office",
+            Employee.hourly_rate > 0,
+            Employee.is_active == True,
+        )
+    ).all()
+
+    params = []
+    for row in rows:
+        result = compute_accrual(
+            row.last_balance_update,
+            row.balance_int,
+            row.salary,
+            row.hourly_rate,
+            row.work_start_hour,
+            row.work_end_hour,
+            row.warehouse,
+            now,
+        )
+        if result is None:
+            continue
+        balance, salary_str, last_update = result
+        params.append(
+            {
+                "b_id": row.id,
+                "b_prev_last": row.last_balance_update,
+                "b_prev_balance": row.balance_int,
+                "b_balance": balance,
+                # начисление не проходит через payments — уходит в balance_base
+                "b_base_delta": balance - (row.balance_int or 0),
+                "b_salary": salary_str,
+                "b_last": last_update,
+            }
+        )
+
+    if not params:
+        return 0
+
+    t = Employee.__table__
+    stmt = (
+        update(t)
+        .where(
+            t.c.id == bindparam("b_id"),
+            t.c.last_balance_update.is_not_distinct_from(bindparam("b_prev_last", type_=DateTime)),
+            t.c.balance_int.is_not_distinct_from(bindparam("b_prev_balance", type_=Integer)),
+        )
+        .values(
+            balance_int=bindparam("b_balance"),
+            balance_base=t.c.balance_base + bindparam("b_base_delta", type_=Integer),
+            salary=bindparam("b_salary"),
+            last_balance_update=bindparam("b_last"),
+        )
+    )
+    result = db.execute(stmt, params)
+    return max(result.rowcount or 0, 0)
+
+
+def run_accrual_once() -> int:
+    """Один прогон фонового начисления со статистикой для /api/admin/metrics."""
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        touched = accrue_all_office_employees(db)
+        db.commit()
+        if touched:
+            READ_CACHE.invalidate_all()
+        ACCRUAL_STATS["last_error"] = None
+    except Exception as exc:
+        db.rollback()
+        touched = 0
+        ACCRUAL_STATS["last_error"] = repr(exc)
+    finally:
+        db.close()
+    ACCRUAL_STATS["runs"] += 1
+    ACCRUAL_STATS["last_run_at"] = datetime.utcnow().isoformat(timespec="seconds")
+    ACCRUAL_STATS["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    ACCRUAL_STATS["last_rows_touched"] = touched
+    return touched
+
+
+class BackgroundAccrualJob:
+    """
+    Периодический прогон run_accrual_once в фоновом потоке процесса.
+    Первый прогон — сразу при старте (догоняем пропущенное время).
+    """
+
+    def __init__(self, interval_sec: float):
+        self.interval_sec = interval_sec
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval_sec <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="lw-accrual", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            run_accrual_once()
+            self._stop.wait(self.interval_sec)
+
+
+ACCRUAL_JOB = BackgroundAccrualJob(ACCRUAL_INTERVAL_SEC)
+
+
+# ===============================
+#        ИНИЦИАЛИЗАЦИЯ БД
+# ===============================
+
+# демо-сотрудники/админы и их помесячная статистика — только по явному флагу
+SEED_DEMO = os.getenv("LW_SEED_DEMO") == "1"
+
+STARTUP_STATS: dict = {
+    "init_db_ms": None,
+    "startup_ms": None,
+    "migrations_applied": [],
+    "schema_version": None,
+}
+
+
+def init_lock_path() -> Path:
+    """Файл блокировки старта — рядом с файлом SQLite, иначе в BASE_DIR."""
+    override = os.getenv("LW_INIT_LOCK")
+    if override:
+        return Path(override)
+    database = engine.url.database
+    if engine.url.get_backend_name() == "sqlite" and database and database != ":memory:":
+        return Path(database + ".init.lock")
+    return BASE_DIR / ".init.lock"
+
+
+def init_db() -> List[int]:
+    """
+    Приводим схему к последней версии (migrations.py). Если версия в
+    schema_version уже последняя — create_all и миграции не запускаются.
+    Демо-данные — только при LW_SEED_DEMO=1. Возвращает номера применённых
+    миграций.
+
+    При нескольких воркерах (uvicorn --workers / gunicorn) работу делает
+    один — под файловой блокировкой; остальные ждут её и перепроверяют
+    версию. Если схема актуальна и сидить нечего, блокировка не берётся.
+    """
+    if migrations.is_current(engine) and not SEED_DEMO:
+        return []
+
+    applied: List[int] = []
+    with startup_lock(init_lock_path()):
+        # пока ждали, миграции мог применить другой воркер
+        if not migrations.is_current(engine):
+            Base.metadata.create_all(bind=engine)
+            applied = migrations.migrate(engine)
+        if SEED_DEMO:
+            seed_demo_data()
+    return applied
+
+
+def seed_demo_data() -> None:
+    """Демо-сотрудники ivan/anna, админы admin/manager и их помесячная статистика."""
+    db = SessionLocal()
+    try:
         # демо-сотрудник ivan
         if not db.query(Employee).filter_by(login="ivan").first():
             emp = Employee(
@@ -737,6 +1972,7 @@ def init_db():
                 error_text="",
                 photo_url=None,
                 balance_int=92430,
+                balance_base=92430,
                 contract_hours_per_month=152,
                 hourly_rate=608,
                 schedule_type=None,
@@ -782,6 +2018,7 @@ def init_db():
                 error_text="",
                 photo_url=None,
                 balance_int=74300,
+                balance_base=74300,
                 contract_hours_per_month=128,
                 hourly_rate=580,
                 schedule_type="office",
@@ -805,12 +2042,7 @@ def init_db():
             db.add(admin)
 
         # демо-менеджер для карточки сотрудника: manager / 123456
-        manager_admin = db.query(Admin).filter_by(login="manager").first()
-        if manager_admin:
-            manager_admin.password_hash = get_password_hash("123456")
-            if not manager_admin.name:
-                manager_admin.name = "Менеджер склада (демо)"
-        else:
+        if not db.query(Admin).filter_by(login="manager").first():
             manager_admin = Admin(
                 login="manager",
                 password_hash=get_password_hash("123456"),
@@ -970,10 +2202,23 @@ def init_db():
 # ===============================
 
 def require_admin(
+    request: Request,
     db: Session = Depends(get_db),
-    admin_login: str = Header(..., alias="X-Admin-Login"),
-    admin_password: str = Header(..., alias="X-Admin-Password"),
+    admin_login: Optional[str] = Header(None, alias="X-Admin-Login"),
+    admin_password: Optional[str] = Header(None, alias="X-Admin-Password"),
+    session: Optional[dict] = Depends(get_session_claims),
 ) -> Admin:
+    # Быстрый путь: сессионный токен из /api/login, без argon2
+    if session is not None:
+        if session.get("k") != "admin":
+            raise HTTPException(status_code=401, detail="Админ не авторизован")
+        adm = db.query(Admin).filter(Admin.id == session.get("sub")).first()
+        if not adm or adm.session_version != session.get("v"):
+            raise HTTPException(status_code=401, detail="Сессия недействительна или истекла")
+        return adm
+
+    if not admin_login:
+        raise HTTPException(status_code=401, detail="Админ не авторизован")
     login_value = admin_login.lower()
 
     # Спец-случай для менеджера карточки:
@@ -992,18 +2237,217 @@ def require_admin(
         return adm
 
     # Обычные админы — по старой схеме
+    enforce_login_throttle(client_ip(request), login_value)
     adm = db.query(Admin).filter(Admin.login == login_value).first()
-    if not adm or not verify_password(admin_password, adm.password_hash):
+    if not adm or not verify_password(admin_password or "", adm.password_hash):
         raise HTTPException(status_code=401, detail="Админ не авторизован")
+    release_login_throttle(client_ip(request), login_value)
     return adm
 
 
+def authenticate_employee(
+    db: Session,
+    login: Optional[str],
+    password: Optional[str],
+    session: Optional[dict],
+    ip: str,
+    active_only: bool = False,
+) -> Employee:
+    """
+    Находит сотрудника по токену (если он есть) или по логину/паролю.
+    Токен проверяется без argon2: подпись + session_version из БД.
+    Вход по паролю предварительно проходит через ограничитель попыток.
+    """
+    if session is not None:
+        if session.get("k") != "employee":
+            raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+        emp = db.query(Employee).filter(Employee.id == session.get("sub")).first()
+        if not emp or emp.session_version != session.get("v"):
+            raise HTTPException(status_code=401, detail="Сессия недействительна или истекла")
+        if active_only and not emp.is_active:
+            raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+        return emp
+
+    login_value = (login or "").strip().lower()
+    enforce_login_throttle(ip, login_value)
+    query = db.query(Employee).filter(Employee.login == login_value)
+    if active_only:
+        query = query.filter(Employee.is_active == True)
+    emp = query.first()
+    if not emp or not verify_password(password or "", emp.password_hash):
+        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+    release_login_throttle(ip, login_value)
+    return emp
+
+
+def revoke_employee_sessions(emp: Employee) -> None:
+    """Инвалидирует все выданные сотруднику токены."""
+    emp.session_version = (emp.session_version or 0) + 1
+
+
+# ===============================
+#  НАГРУЗКА ПО КЛАССАМ МАРШРУТОВ
+# ===============================
+
+
+class RouteClassLimiter:
+    """
+    Ограничение одновременных запросов одного класса маршрутов.
+    Запрос ждёт свободный слот не дольше queue_timeout секунд,
+    иначе получает быстрый 503 — тяжёлые классы не отъедают
+    тредпул у лёгких (/api/health, список сотрудников).
+    """
+
+    def __init__(self, name: str, limit: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.admitted = 0
+        self.shed = 0
+        self.in_flight = 0
+        self.max_wait_ms = 0.0
+        # asyncio.Semaphore привязан к event loop, поэтому создаём его лениво
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.limit)
+            self._loop = loop
+        return self._semaphore
+
+    async def acquire(self) -> bool:
+        sem = self._get_semaphore()
+        started = time.perf_counter()
+        if self.queue_timeout <= 0:
+            if sem.locked():
+                self.shed += 1
+                return False
+            await sem.acquire()
+        else:
+            try:
+                await asyncio.wait_for(sem.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+        self.max_wait_ms = max(self.max_wait_ms, (time.perf_counter() - started) * 1000)
+        self.admitted += 1
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "max_wait_ms": round(self.max_wait_ms, 1),
+        }
+
+
+def _route_class_limiter(name: str, default_limit: int, default_timeout: float) -> RouteClassLimiter:
+    """
+    Настройка через LW_LIMIT_<CLASS>="<лимит>:<таймаут очереди, c>"; любая часть
+    может быть пустой. Таймаут 0 — без очереди, сразу 503.
+    """
+    env_name = f"LW_LIMIT_{name.upper()}"
+    limit_str, _, timeout_str = os.getenv(env_name, "").partition(":")
+    return RouteClassLimiter(
+        name,
+        _env_number(env_name, limit_str or None, default_limit, cast=int),
+        _env_number(env_name, timeout_str or None, default_timeout, allow_zero=True),
+    )
+
+
+# Сумма лимитов меньше тредпула anyio (40), чтобы "read" всегда было где выполниться
+ROUTE_CLASSES = {
+    "auth": _route_class_limiter("auth", 8, 2.0),
+    "export": _route_class_limiter("export", 2, 5.0),
+    "write": _route_class_limiter("write", 8, 5.0),
+    "read": _route_class_limiter("read", 20, 2.0),
+}
+
+# (метод или None = любой, регулярка пути, класс); первое совпадение побеждает
+ROUTE_CLASS_RULES = [
+    ("POST", re.compile(r"^/api(/async)?/login$"), "auth"),
+    ("POST", re.compile(r"^/api(/async)?/employee/"), "auth"),
+    ("GET", re.compile(r"^/api(/async)?/employees/\d+/export$"), "export"),
+    ("GET", re.compile(r"^/api/admin/payroll/projection$"), "export"),
+    ("POST", re.compile(r"^/api/admin/payments/import$"), "export"),
+    ("POST", re.compile(r"^/api/admin/payroll/run$"), "export"),
+    (None, re.compile(r"^/api/admin/ledger/"), "export"),
+    ("GET", re.compile(r"^/api/"), "read"),
+    (None, re.compile(r"^/api/"), "write"),
+]
+
+# дешёвые служебные маршруты не ограничиваем
+ROUTE_CLASS_EXEMPT = {"/api/health"}
+
+
+def classify_route(method: str, path: str) -> Optional[str]:
+    if path in ROUTE_CLASS_EXEMPT or method == "OPTIONS":
+        return None
+    for rule_method, pattern, name in ROUTE_CLASS_RULES:
+        if (rule_method is None or rule_method == method) and pattern.match(path):
+            return name
+    return None
+
+
+class LoadSheddingMiddleware:
+    """ASGI-middleware: раскладывает запросы по классам и применяет их лимиты."""
+
+    def __init__(self, app, classes: dict):
+        self.app = app
+        self.classes = classes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = classify_route(scope["method"], scope["path"])
+        limiter = self.classes.get(name) if name else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await limiter.acquire():
+            response = JSONResponse(
+                {"detail": "Сервер перегружен, повторите попытку позже"},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
 # ===============================
 #           FASTAPI APP
 # ===============================
 
 app = FastAPI(title="LuchWallet API", version="2.3.0")
 
+
+@app.exception_handler(WriteQueueTimeout)
+async def write_queue_timeout_handler(request: Request, exc: WriteQueueTimeout):
+    # операция снята с очереди и не выполнялась — повтор не создаст дубль
+    return JSONResponse(
+        {"detail": "Сервер перегружен, повторите попытку позже"},
+        status_code=503,
+        headers={"Retry-After": "1"},
+    )
+
 # фотки сотрудников
 app.mount("/static", StaticFiles(directory=str(PHOTOS_DIR)), name="static")
 
@@ -1015,18 +2459,53 @@ if (CARD_DIST / "assets").exists():
         name="card_assets",
     )
 
+# CORS добавляется последним, чтобы быть внешним слоем и подписывать в том числе 503
+app.add_middleware(LoadSheddingMiddleware, classes=ROUTE_CLASSES)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # курсор следующей страницы истории и ETag для If-None-Match
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 
 @app.on_event("startup")
 def on_startup():
-    init_db()
+    started = time.perf_counter()
+    # фактическая база (LW_DATABASE_URL), пароль в URL не печатаем
+    logger.info("База данных: %s", engine.url.render_as_string(hide_password=True))
+    if hashing.needs_calibration():
+        # калибрует один воркер, остальные подхватят сохранённый профиль
+        with startup_lock(init_lock_path()):
+            hashing.ensure_calibrated()
+    hashing.start_pool()
+    init_started = time.perf_counter()
+    STARTUP_STATS["migrations_applied"] = init_db()
+    STARTUP_STATS["init_db_ms"] = round((time.perf_counter() - init_started) * 1000, 1)
+    with engine.connect() as conn:
+        STARTUP_STATS["schema_version"] = migrations.current_version(conn)
+    # кэш модульный: новый запуск приложения в том же процессе (тесты) начинает с чистого
+    READ_CACHE.clear()
+    ACCRUAL_JOB.start()
+    if WRITE_QUEUE_ENABLED:
+        WRITE_QUEUE.start()
+    STARTUP_STATS["startup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    ACCRUAL_JOB.stop()
+    WRITE_QUEUE.stop()
+    hashing.shutdown_pool()
+
+
+@app.on_event("shutdown")
+async def on_shutdown_async_engine():
+    await async_engine.dispose()
 
 
 @app.get("/api/health")
@@ -1034,10 +2513,29 @@ def health():
     return {"status": "ok", "app": "LuchWallet API"}
 
 
+@app.get("/api/admin/metrics")
+def admin_metrics(admin: Admin = Depends(require_admin)):
+    """Внутренние счётчики сервиса (лимиты входа, пул argon2 и т.д.)."""
+    return {
+        "throttle": {
+            "login": LOGIN_LIMITER.stats(),
+            "ip": IP_LIMITER.stats(),
+        },
+        "hash_pool": hashing.pool_stats(),
+        "route_classes": {name: lim.stats() for name, lim in ROUTE_CLASSES.items()},
+        "work_calendar": WORK_CALENDAR.stats(),
+        "accrual": dict(ACCRUAL_STATS, interval_sec=ACCRUAL_INTERVAL_SEC),
+        "startup": dict(STARTUP_STATS, lock=LOCK_STATS),
+        "write_queue": WRITE_QUEUE.stats(),
+        "read_cache": READ_CACHE.stats(),
+        "wallet_snapshots": dict(WALLET_SNAPSHOT_STATS),
+    }
+
+
 # ---------- ЛОГИН (сотрудник / админ / менеджер) ----------
 
 @app.post("/api/login", response_model=LoginResponse)
-def login_endpoint(payload: LoginRequest, db: Session = Depends(get_db)):
+def login_endpoint(payload: LoginRequest, request: Request, db: Session = Depends(get_db)):
     role = (payload.role or "").lower()
     login_value = payload.login.strip().lower()
     password = payload.password
@@ -1061,56 +2559,72 @@ def login_endpoint(payload: LoginRequest, db: Session = Depends(get_db)):
             role="manager",
             login=login_value,
             data={"name": adm.name},
+            token=issue_session_token("admin", adm.id, adm.session_version or 0),
+            expires_in=SESSION_TTL_SECONDS,
         )
 
+    # до argon2 — проверка лимитов по логину и IP
+    enforce_login_throttle(client_ip(request), login_value)
+
     # ===== ЛОГИН СОТРУДНИКА (кошелёк) =====
     if role == "employee":
-        emp = db.query(Employee).filter(Employee.login == login_value).first()
-        if not emp or not verify_password(password, emp.password_hash):
+        # снимок кошелька — тем же запросом, что и сотрудник
+        row = (
+            db.query(Employee, WalletSnapshot)
+            .outerjoin(WalletSnapshot, WalletSnapshot.employee_id == Employee.id)
+            .filter(Employee.login == login_value)
+            .first()
+        )
+        if not row:
             raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+        emp, snapshot = row
+        ok, new_hash = verify_and_rehash_password(password, emp.password_hash)
+        if not ok:
+            raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+        release_login_throttle(client_ip(request), login_value)
+        if new_hash:
+            emp.password_hash = new_hash
+            db.commit()
 
-        accrue_balance_for_employee(emp)
-        db.commit()
-        db.refresh(emp)
-
-        months = build_months_for_employee(db, emp.id)
-
-        data = {
-            "id": emp.id,
-            "initials": emp.initials,
-            "name": emp.name,
-            "position": emp.position,
-            "rate": emp.rate,
-            "experience": emp.experience,
-            "status": emp.status,
-            "salary": emp.salary,
-            "hours": emp.hours,
-            "hoursDetail": emp.hours_detail,
-            "penalties": json_loads_list(emp.penalties_json),
-            "absences": json_loads_list(emp.absences_json),
-            "errorText": emp.error_text or "",
-            "photo_url": emp.photo_url,
-            "months": months,
-        }
-
-        return LoginResponse(role="employee", login=login_value, data=data)
+        # баланс уже начислен фоновым заданием (ACCRUAL_JOB) — только читаем
+        data_json = wallet_snapshot_json(db, emp, snapshot)
+        return employee_login_response(login_value, emp, data_json)
 
     # ===== ЛОГИН ОБЫЧНОГО АДМИНА =====
     adm = db.query(Admin).filter(Admin.login == login_value).first()
-    if not adm or not verify_password(password, adm.password_hash):
+    if not adm:
+        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+    ok, new_hash = verify_and_rehash_password(password, adm.password_hash)
+    if not ok:
         raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+    release_login_throttle(client_ip(request), login_value)
+    if new_hash:
+        adm.password_hash = new_hash
+        db.commit()
 
     return LoginResponse(
         role="admin",
         login=login_value,
         data={"name": adm.name},
+        token=issue_session_token("admin", adm.id, adm.session_version or 0),
+        expires_in=SESSION_TTL_SECONDS,
     )
 
 
 # ---------- СПИСОК СОТРУДНИКОВ ДЛЯ АДМИНА ----------
 
 @app.get("/api/employees", response_model=List[EmployeeShort])
-def list_employees(admin: Admin = Depends(require_admin), db: Session = Depends(get_db)):
+def list_employees(
+    request: Request,
+    response: Response,
+    admin: Admin = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    not_modified = conditional_response(
+        request, response, make_etag("employees", *employees_list_version(db))
+    )
+    if not_modified:
+        return not_modified
     employees = (
         db.query(Employee)
         .filter(Employee.is_active == True)
@@ -1123,32 +2637,22 @@ def list_employees(admin: Admin = Depends(require_admin), db: Session = Depends(
 @app.get("/api/employees/{employee_id}", response_model=EmployeeDetail)
 def get_employee(
     employee_id: int,
+    request: Request,
+    response: Response,
     admin: Admin = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    emp = db.query(Employee).filter(Employee.id == employee_id).first()
-    if not emp:
+    version = employee_row_version(db, employee_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
-    penalties = json_loads_list(emp.penalties_json)
-    absences = json_loads_list(emp.absences_json)
-    return EmployeeDetail(
-        id=emp.id,
-        login=emp.login,
-        initials=emp.initials,
-        name=emp.name,
-        position=emp.position,
-        rate=emp.rate,
-        experience=emp.experience,
-        status=emp.status,
-        salary=emp.salary,
-        hours=emp.hours,
-        hours_detail=emp.hours_detail,
-        penalties=penalties,
-        absences=absences,
-        error_text=emp.error_text,
-        photo_url=emp.photo_url,
-        is_active=emp.is_active,
-        password_plain=emp.password_plain,
+    not_modified = conditional_response(
+        request, response, make_etag("employee", employee_id, version)
+    )
+    if not_modified:
+        return not_modified
+    return READ_CACHE.get(
+        "detail", employee_id, version,
+        lambda: build_employee_detail(db.query(Employee).filter(Employee.id == employee_id).first()),
     )
 
 
@@ -1158,12 +2662,21 @@ def create_employee(
     admin: Admin = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
+    if db.query(Employee).filter(Employee.login == payload.login.lower()).first():
+        raise HTTPException(status_code=400, detail="Логин уже занят")
+    emp_id = create_employee_op(db, payload, get_password_hash(payload.password))
+    db.commit()
+    return build_employee_detail(db.get(Employee, emp_id))
+
+
+def create_employee_op(db: Session, payload: EmployeeCreate, password_hash: str) -> int:
+    """Новый сотрудник из POST /api/employees (без коммита); возвращает id."""
     if db.query(Employee).filter(Employee.login == payload.login.lower()).first():
         raise HTTPException(status_code=400, detail="Логин уже занят")
 
     emp = Employee(
         login=payload.login.lower(),
-        password_hash=get_password_hash(payload.password),
+        password_hash=password_hash,
         password_plain=payload.password,
         initials=payload.initials,
         name=payload.name,
@@ -1186,7 +2699,7 @@ def create_employee(
     )
 
     # инициализируем динамический баланс и нормочасы
-    emp.balance_int = money_to_int(payload.salary or "0")
+    set_balance_outside_ledger(emp, money_to_int(payload.salary or "0"))
 
     hours_int: int | None
     try:
@@ -1201,10 +2714,9 @@ def create_employee(
         emp.hourly_rate = None
 
     db.add(emp)
-    db.commit()
-    db.refresh(emp)
-
-    return get_employee(emp.id, admin=admin, db=db)
+    db.flush()
+    write_wallet_snapshots(db, [emp.id])
+    return emp.id
 
 
 @app.put("/api/employees/{employee_id}", response_model=EmployeeDetail)
@@ -1214,6 +2726,19 @@ def update_employee(
     admin: Admin = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
+    # argon2 — до очереди записи: писатель не должен ждать хеширования
+    password_hash = get_password_hash(payload.password) if payload.password else None
+    WRITE_QUEUE.run(
+        lambda session: apply_employee_update(session, employee_id, payload, password_hash), db
+    )
+    READ_CACHE.invalidate(employee_id)
+    return build_employee_detail(db.get(Employee, employee_id, populate_existing=True))
+
+
+def apply_employee_update(
+    db: Session, employee_id: int, payload: EmployeeUpdate, password_hash: Optional[str]
+) -> None:
+    """Изменения профиля из PUT /api/employees/{id} (операция WRITE_QUEUE, без коммита)."""
     emp = db.query(Employee).filter(Employee.id == employee_id).first()
     if not emp:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
@@ -1224,9 +2749,10 @@ def update_employee(
             raise HTTPException(status_code=400, detail="Логин уже занят")
         emp.login = new_login
 
-    if payload.password:
-        emp.password_hash = get_password_hash(payload.password)
+    if password_hash is not None:
+        emp.password_hash = password_hash
         emp.password_plain = payload.password
+        revoke_employee_sessions(emp)
 
     for field in [
         "initials",
@@ -1256,7 +2782,7 @@ def update_employee(
 
     # пересчёт баланс_int и нормочасов, если пришли salary/hours
     if payload.salary is not None:
-        emp.balance_int = money_to_int(emp.salary)
+        set_balance_outside_ledger(emp, money_to_int(emp.salary))
 
     if payload.hours is not None:
         try:
@@ -1272,10 +2798,7 @@ def update_employee(
         else:
             emp.hourly_rate = None
 
-    db.commit()
-    db.refresh(emp)
-
-    return get_employee(emp.id, admin=admin, db=db)
+    write_wallet_snapshots(db, [employee_id])
 
 
 @app.delete("/api/employees/{employee_id}")
@@ -1284,12 +2807,20 @@ def delete_employee(
     admin: Admin = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
+    result = deactivate_employee_op(db, employee_id)
+    db.commit()
+    READ_CACHE.invalidate(employee_id)
+    return result
+
+
+def deactivate_employee_op(db: Session, employee_id: int) -> dict:
+    """Мягкое удаление сотрудника (без коммита)."""
     emp = db.query(Employee).filter(Employee.id == employee_id).first()
     if not emp:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
-    # мягкое удаление
     emp.is_active = False
-    db.commit()
+    revoke_employee_sessions(emp)
+    write_wallet_snapshots(db, [employee_id])
     return {"status": "ok", "id": employee_id}
 
 
@@ -1306,23 +2837,36 @@ def upload_employee_photo(
     if not emp:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
 
-    ext = ""
-    filename_src = file.filename or ""
-    if "." in filename_src:
-        ext = "." + filename_src.rsplit(".", 1)[-1].lower()
-    filename = f"emp_{employee_id}{ext}"
+    filename = employee_photo_filename(employee_id, file.filename)
     filepath = PHOTOS_DIR / filename
 
     with filepath.open("wb") as f:
         f.write(file.file.read())
 
-    emp.photo_url = f"/static/{filename}"
+    set_employee_photo_op(db, employee_id, f"/static/{filename}")
     db.commit()
+    READ_CACHE.invalidate(employee_id)
     db.refresh(emp)
 
     return {"photo_url": emp.photo_url}
 
 
+def employee_photo_filename(employee_id: int, source_name: Optional[str]) -> str:
+    ext = ""
+    if "." in (source_name or ""):
+        ext = "." + source_name.rsplit(".", 1)[-1].lower()
+    return f"emp_{employee_id}{ext}"
+
+
+def set_employee_photo_op(db: Session, employee_id: int, photo_url: str) -> None:
+    """Ссылка на загруженное фото (без коммита)."""
+    emp = db.get(Employee, employee_id)
+    if emp is None:
+        raise HTTPException(status_code=404, detail="Сотрудник не найден")
+    emp.photo_url = photo_url
+    write_wallet_snapshots(db, [employee_id])
+
+
 # ---------- ЭКСПОРТ КАРТОЧКИ СОТРУДНИКА В EXCEL ----------
 
 @app.get("/api/employees/{employee_id}/export")
@@ -1335,37 +2879,7 @@ def export_employee_excel(
     if not emp:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
 
-    wb = Workbook()
-    ws = cast(Worksheet, wb.active)
-    ws.title = "Карточка сотрудника"
-
-    penalties = json_loads_list(emp.penalties_json)
-    absences = json_loads_list(emp.absences_json)
-
-    data_rows = [
-        ("ФИО", emp.name),
-        ("Логин", emp.login),
-        ("Должность", emp.position),
-        ("Оклад", emp.rate),
-        ("Стаж", emp.experience),
-        ("Статус", emp.status),
-        ("Баланс", emp.salary),
-        ("Отработанное время", emp.hours),
-        ("Детализация времени", emp.hours_detail),
-        ("Штрафы и дисциплина", "\n".join(penalties)),
-        ("Больничные и отсутствия", "\n".join(absences)),
-        ("Примечание / ошибка", emp.error_text),
-    ]
-
-    row_idx = 1
-    for label, value in data_rows:
-        ws.cell(row=row_idx, column=1, value=label) # type: ignore
-        ws.cell(row=row_idx, column=2, value=value)
-        row_idx += 1
-
-    bio = io.BytesIO()
-    wb.save(bio)
-    bio.seek(0)
+    bio = build_employee_workbook(emp)
 
     filename = f"employee_{employee_id}_card.xlsx"
 
@@ -1378,25 +2892,164 @@ def export_employee_excel(
     )
 
 
+# ---------- ПРОГНОЗ НАЧИСЛЕНИЙ ПО ВСЕМ СОТРУДНИКАМ ----------
+
+@app.get("/api/admin/payroll/projection")
+def payroll_projection(
+    until: Optional[date] = None,
+    warehouse: Optional[str] = None,
+    details: bool = False,
+    admin: Admin = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Прогноз балансов всех активных сотрудников на конец дня until
+    (по умолчанию — на конец текущего месяца) с итогами по складам.
+    Почасовое начисление прогнозируется так же, как его делает ACCRUAL_JOB:
+    только для офисников с hourly_rate.
+    """
+    import numpy as np
+    from payroll_projection import project_payroll
+
+    now = datetime.utcnow()
+    if until is None:
+        next_month = (now.replace(day=1) + timedelta(days=32)).replace(day=1)
+        until_dt = datetime(next_month.year, next_month.month, 1)
+    else:
+        until_dt = datetime(until.year, until.month, until.day) + timedelta(days=1)
+
+    query = select(
+        Employee.id,
+        Employee.balance_int,
+        Employee.salary,
+        Employee.hourly_rate,
+        Employee.schedule_type,
+        Employee.work_start_hour,
+        Employee.work_end_hour,
+        Employee.warehouse,
+        Employee.last_balance_update,
+    ).where(Employee.is_active == True)
+    if warehouse:
+        query = query.where(Employee.warehouse == warehouse)
+    rows = db.execute(query).all()
+
+    n = len(rows)
+    ids = np.empty(n, dtype=np.int64)
+    balances = np.empty(n, dtype=np.int64)
+    rates = np.zeros(n, dtype=np.int64)
+    starts = np.empty(n, dtype="datetime64[h]")
+    window_start = np.empty(n, dtype=np.int64)
+    window_end = np.empty(n, dtype=np.int64)
+    warehouse_idx = np.empty(n, dtype=np.int64)
+    warehouses: List[Optional[str]] = []
+    warehouse_pos: dict = {}
+
+    for i, row in enumerate(rows):
+        ids[i] = row.id
+        balances[i] = (
+            row.balance_int if row.balance_int is not None else money_to_int(row.salary or "0")
+        )
+        if row.schedule_type == "office" and row.hourly_rate:
+            rates[i] = row.hourly_rate
+        starts[i] = np.datetime64(row.last_balance_update or now, "h")
+        window_start[i] = row.work_start_hour or 8
+        window_end[i] = row.work_end_hour or 19
+        if row.warehouse not in warehouse_pos:
+            warehouse_pos[row.warehouse] = len(warehouses)
+            warehouses.append(row.warehouse)
+        warehouse_idx[i] = warehouse_pos[row.warehouse]
+
+    result = project_payroll(
+        WORK_CALENDAR,
+        balances,
+        rates,
+        starts,
+        np.datetime64(until_dt, "h"),
+        window_start,
+        window_end,
+        warehouse_idx,
+        warehouses,
+    )
+
+    response = {
+        "until": until_dt.isoformat(),
+        "employees": n,
+        "total_current_balance": int(balances.sum()),
+        "total_projected_accrual": int(result["accrual"].sum()),
+        "total_projected_balance": int(result["projected_balance"].sum()),
+        "warehouses": result["warehouses"],
+    }
+    if details:
+        response["details"] = [
+            {
+                "id": int(ids[i]),
+                "current_balance": int(balances[i]),
+                "hours": int(result["hours"][i]),
+                "projected_accrual": int(result["accrual"][i]),
+                "projected_balance": int(result["projected_balance"][i]),
+            }
+            for i in range(n)
+        ]
+    return response
+
+
+# ---------- СВЕРКА БАЛАНСОВ С ЖУРНАЛОМ ПЛАТЕЖЕЙ ----------
+
+@app.get("/api/admin/ledger/reconcile")
+def ledger_reconcile(
+    sample: int = Query(ledger.DEFAULT_SAMPLE, ge=0, le=1000),
+    admin: Admin = Depends(require_admin),
+):
+    """Расхождения balance_int / salary / месяцев с суммами payments (только чтение)."""
+    return ledger.reconcile(engine, sample=sample)
+
+
+@app.post("/api/admin/ledger/repair")
+def ledger_repair(
+    batch_size: int = Query(ledger.DEFAULT_BATCH_SIZE, ge=1, le=10000),
+    admin: Admin = Depends(require_admin),
+):
+    """Пересобирает разошедшиеся балансы и месяцы из payments пачками по batch_size."""
+    result = ledger.repair(engine, int_to_money, month_key_for, batch_size=batch_size)
+    READ_CACHE.invalidate_all()
+    # месяцы ремонт правит без строки employees — версия снимка этого не заметит
+    result["wallet_snapshots"] = rebuild_all_wallet_snapshots()
+    result["after"] = ledger.reconcile(engine)
+    return result
+
+
 # ---------- ПЛАТЕЖИ / НАЧИСЛЕНИЯ ДЛЯ АДМИНА ----------
 
 @app.get("/api/employees/{employee_id}/payments", response_model=List[PaymentOut])
 def list_payments_for_employee(
     employee_id: int,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAYMENTS_PAGE_DEFAULT, ge=1, le=PAYMENTS_PAGE_MAX),
+    payment_type: Optional[str] = Query(None, alias="type"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
     admin: Admin = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    emp = db.query(Employee).filter(Employee.id == employee_id).first()
-    if not emp:
+    """
+    История операций постранично (новые сверху). Курсор следующей
+    страницы — в заголовке X-Next-Cursor; нет заголовка — страница последняя.
+    """
+    if employee_row_version(db, employee_id) is None:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
-
-    payments = (
-        db.query(Payment)
-        .filter(Payment.employee_id == employee_id)
-        .order_by(Payment.created_at.desc(), Payment.id.desc())
-        .all()
+    etag = make_etag(
+        "payments", employee_id, cursor, limit, payment_type, date_from, date_to,
+        *payments_version(db, employee_id),
     )
-    return payments
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+
+    stmt = payments_page_query(employee_id, cursor, limit, payment_type, date_from, date_to)
+    rows = db.execute(stmt).scalars().all()
+    return split_payments_page(rows, limit, response)
 
 
 @app.post("/api/employees/{employee_id}/payments", response_model=PaymentOut)
@@ -1406,16 +3059,15 @@ def create_payment_for_employee(
     admin: Admin = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    emp = db.query(Employee).filter(Employee.id == employee_id).first()
-    if not emp:
-        raise HTTPException(status_code=404, detail="Сотрудник не найден")
+    payment = WRITE_QUEUE.run(lambda session: create_payment_op(session, employee_id, payload), db)
+    READ_CACHE.invalidate(employee_id)
+    return payment
 
-    ensure_emp_balance_initialized(emp)
-    ensure_emp_balance_initialized(emp)
-    balance: int = emp.balance_int or 0
-    balance += payload.amount
-    emp.balance_int = balance
-    emp.salary = int_to_money(balance)
+
+def create_payment_op(db: Session, employee_id: int, payload: PaymentCreate) -> PaymentOut:
+    """Платёж + баланс + месяц (операция WRITE_QUEUE, без коммита)."""
+    if apply_payment_to_balance(db, employee_id, payload.amount) is None:
+        raise HTTPException(status_code=404, detail="Сотрудник не найден")
 
     payment = Payment(
         employee_id=employee_id,
@@ -1435,11 +3087,9 @@ def create_payment_for_employee(
         comment=payload.comment,
         reverse=False,
     )
-
-    db.commit()
-    db.refresh(payment)
-
-    return payment
+    write_wallet_snapshots(db, [employee_id])
+    # результат снимается до коммита: после него объект уже в другом потоке
+    return PaymentOut.model_validate(payment, from_attributes=True)
 
 
 @app.delete("/api/employees/{employee_id}/payments/{payment_id}")
@@ -1449,89 +3099,458 @@ def delete_payment_for_employee(
     admin: Admin = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    payment = db.query(Payment).filter(Payment.id == payment_id).first()
+    result = WRITE_QUEUE.run(lambda session: delete_payment_op(session, employee_id, payment_id), db)
+    READ_CACHE.invalidate(employee_id)
+    return result
+
+
+def delete_payment_op(db: Session, employee_id: int, payment_id: int) -> dict:
+    """Удаление платежа с откатом баланса и месяца (операция WRITE_QUEUE, без коммита)."""
+    # сначала DELETE ... RETURNING: из двух одновременных удалений одного
+    # платежа баланс откатит только то, что действительно удалило строку
+    payment = db.execute(delete_payment_returning(employee_id, payment_id)).first()
     if not payment:
         raise HTTPException(status_code=404, detail="Платёж не найден")
 
-    emp = db.query(Employee).filter(Employee.id == payment.employee_id).first()
-    if emp:
-        ensure_emp_balance_initialized(emp)
-        balance: int = emp.balance_int or 0
-        balance -= payment.amount
-        emp.balance_int = balance
-        emp.salary = int_to_money(balance)
-
+    if apply_payment_to_balance(db, payment.employee_id, -payment.amount) is not None:
         update_month_stat_on_payment(
             db=db,
-            emp_id=emp.id,
+            emp_id=payment.employee_id,
             amount_diff=payment.amount,
             created_at=payment.created_at,
             payment_type=payment.type,
             comment=payment.comment,
             reverse=True,
         )
-
-    db.delete(payment)
-    db.commit()
+        write_wallet_snapshots(db, [payment.employee_id])
     return {"status": "deleted", "id": payment_id}
 
 
+# ---------- МАССОВЫЙ ИМПОРТ ПЛАТЕЖЕЙ (XLSX / CSV) ----------
+
+PAYMENT_IMPORT_CHUNK = int(os.getenv("LW_PAYMENT_IMPORT_CHUNK", "10000"))
+PAYMENT_IMPORT_MAX_ERRORS = 1000
+
+
+def initialize_null_balances(db: Session) -> None:
+    """ensure_emp_balance_initialized для всех сразу: импорт меняет balance_int в SQL."""
+    rows = db.execute(
+        select(Employee.id, Employee.salary).where(Employee.balance_int.is_(None))
+    ).all()
+    if not rows:
+        return
+    t = Employee.__table__
+    db.execute(
+        update(t)
+        .where(t.c.id == bindparam("b_id"), t.c.balance_int.is_(None))
+        .values(
+            balance_int=bindparam("b_balance"),
+            balance_base=t.c.balance_base + bindparam("b_balance", type_=Integer),
+        ),
+        [{"b_id": r.id, "b_balance": money_to_int(r.salary or "0")} for r in rows],
+    )
+
+
+def apply_payment_chunk(db: Session, payments: List[dict]) -> None:
+    """
+    Пачка платежей в текущей транзакции: executemany INSERT в payments,
+    затем по одному агрегированному UPDATE баланса на сотрудника и одному
+    upsert на (сотрудник, месяц) — как если бы каждый платёж прошёл через
+    create_payment_for_employee, но без построчных запросов.
+    """
+    # Core-INSERT по таблице: ORM bulk insert на 100k строк заметно медленнее
+    db.execute(insert(Payment.__table__), payments)
+
+    balance_deltas: dict = defaultdict(int)
+    month_deltas: dict = defaultdict(lambda: [0, 0])
+    for p in payments:
+        balance_deltas[p["employee_id"]] += p["amount"]
+        month = month_deltas[(p["employee_id"], p["created_at"].year, p["created_at"].month)]
+        month[0] += p["amount"]
+        if p["type"] == "salary":
+            month[1] += p["amount"]
+
+    t = Employee.__table__
+    db.execute(
+        update(t)
+        .where(t.c.id == bindparam("b_id"))
+        .values(balance_int=t.c.balance_int + bindparam("b_delta", type_=Integer)),
+        [{"b_id": emp_id, "b_delta": delta} for emp_id, delta in balance_deltas.items()],
+    )
+    balances = db.execute(
+        select(Employee.id, Employee.balance_int).where(Employee.id.in_(list(balance_deltas)))
+    ).all()
+    db.execute(
+        update(t).where(t.c.id == bindparam("b_id")).values(salary=bindparam("b_salary")),
+        [{"b_id": r.id, "b_salary": int_to_money(r.balance_int)} for r in balances],
+    )
+
+    now = datetime.utcnow()
+    empty_list = json_dumps_list([])
+    stats = EmployeeMonthStat.__table__
+    stmt = sqlite_insert(stats)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["employee_id", "year", "month"],
+            set_={
+                "income": func.coalesce(stats.c.income, 0) + stmt.excluded.income,
+                # без salary-платежей salary месяца не трогаем (может быть NULL)
+                "salary": case(
+                    (stmt.excluded.salary == 0, stats.c.salary),
+                    else_=func.coalesce(stats.c.salary, 0) + stmt.excluded.salary,
+                ),
+            },
+        ),
+        [
+            {
+                "employee_id": emp_id,
+                "year": year,
+                "month": month,
+                "month_key": month_key_for(month),
+                "income": income,
+                "salary": salary,
+                "income_base": 0,
+                "salary_base": 0,
+                "hours": None,
+                "penalties_json": empty_list,
+                "absences_json": empty_list,
+                "created_at": now,
+            }
+            for (emp_id, year, month), (income, salary) in month_deltas.items()
+        ],
+    )
+
+
+def import_payments_from_file(
+    db: Session,
+    fileobj,
+    filename: str,
+    chunk_size: int = PAYMENT_IMPORT_CHUNK,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Потоковый импорт: строки читаются по одной (payment_import), корректные
+    копятся в пачку по chunk_size и пишутся apply_payment_chunk, каждая пачка —
+    своя транзакция (запись не держит базу на весь файл). Строки с ошибками
+    пропускаются и попадают в отчёт. dry_run — только проверка.
+
+    Если файл ломается посреди чтения (битый UTF-8, повреждённый XLSX), к этому
+    моменту часть пачек уже закоммичена: прочитанное до сбоя дописывается,
+    в отчёте complete=False и stopped — после какой строки чтение прервалось и
+    почему. ImportFormatError наружу — только если не прочитано ни одной строки.
+    """
+    started = time.perf_counter()
+    employees = db.execute(select(Employee.id, Employee.login)).all()
+    employee_ids = {r.id for r in employees}
+    employees_by_login = {r.login: r.id for r in employees if r.login}
+    if not dry_run:
+        initialize_null_balances(db)
+        db.commit()
+
+    report = {
+        "rows": 0,
+        "imported": 0,
+        "amount_total": 0,
+        "error_count": 0,
+        "errors": [],
+        "complete": True,
+    }
+    chunk: List[dict] = []
+
+    def flush() -> None:
+        if not dry_run:
+            apply_payment_chunk(db, chunk)
+            write_wallet_snapshots(db, {p["employee_id"] for p in chunk})
+            db.commit()
+            READ_CACHE.invalidate_all()
+        report["imported"] += len(chunk)
+        report["amount_total"] += sum(p["amount"] for p in chunk)
+        chunk.clear()
+
+    rows = payment_import.iter_file_rows(fileobj, filename)
+    parsed = payment_import.parse_payment_rows(
+        rows, employee_ids, employees_by_login, datetime.utcnow()
+    )
+    last_row = 1
+    try:
+        try:
+            for row_no, payment, error in parsed:
+                last_row = row_no
+                report["rows"] += 1
+                if error is not None:
+                    report["error_count"] += 1
+                    if len(report["errors"]) < PAYMENT_IMPORT_MAX_ERRORS:
+                        report["errors"].append({"row": row_no, "error": error})
+                    continue
+                chunk.append(payment)
+                if len(chunk) >= chunk_size:
+                    flush()
+        except payment_import.ImportFormatError as exc:
+            if not report["rows"]:
+                raise
+            report["complete"] = False
+            report["stopped"] = {"after_row": last_row, "error": str(exc)}
+        if chunk:
+            flush()
+    finally:
+        parsed.close()
+        rows.close()
+
+    report["dry_run"] = dry_run
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return report
+
+
+@app.post("/api/admin/payments/import")
+def import_payments(
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    chunk_size: int = Query(PAYMENT_IMPORT_CHUNK, ge=100, le=50000),
+    admin: Admin = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Массовые начисления/удержания из XLSX или CSV (формат — в payment_import.py).
+    Ответ: сколько строк прочитано и импортировано, ошибки по номерам строк
+    (первые PAYMENT_IMPORT_MAX_ERRORS, всего — error_count). Файл, сломавшийся
+    посреди чтения, — тот же 200, но complete=false и stopped: импортировано
+    всё до строки stopped.after_row, остаток файла нужно загрузить заново.
+    """
+    try:
+        return import_payments_from_file(
+            db, file.file, file.filename or "", chunk_size=chunk_size, dry_run=dry_run
+        )
+    except payment_import.ImportFormatError as exc:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+# ---------- ВЕДОМОСТЬ: ПЛАТЁЖ ВСЕМ СОТРУДНИКАМ ОДНИМ ПАКЕТОМ ----------
+
+PAYROLL_RULES = ("shift_rate", "fixed")
+
+
+def build_payroll_lines(db: Session, payload: PayrollRunRequest) -> tuple:
+    """
+    Строки ведомости (employee_id, amount, comment, warehouse) и пропущенные
+    сотрудники с причиной. Ошибки во входных данных — HTTPException 400:
+    ведомость либо проводится целиком, либо не проводится вовсе.
+    """
+    if (payload.rule is None) == (payload.lines is None):
+        raise HTTPException(status_code=400, detail="Нужен либо rule, либо lines")
+    # comment пишется в Payment.comment (String(255)) — как в импорте из файла
+    comment_max = payment_import.COMMENT_MAX_LEN
+    if payload.comment and len(payload.comment) > comment_max:
+        raise HTTPException(status_code=400, detail=f"comment: длиннее {comment_max} символов")
+
+    columns = (Employee.id, Employee.warehouse, Employee.shift_role, Employee.shift_rate)
+    lines: List[dict] = []
+    skipped: List[dict] = []
+
+    if payload.lines is not None:
+        ids = {line.employee_id for line in payload.lines}
+        known = {
+            r.id: r
+            for r in db.execute(
+                select(*columns).where(Employee.id.in_(ids), Employee.is_active == True)
+            )
+        }
+        bad = [
+            {"employee_id": line.employee_id, "error": "сотрудник не найден или неактивен"}
+            for line in payload.lines
+            if line.employee_id not in known
+        ] + [
+            {"employee_id": line.employee_id, "error": "нулевая сумма"}
+            for line in payload.lines
+            if line.amount == 0
+        ] + [
+            {"employee_id": line.employee_id, "error": f"comment: длиннее {comment_max} символов"}
+            for line in payload.lines
+            if line.comment and len(line.comment) > comment_max
+        ]
+        if bad:
+            raise HTTPException(status_code=400, detail={"message": "Ведомость не проведена", "lines": bad})
+        for line in payload.lines:
+            lines.append({
+                "employee_id": line.employee_id,
+                "amount": line.amount,
+                "comment": line.comment or payload.comment,
+                "warehouse": known[line.employee_id].warehouse,
+            })
+        return lines, skipped
+
+    if payload.rule not in PAYROLL_RULES:
+        raise HTTPException(status_code=400, detail=f"rule: одно из {', '.join(PAYROLL_RULES)}")
+    if payload.rule == "shift_rate" and payload.shifts is None and not payload.shifts_by_employee:
+        raise HTTPException(status_code=400, detail="Для rule=shift_rate нужен shifts")
+    if payload.rule == "fixed" and payload.amount is None and not payload.amount_by_role:
+        raise HTTPException(status_code=400, detail="Для rule=fixed нужен amount или amount_by_role")
+    if payload.type != "fine":
+        negative = [role for role, value in payload.amount_by_role.items() if value < 0]
+        if (payload.amount or 0) < 0 or negative:
+            raise HTTPException(
+                status_code=400,
+                detail={"message": "Отрицательная сумма допустима только для type=fine", "roles": negative},
+            )
+
+    query = select(*columns).where(Employee.is_active == True).order_by(Employee.id)
+    if payload.warehouse is not None:
+        query = query.where(Employee.warehouse == payload.warehouse)
+    if payload.shift_role is not None:
+        query = query.where(Employee.shift_role == payload.shift_role)
+
+    for emp in db.execute(query):
+        if payload.rule == "shift_rate":
+            shifts = payload.shifts_by_employee.get(emp.id, payload.shifts) or 0
+            if not emp.shift_rate:
+                skipped.append({"employee_id": emp.id, "reason": "нет shift_rate"})
+                continue
+            amount = emp.shift_rate * shifts
+        else:
+            amount = payload.amount_by_role.get(emp.shift_role or "", payload.amount)
+            if amount is None:
+                skipped.append({"employee_id": emp.id, "reason": "нет суммы для shift_role"})
+                continue
+        if amount == 0:
+            skipped.append({"employee_id": emp.id, "reason": "нулевая сумма"})
+            continue
+        lines.append({
+            "employee_id": emp.id,
+            "amount": amount,
+            "comment": payload.comment,
+            "warehouse": emp.warehouse,
+        })
+    return lines, skipped
+
+
+@app.post("/api/admin/payroll/run")
+def run_payroll(
+    payload: PayrollRunRequest,
+    admin: Admin = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Ведомость: строки считаются на сервере и проводятся одной транзакцией
+    через apply_payment_chunk (тот же пакетный путь, что у импорта) — либо
+    все платежи с балансами и месяцами, либо ничего. dry_run — только расчёт.
+    """
+    if payload.type not in payment_import.PAYMENT_TYPES:
+        raise HTTPException(
+            status_code=400, detail=f"type: одно из {', '.join(payment_import.PAYMENT_TYPES)}"
+        )
+    started = time.perf_counter()
+    lines, skipped = build_payroll_lines(db, payload)
+    run_at = datetime.utcnow()
+
+    if lines and not payload.dry_run:
+        try:
+            initialize_null_balances(db)
+            apply_payment_chunk(
+                db,
+                [
+                    {
+                        "employee_id": line["employee_id"],
+                        "type": payload.type,
+                        "amount": line["amount"],
+                        "comment": line["comment"],
+                        "created_at": run_at,
+                    }
+                    for line in lines
+                ],
+            )
+            write_wallet_snapshots(db, [line["employee_id"] for line in lines])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        READ_CACHE.invalidate(*(line["employee_id"] for line in lines))
+
+    by_warehouse: dict = defaultdict(lambda: {"employees": 0, "total": 0})
+    for line in lines:
+        group = by_warehouse[line["warehouse"] or ""]
+        group["employees"] += 1
+        group["total"] += line["amount"]
+
+    return {
+        "run_at": run_at.isoformat(),
+        "type": payload.type,
+        "dry_run": payload.dry_run,
+        "employees": len(lines),
+        "total": sum(line["amount"] for line in lines),
+        "by_warehouse": by_warehouse,
+        "skipped": skipped,
+        "lines": [{"employee_id": line["employee_id"], "amount": line["amount"]} for line in lines],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
 # ---------- СОТРУДНИК: СВОЯ ИСТОРИЯ ОПЕРАЦИЙ (баланс) ----------
 
 @app.post("/api/employee/payments", response_model=List[PaymentOut])
 def list_payments_for_employee_self(
     payload: EmployeeSelfPaymentsRequest,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
+    session: Optional[dict] = Depends(get_session_claims),
 ):
     """
     Эндпоинт для фронта при клике на баланс (модалка истории).
-    На вход: login + password сотрудника.
+    На вход: Bearer-токен или login + password сотрудника.
+    Отдаёт одну страницу, курсор следующей — в X-Next-Cursor.
     """
-    login_value = payload.login.strip().lower()
-    emp = db.query(Employee).filter(Employee.login == login_value).first()
-    if not emp or not verify_password(payload.password, emp.password_hash):
-        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
-
-    accrue_balance_for_employee(emp)
-    db.commit()
+    emp = authenticate_employee(
+        db, payload.login, payload.password, session, client_ip(request)
+    )
+    not_modified = conditional_response(
+        request, response, self_payments_etag(payload, emp.id, payments_version(db, emp.id))
+    )
+    if not_modified:
+        return not_modified
 
-    payments = (
-        db.query(Payment)
-        .filter(Payment.employee_id == emp.id)
-        .order_by(Payment.created_at.desc(), Payment.id.desc())
-        .all()
+    stmt = payments_page_query(
+        emp.id, payload.cursor, payload.limit, payload.type, payload.date_from, payload.date_to
     )
-    return payments
+    rows = db.execute(stmt).scalars().all()
+    return split_payments_page(rows, payload.limit, response)
 
 
-# ---------- СОТРУДНИК: СВОЯ КАРТОЧКА (JSON + БД) ----------
+# ---------- СОТРУДНИК: СВОЯ КАРТОЧКА ----------
 
 @app.post("/api/employee/card", response_model=EmployeeCardResponse)
 def get_employee_card_self(
     payload: EmployeeSelfCardRequest,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
+    session: Optional[dict] = Depends(get_session_claims),
 ):
     """
-    Сотрудник получает свою карточку по логину и паролю.
+    Сотрудник получает свою карточку по токену или по логину и паролю.
     """
-    login_value = payload.login.strip().lower()
-    emp = (
-        db.query(Employee)
-        .filter(Employee.login == login_value, Employee.is_active == True)
-        .first()
+    emp = authenticate_employee(
+        db, payload.login, payload.password, session, client_ip(request), active_only=True
     )
-    if not emp or not verify_password(payload.password, emp.password_hash):
-        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+    version = card_version(db, emp.id)
+    not_modified = conditional_response(request, response, make_etag("card", emp.id, *version))
+    if not_modified:
+        return not_modified
 
-    extra_all = load_employee_cards()
-    extra = extra_all.get(str(emp.id)) or {}
-    return build_employee_card(emp, extra)
+    def load() -> EmployeeCardResponse:
+        # emp читали до версии: перечитываем, чтобы в кэш не легла карточка старше её
+        db.refresh(emp)
+        return build_employee_card(emp, load_employee_card(db, emp.id))
+
+    return READ_CACHE.get("card", emp.id, version, load)
 
 
 @app.post("/api/employee/card/update", response_model=EmployeeCardResponse)
 def update_employee_card_self(
     payload: EmployeeSelfCardUpdateRequest,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
+    session: Optional[dict] = Depends(get_session_claims),
 ):
     """
     Сотрудник обновляет свою карточку:
@@ -1540,64 +3559,604 @@ def update_employee_card_self(
     - роли
     - статус (при необходимости)
     """
-    login_value = payload.login.strip().lower()
-    emp = (
-        db.query(Employee)
-        .filter(Employee.login == login_value, Employee.is_active == True)
-        .first()
+    emp = authenticate_employee(
+        db, payload.login, payload.password, session, client_ip(request), active_only=True
+    )
+    emp_id = emp.id
+    WRITE_QUEUE.run(lambda s: apply_employee_card_update(s, emp_id, payload), db)
+    READ_CACHE.invalidate(emp_id)
+    db.refresh(emp)
+    # ETag новой версии — следующий POST /api/employee/card получит 304
+    response.headers["ETag"] = make_etag("card", emp_id, *card_version(db, emp_id))
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    return build_employee_card(emp, load_employee_card(db, emp_id))
+
+
+@app.post("/api/employee/card/history", response_model=List[CardHistoryEntry])
+def list_employee_card_history_self(
+    payload: EmployeeSelfCardHistoryRequest,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    session: Optional[dict] = Depends(get_session_claims),
+):
+    """
+    Правки своей карточки постранично, новые сверху. Первая страница —
+    с history_cursor из карточки (то, что в неё не поместилось), курсор
+    следующей — в X-Next-Cursor.
+    """
+    emp = authenticate_employee(
+        db, payload.login, payload.password, session, client_ip(request), active_only=True
     )
-    if not emp or not verify_password(payload.password, emp.password_hash):
+    etag = make_etag(
+        "card_history", emp.id, payload.cursor, payload.limit, card_history_version(db, emp.id)
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    rows = db.execute(card_history_page_query(emp.id, payload.cursor, payload.limit)).scalars().all()
+    page = rows[:payload.limit]
+    if len(rows) > payload.limit:
+        response.headers["X-Next-Cursor"] = encode_keyset_cursor(page[-1].created_at, page[-1].id)
+    return [card_event_entry(event) for event in page]
+
+
+def apply_employee_card_update(
+    db: Session, emp_id: int, payload: EmployeeSelfCardUpdateRequest
+) -> None:
+    """
+    Правка своей карточки (операция WRITE_QUEUE, без коммита): пишет строку
+    employee_cards сотрудника, его status в employees и по событию в журнал
+    employee_card_events на каждое изменённое поле.
+    """
+    emp = db.get(Employee, emp_id)
+    if emp is None:
+        raise HTTPException(status_code=404, detail="Сотрудник не найден")
+    card = db.get(EmployeeCard, emp_id)
+    if card is None:
+        card = EmployeeCard(employee_id=emp_id)
+        db.add(card)
+    extra = employee_card_extra(card)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    for field in ("responsibilities", "skills", "roles"):
+        new = getattr(payload, field)
+        if new is None:
+            continue
+        added, removed = list_diff(extra[field], new)
+        if added or removed:
+            db.add(EmployeeCardEvent(
+                employee_id=emp_id,
+                created_at=now,
+                field=field,
+                added_json=json_dumps_list(added),
+                removed_json=json_dumps_list(removed),
+            ))
+        setattr(card, f"{field}_json", json_dumps_list(new))
+
+    # При необходимости — статус в самой таблице employees
+    if payload.status is not None and payload.status != emp.status:
+        db.add(EmployeeCardEvent(
+            employee_id=emp_id,
+            created_at=now,
+            field="status",
+            old_value=emp.status,
+            new_value=payload.status,
+        ))
+        emp.status = payload.status
+        # статус есть и в кошельке
+        write_wallet_snapshots(db, [emp_id])
+
+
+# ===============================
+#   ASYNC API (/api/async/...)
+# ===============================
+# Те же операции, что и sync-эндпоинты выше, но на AsyncSession (aiosqlite):
+# пока запрос ждёт SQLite, он не держит поток тредпула. CPU-работа
+# (argon2, openpyxl) явно уходит из event loop: argon2 — в пул процессов
+# hashing, openpyxl — в тредпул через run_in_threadpool.
+
+async_router = APIRouter(prefix="/api/async", tags=["async"])
+
+
+async def get_employee_or_404_async(db: AsyncSession, employee_id: int) -> Employee:
+    emp = await db.get(Employee, employee_id)
+    if not emp:
+        raise HTTPException(status_code=404, detail="Сотрудник не найден")
+    return emp
+
+
+# SQLite пускает одного писателя; ждать своей очереди дешевле на asyncio.Lock,
+# чем всем соединениям сразу крутиться в busy_timeout
+ASYNC_WRITE_LOCK = asyncio.Lock()
+
+
+@asynccontextmanager
+async def async_write_transaction(db: AsyncSession):
+    """
+    Пишущая транзакция: берём блокировку записи сразу (BEGIN IMMEDIATE).
+    Иначе транзакция начинается как читающая, и её повышение до пишущей
+    при параллельных записях падает с "database is locked" без ожидания.
+    Коммит — на выходе из блока, при исключении — откат.
+    """
+    async with ASYNC_WRITE_LOCK:
+        if async_engine.dialect.name == "sqlite":
+            await db.execute(text("BEGIN IMMEDIATE"))
+        try:
+            yield
+        except BaseException:
+            await db.rollback()
+            raise
+        await db.commit()
+
+
+async def run_write_op_async(db: AsyncSession, op: WriteOp):
+    """
+    Операция записи sync-эндпоинта (функция от Session, без коммита) из
+    async-эндпоинта: через WRITE_QUEUE, если писатель запущен, иначе на
+    sync-сессии db в async_write_transaction.
+    """
+    if WRITE_QUEUE.running:
+        return await WRITE_QUEUE.run_async(op)
+    async with async_write_transaction(db):
+        return await db.run_sync(op)
+
+
+async def get_or_create_manager_async(db: AsyncSession) -> Admin:
+    adm = (await db.execute(select(Admin).where(Admin.login == "manager"))).scalar_one_or_none()
+    if not adm:
+        adm = Admin(
+            login="manager",
+            password_hash=await get_password_hash_async("123456"),
+            name="Менеджер склада (демо)",
+        )
+        db.add(adm)
+        await db.commit()
+    return adm
+
+
+async def require_admin_async(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    admin_login: Optional[str] = Header(None, alias="X-Admin-Login"),
+    admin_password: Optional[str] = Header(None, alias="X-Admin-Password"),
+    session: Optional[dict] = Depends(get_session_claims),
+) -> Admin:
+    """Async-версия require_admin."""
+    if session is not None:
+        if session.get("k") != "admin":
+            raise HTTPException(status_code=401, detail="Админ не авторизован")
+        adm = (
+            await db.execute(select(Admin).where(Admin.id == session.get("sub")))
+        ).scalar_one_or_none()
+        if not adm or adm.session_version != session.get("v"):
+            raise HTTPException(status_code=401, detail="Сессия недействительна или истекла")
+        return adm
+
+    if not admin_login:
+        raise HTTPException(status_code=401, detail="Админ не авторизован")
+    login_value = admin_login.lower()
+
+    if login_value == "manager":
+        return await get_or_create_manager_async(db)
+
+    enforce_login_throttle(client_ip(request), login_value)
+    adm = (await db.execute(select(Admin).where(Admin.login == login_value))).scalar_one_or_none()
+    if not adm or not await verify_password_async(admin_password or "", adm.password_hash):
+        raise HTTPException(status_code=401, detail="Админ не авторизован")
+    release_login_throttle(client_ip(request), login_value)
+    return adm
+
+
+async def authenticate_employee_async(
+    db: AsyncSession,
+    login: Optional[str],
+    password: Optional[str],
+    session: Optional[dict],
+    ip: str,
+    active_only: bool = False,
+) -> Employee:
+    """Async-версия authenticate_employee."""
+    if session is not None:
+        if session.get("k") != "employee":
+            raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+        emp = (
+            await db.execute(select(Employee).where(Employee.id == session.get("sub")))
+        ).scalar_one_or_none()
+        if not emp or emp.session_version != session.get("v"):
+            raise HTTPException(status_code=401, detail="Сессия недействительна или истекла")
+        if active_only and not emp.is_active:
+            raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+        return emp
+
+    login_value = (login or "").strip().lower()
+    enforce_login_throttle(ip, login_value)
+    query = select(Employee).where(Employee.login == login_value)
+    if active_only:
+        query = query.where(Employee.is_active == True)
+    emp = (await db.execute(query)).scalars().first()
+    if not emp or not await verify_password_async(password or "", emp.password_hash):
         raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+    release_login_throttle(ip, login_value)
+    return emp
 
-    extra_all = load_employee_cards()
-    extra = extra_all.get(str(emp.id)) or {
-        "responsibilities": [],
-        "skills": [],
-        "roles": [],
-        "history": [],
-    }
-    history = extra.get("history") or []
 
-    now = datetime.utcnow().isoformat(timespec="seconds")
+@async_router.post("/login", response_model=LoginResponse)
+async def login_endpoint_async(
+    payload: LoginRequest, request: Request, db: AsyncSession = Depends(get_async_db)
+):
+    role = (payload.role or "").lower()
+    login_value = payload.login.strip().lower()
 
-    def add_change(field: str, old, new):
-        if old == new or new is None:
-            return
-        history.append(
-            {
-                "timestamp": now,
-                "field": field,
-                "old": old,
-                "new": new,
-            }
+    if login_value == "manager":
+        adm = await get_or_create_manager_async(db)
+        return LoginResponse(
+            role="manager",
+            login=login_value,
+            data={"name": adm.name},
+            token=issue_session_token("admin", adm.id, adm.session_version or 0),
+            expires_in=SESSION_TTL_SECONDS,
         )
 
-    # Обновляем JSON-часть
-    if payload.responsibilities is not None:
-        add_change("responsibilities", extra.get("responsibilities"), payload.responsibilities)
-        extra["responsibilities"] = payload.responsibilities
+    enforce_login_throttle(client_ip(request), login_value)
 
-    if payload.skills is not None:
-        add_change("skills", extra.get("skills"), payload.skills)
-        extra["skills"] = payload.skills
+    if role == "employee":
+        row = (
+            await db.execute(
+                select(Employee, WalletSnapshot)
+                .outerjoin(WalletSnapshot, WalletSnapshot.employee_id == Employee.id)
+                .where(Employee.login == login_value)
+            )
+        ).first()
+        if not row:
+            raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+        emp, snapshot = row
+        ok, new_hash = await verify_and_rehash_password_async(payload.password, emp.password_hash)
+        if not ok:
+            raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+        release_login_throttle(client_ip(request), login_value)
+        if new_hash:
+            emp.password_hash = new_hash
+            await db.commit()
 
-    if payload.roles is not None:
-        add_change("roles", extra.get("roles"), payload.roles)
-        extra["roles"] = payload.roles
+        data_json = await db.run_sync(wallet_snapshot_json, emp, snapshot)
+        return employee_login_response(login_value, emp, data_json)
 
-    # При необходимости — статус в самой БД
-    if payload.status is not None:
-        add_change("status", emp.status, payload.status)
-        emp.status = payload.status
+    adm = (await db.execute(select(Admin).where(Admin.login == login_value))).scalar_one_or_none()
+    if not adm:
+        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+    ok, new_hash = await verify_and_rehash_password_async(payload.password, adm.password_hash)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Неверный логин или пароль")
+    release_login_throttle(client_ip(request), login_value)
+    if new_hash:
+        adm.password_hash = new_hash
+        await db.commit()
 
-    extra["history"] = history
-    extra_all[str(emp.id)] = extra
+    return LoginResponse(
+        role="admin",
+        login=login_value,
+        data={"name": adm.name},
+        token=issue_session_token("admin", adm.id, adm.session_version or 0),
+        expires_in=SESSION_TTL_SECONDS,
+    )
+
+
+@async_router.get("/employees", response_model=List[EmployeeShort])
+async def list_employees_async(
+    request: Request,
+    response: Response,
+    admin: Admin = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    version = await db.run_sync(employees_list_version)
+    not_modified = conditional_response(request, response, make_etag("employees", *version))
+    if not_modified:
+        return not_modified
+    result = await db.execute(
+        select(Employee).where(Employee.is_active == True).order_by(Employee.id.asc())
+    )
+    return result.scalars().all()
+
+
+@async_router.get("/employees/{employee_id}", response_model=EmployeeDetail)
+async def get_employee_async(
+    employee_id: int,
+    request: Request,
+    response: Response,
+    admin: Admin = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    version = await db.run_sync(employee_row_version, employee_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Сотрудник не найден")
+    not_modified = conditional_response(
+        request, response, make_etag("employee", employee_id, version)
+    )
+    if not_modified:
+        return not_modified
+
+    async def load() -> EmployeeDetail:
+        return build_employee_detail(await get_employee_or_404_async(db, employee_id))
+
+    return await READ_CACHE.get_async("detail", employee_id, version, load)
+
+
+@async_router.post("/employees", response_model=EmployeeDetail)
+async def create_employee_async(
+    payload: EmployeeCreate,
+    admin: Admin = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    login_taken = await db.execute(select(Employee.id).where(Employee.login == payload.login.lower()))
+    if login_taken.first():
+        raise HTTPException(status_code=400, detail="Логин уже занят")
+    password_hash = await get_password_hash_async(payload.password)
+    emp_id = await run_write_op_async(db, lambda s: create_employee_op(s, payload, password_hash))
+    return build_employee_detail(await db.get(Employee, emp_id, populate_existing=True))
 
-    db.commit()
-    db.refresh(emp)
-    save_employee_cards(extra_all)
 
-    return build_employee_card(emp, extra)
+@async_router.put("/employees/{employee_id}", response_model=EmployeeDetail)
+async def update_employee_async(
+    employee_id: int,
+    payload: EmployeeUpdate,
+    admin: Admin = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    password_hash = await get_password_hash_async(payload.password) if payload.password else None
+    await run_write_op_async(
+        db, lambda s: apply_employee_update(s, employee_id, payload, password_hash)
+    )
+    READ_CACHE.invalidate(employee_id)
+    return build_employee_detail(await db.get(Employee, employee_id, populate_existing=True))
+
+
+@async_router.delete("/employees/{employee_id}")
+async def delete_employee_async(
+    employee_id: int,
+    admin: Admin = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    result = await run_write_op_async(db, lambda s: deactivate_employee_op(s, employee_id))
+    READ_CACHE.invalidate(employee_id)
+    return result
+
+
+@async_router.post("/employees/{employee_id}/photo")
+async def upload_employee_photo_async(
+    employee_id: int,
+    file: UploadFile = File(...),
+    admin: Admin = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    await get_employee_or_404_async(db, employee_id)
+    filename = employee_photo_filename(employee_id, file.filename)
+    await run_in_threadpool((PHOTOS_DIR / filename).write_bytes, await file.read())
+
+    photo_url = f"/static/{filename}"
+    await run_write_op_async(db, lambda s: set_employee_photo_op(s, employee_id, photo_url))
+    READ_CACHE.invalidate(employee_id)
+    return {"photo_url": photo_url}
+
+
+@async_router.get("/employees/{employee_id}/export")
+async def export_employee_excel_async(
+    employee_id: int,
+    admin: Admin = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    emp = await get_employee_or_404_async(db, employee_id)
+    bio = await run_in_threadpool(build_employee_workbook, emp)
+
+    filename = f"employee_{employee_id}_card.xlsx"
+    return StreamingResponse(
+        bio,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@async_router.get("/employees/{employee_id}/payments", response_model=List[PaymentOut])
+async def list_payments_for_employee_async(
+    employee_id: int,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAYMENTS_PAGE_DEFAULT, ge=1, le=PAYMENTS_PAGE_MAX),
+    payment_type: Optional[str] = Query(None, alias="type"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    admin: Admin = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if await db.run_sync(employee_row_version, employee_id) is None:
+        raise HTTPException(status_code=404, detail="Сотрудник не найден")
+    etag = make_etag(
+        "payments", employee_id, cursor, limit, payment_type, date_from, date_to,
+        *(await db.run_sync(payments_version, employee_id)),
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    stmt = payments_page_query(employee_id, cursor, limit, payment_type, date_from, date_to)
+    rows = (await db.execute(stmt)).scalars().all()
+    return split_payments_page(rows, limit, response)
+
+
+@async_router.post("/employees/{employee_id}/payments", response_model=PaymentOut)
+async def create_payment_for_employee_async(
+    employee_id: int,
+    payload: PaymentCreate,
+    admin: Admin = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if WRITE_QUEUE.running:
+        # общий писатель с sync-эндпоинтами: пачка коммитов вместо гонки за блокировку
+        payment = await WRITE_QUEUE.run_async(
+            lambda session: create_payment_op(session, employee_id, payload)
+        )
+        READ_CACHE.invalidate(employee_id)
+        return payment
+
+    async with async_write_transaction(db):
+        balance = await db.run_sync(apply_payment_to_balance, employee_id, payload.amount)
+        if balance is None:
+            raise HTTPException(status_code=404, detail="Сотрудник не найден")
+
+        payment = Payment(
+            employee_id=employee_id,
+            type=payload.type,
+            amount=payload.amount,
+            comment=payload.comment,
+        )
+        db.add(payment)
+        await db.flush()
+
+        # помесячная статистика — общая sync-функция на той же транзакции
+        await db.run_sync(
+            update_month_stat_on_payment,
+            employee_id,
+            payload.amount,
+            payment.created_at,
+            payload.type,
+            payload.comment,
+            False,
+        )
+        await db.run_sync(write_wallet_snapshots, [employee_id])
+
+    READ_CACHE.invalidate(employee_id)
+    return payment
+
+
+@async_router.delete("/employees/{employee_id}/payments/{payment_id}")
+async def delete_payment_for_employee_async(
+    employee_id: int,
+    payment_id: int,
+    admin: Admin = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if WRITE_QUEUE.running:
+        result = await WRITE_QUEUE.run_async(
+            lambda session: delete_payment_op(session, employee_id, payment_id)
+        )
+        READ_CACHE.invalidate(employee_id)
+        return result
+
+    async with async_write_transaction(db):
+        payment = (await db.execute(delete_payment_returning(employee_id, payment_id))).first()
+        if not payment:
+            raise HTTPException(status_code=404, detail="Платёж не найден")
+
+        balance = await db.run_sync(
+            apply_payment_to_balance, payment.employee_id, -payment.amount
+        )
+        if balance is not None:
+            await db.run_sync(
+                update_month_stat_on_payment,
+                payment.employee_id,
+                payment.amount,
+                payment.created_at,
+                payment.type,
+                payment.comment,
+                True,
+            )
+            await db.run_sync(write_wallet_snapshots, [payment.employee_id])
+    READ_CACHE.invalidate(employee_id)
+    return {"status": "deleted", "id": payment_id}
+
+
+@async_router.post("/employee/payments", response_model=List[PaymentOut])
+async def list_payments_for_employee_self_async(
+    payload: EmployeeSelfPaymentsRequest,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    session: Optional[dict] = Depends(get_session_claims),
+):
+    emp = await authenticate_employee_async(
+        db, payload.login, payload.password, session, client_ip(request)
+    )
+    version = await db.run_sync(payments_version, emp.id)
+    not_modified = conditional_response(request, response, self_payments_etag(payload, emp.id, version))
+    if not_modified:
+        return not_modified
+    stmt = payments_page_query(
+        emp.id, payload.cursor, payload.limit, payload.type, payload.date_from, payload.date_to
+    )
+    rows = (await db.execute(stmt)).scalars().all()
+    return split_payments_page(rows, payload.limit, response)
+
+
+@async_router.post("/employee/card", response_model=EmployeeCardResponse)
+async def get_employee_card_self_async(
+    payload: EmployeeSelfCardRequest,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    session: Optional[dict] = Depends(get_session_claims),
+):
+    emp = await authenticate_employee_async(
+        db, payload.login, payload.password, session, client_ip(request), active_only=True
+    )
+    version = await db.run_sync(card_version, emp.id)
+    not_modified = conditional_response(request, response, make_etag("card", emp.id, *version))
+    if not_modified:
+        return not_modified
+
+    async def load() -> EmployeeCardResponse:
+        # emp читали до версии: перечитываем, чтобы в кэш не легла карточка старше её
+        await db.refresh(emp)
+        return build_employee_card(emp, await db.run_sync(load_employee_card, emp.id))
+
+    return await READ_CACHE.get_async("card", emp.id, version, load)
+
+
+@async_router.post("/employee/card/update", response_model=EmployeeCardResponse)
+async def update_employee_card_self_async(
+    payload: EmployeeSelfCardUpdateRequest,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    session: Optional[dict] = Depends(get_session_claims),
+):
+    emp = await authenticate_employee_async(
+        db, payload.login, payload.password, session, client_ip(request), active_only=True
+    )
+    emp_id = emp.id
+    await run_write_op_async(db, lambda s: apply_employee_card_update(s, emp_id, payload))
+    READ_CACHE.invalidate(emp_id)
+    await db.refresh(emp)
+    version = await db.run_sync(card_version, emp_id)
+    response.headers["ETag"] = make_etag("card", emp_id, *version)
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    return build_employee_card(emp, await db.run_sync(load_employee_card, emp_id))
+
+
+@async_router.post("/employee/card/history", response_model=List[CardHistoryEntry])
+async def list_employee_card_history_self_async(
+    payload: EmployeeSelfCardHistoryRequest,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    session: Optional[dict] = Depends(get_session_claims),
+):
+    emp = await authenticate_employee_async(
+        db, payload.login, payload.password, session, client_ip(request), active_only=True
+    )
+    history_version = await db.run_sync(card_history_version, emp.id)
+    etag = make_etag("card_history", emp.id, payload.cursor, payload.limit, history_version)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    stmt = card_history_page_query(emp.id, payload.cursor, payload.limit)
+    rows = (await db.execute(stmt)).scalars().all()
+    page = rows[:payload.limit]
+    if len(rows) > payload.limit:
+        response.headers["X-Next-Cursor"] = encode_keyset_cursor(page[-1].created_at, page[-1].id)
+    return [card_event_entry(event) for event in page]
+
+
+app.include_router(async_router)
 
 
 # ---------- ФРОНТ: КАРТОЧКА СОТРУДНИКА (React/Vite) ----------
@@ -0,0 +1,368 @@
+"""
+Версионированные миграции схемы SQLite.
+
+Версия схемы хранится в таблице schema_version (одна строка на применённую
+миграцию). На старте init_db сравнивает её с LATEST_VERSION: если схема
+актуальна — ничего не делаем (ни create_all, ни ALTER TABLE).
+
+Каждая миграция — функция от Connection, идемпотентная: колонки и индексы
+проверяются через PRAGMA table_info / index_list, поэтому миграцию можно
+повторить на базе, где изменения уже есть (старые базы до schema_version).
+Новые изменения схемы добавляются в конец MIGRATIONS со следующим номером.
+"""
+import json
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+
+# Карточки сотрудников до миграции 5 (файл остаётся как есть — резервная копия)
+LEGACY_EMPLOYEE_CARDS_JSON = Path(__file__).resolve().parent / "employee_cards.json"
+
+SCHEMA_VERSION_DDL = (
+    "CREATE TABLE IF NOT EXISTS schema_version ("
+    "version INTEGER PRIMARY KEY, "
+    "name VARCHAR(255) NOT NULL, "
+    "applied_at DATETIME NOT NULL)"
+)
+
+
+def sqlite_datetime(value: datetime) -> str:
+    """Дата в том же текстовом виде, что пишет SQLAlchemy: строки сравниваются как текст."""
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def table_columns(conn: Connection, table: str) -> Set[str]:
+    return {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+
+
+def add_column_if_missing(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """ddl — определение колонки после имени: "INTEGER NOT NULL DEFAULT 0"."""
+    if column not in table_columns(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+# ===============================
+#          МИГРАЦИИ
+# ===============================
+
+def _m001_legacy_columns(conn: Connection) -> None:
+    """Колонки, которые раньше добавлялись ALTER TABLE на каждом старте."""
+    for column, ddl in [
+        ("password_plain", "VARCHAR(255)"),
+        ("balance_int", "INTEGER"),
+        ("contract_hours_per_month", "INTEGER"),
+        ("hourly_rate", "INTEGER"),
+        ("schedule_type", "VARCHAR(50)"),
+        ("work_start_hour", "INTEGER"),
+        ("work_end_hour", "INTEGER"),
+        ("last_balance_update", "DATETIME"),
+        ("warehouse", "VARCHAR(255)"),
+        ("shift_role", "VARCHAR(50)"),
+        ("on_shift", "BOOLEAN DEFAULT 0"),
+        ("shift_rate", "INTEGER"),
+        ("session_version", "INTEGER NOT NULL DEFAULT 0"),
+    ]:
+        add_column_if_missing(conn, "employees", column, ddl)
+    add_column_if_missing(conn, "admins", "session_version", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _m002_month_stats_unique(conn: Connection) -> None:
+    """
+    Уникальный индекс (employee_id, year, month) для upsert помесячной
+    статистики. Дубли, набежавшие без него, сливаем в строку с меньшим id:
+    income и salary суммируются, остальные поля берутся из неё же.
+    """
+    conn.execute(text("""
+        UPDATE employee_month_stats SET
+            income = (
+                SELECT SUM(COALESCE(d.income, 0)) FROM employee_month_stats d
+                WHERE d.employee_id = employee_month_stats.employee_id
+                  AND d.year = employee_month_stats.year
+                  AND d.month = employee_month_stats.month
+            ),
+            salary = (
+                SELECT SUM(d.salary) FROM employee_month_stats d
+                WHERE d.employee_id = employee_month_stats.employee_id
+                  AND d.year = employee_month_stats.year
+                  AND d.month = employee_month_stats.month
+            )
+        WHERE id IN (
+            SELECT MIN(id) FROM employee_month_stats
+            GROUP BY employee_id, year, month HAVING COUNT(*) > 1
+        )
+    """))
+    conn.execute(text("""
+        DELETE FROM employee_month_stats WHERE id NOT IN (
+            SELECT MIN(id) FROM employee_month_stats GROUP BY employee_id, year, month
+        )
+    """))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_employee_month_stats_emp_month "
+        "ON employee_month_stats (employee_id, year, month)"
+    ))
+
+
+def _m003_payments_keyset_index(conn: Connection) -> None:
+    """Индекс под постраничную историю платежей (keyset по created_at, id)."""
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_payments_emp_created_id "
+        "ON payments (employee_id, created_at, id)"
+    ))
+
+
+def _m004_ledger_base_columns(conn: Connection) -> None:
+    """
+    balance_base / income_base / salary_base для сверки с журналом платежей
+    (ledger.py). На существующих данных считаем текущие значения верными:
+    база = значение - сумма платежей, дрейф начинает копиться с этого момента.
+    """
+    if "balance_base" not in table_columns(conn, "employees"):
+        conn.execute(text("ALTER TABLE employees ADD COLUMN balance_base INTEGER NOT NULL DEFAULT 0"))
+        conn.execute(text("""
+            UPDATE employees SET balance_base = COALESCE(balance_int, 0) - COALESCE(
+                (SELECT SUM(amount) FROM payments WHERE payments.employee_id = employees.id), 0
+            )
+        """))
+
+    month_columns = table_columns(conn, "employee_month_stats")
+    if "income_base" not in month_columns or "salary_base" not in month_columns:
+        add_column_if_missing(conn, "employee_month_stats", "income_base", "INTEGER NOT NULL DEFAULT 0")
+        add_column_if_missing(conn, "employee_month_stats", "salary_base", "INTEGER NOT NULL DEFAULT 0")
+        conn.execute(text("""
+            UPDATE employee_month_stats SET
+                income_base = COALESCE(income, 0) - COALESCE((
+                    SELECT SUM(p.amount) FROM payments p
+                    WHERE p.employee_id = employee_month_stats.employee_id
+                      AND p.created_at >= printf('%04d-%02d-01', year, month)
+                      AND p.created_at < date(printf('%04d-%02d-01', year, month), '+1 month')
+                ), 0),
+                salary_base = COALESCE(salary, 0) - COALESCE((
+                    SELECT SUM(p.amount) FROM payments p
+                    WHERE p.employee_id = employee_month_stats.employee_id
+                      AND p.type = 'salary'
+                      AND p.created_at >= printf('%04d-%02d-01', year, month)
+                      AND p.created_at < date(printf('%04d-%02d-01', year, month), '+1 month')
+                ), 0)
+        """))
+
+
+def _m005_employee_cards_table(conn: Connection) -> None:
+    """
+    Таблица employee_cards (строка на сотрудника) и разовый перенос данных
+    из employee_cards.json. INSERT OR IGNORE — повтор не затирает правки,
+    сделанные уже в таблице; записи удалённых из БД сотрудников пропускаем.
+    """
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS employee_cards ("
+        "employee_id INTEGER NOT NULL PRIMARY KEY, "
+        "responsibilities_json TEXT, "
+        "skills_json TEXT, "
+        "roles_json TEXT, "
+        "history_json TEXT, "
+        "updated_at DATETIME NOT NULL)"
+    ))
+    if not LEGACY_EMPLOYEE_CARDS_JSON.exists():
+        return
+    try:
+        with LEGACY_EMPLOYEE_CARDS_JSON.open("r", encoding="utf-8") as f:
+            legacy = json.load(f)
+    except (OSError, ValueError):
+        # битый файл раньше тоже читался как пустой
+        return
+    if not isinstance(legacy, dict):
+        return
+
+    employee_ids = {row[0] for row in conn.execute(text("SELECT id FROM employees"))}
+    now = sqlite_datetime(datetime.utcnow())
+    rows = []
+    for key, card in legacy.items():
+        try:
+            emp_id = int(key)
+        except ValueError:
+            continue
+        if emp_id not in employee_ids or not isinstance(card, dict):
+            continue
+        rows.append({
+            "id": emp_id,
+            **{
+                field: json.dumps(card.get(field) or [], ensure_ascii=False)
+                for field in ("responsibilities", "skills", "roles", "history")
+            },
+            "t": now,
+        })
+    if rows:
+        conn.execute(
+            text(
+                "INSERT OR IGNORE INTO employee_cards "
+                "(employee_id, responsibilities_json, skills_json, roles_json, history_json, updated_at) "
+                "VALUES (:id, :responsibilities, :skills, :roles, :history, :t)"
+            ),
+            rows,
+        )
+
+
+def _m006_employee_card_events(conn: Connection) -> None:
+    """
+    Журнал правок карточки employee_card_events с индексом
+    (employee_id, created_at, id). История из employee_cards.history_json
+    (полные старые и новые списки) переносится разницей — добавлено/удалено,
+    для статуса — старое/новое значение; history_json после этого очищается.
+    """
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS employee_card_events ("
+        "id INTEGER NOT NULL PRIMARY KEY, "
+        "employee_id INTEGER NOT NULL, "
+        "created_at DATETIME NOT NULL, "
+        "field VARCHAR(50) NOT NULL, "
+        "added_json TEXT, "
+        "removed_json TEXT, "
+        "old_value TEXT, "
+        "new_value TEXT)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_employee_card_events_emp_created_id "
+        "ON employee_card_events (employee_id, created_at, id)"
+    ))
+    if "history_json" not in table_columns(conn, "employee_cards"):
+        return
+
+    def as_list(value) -> list:
+        return [str(v) for v in value] if isinstance(value, list) else []
+
+    events = []
+    rows = conn.execute(text(
+        "SELECT employee_id, history_json FROM employee_cards WHERE history_json IS NOT NULL"
+    ))
+    for emp_id, raw in rows:
+        try:
+            history = json.loads(raw)
+        except ValueError:
+            continue
+        for item in history if isinstance(history, list) else []:
+            if not isinstance(item, dict) or not item.get("field"):
+                continue
+            try:
+                created_at = datetime.fromisoformat(str(item.get("timestamp")))
+            except ValueError:
+                continue
+            event = {
+                "e": emp_id, "t": sqlite_datetime(created_at), "f": item["field"],
+                "a": None, "r": None, "o": None, "n": None,
+            }
+            if item["field"] == "status":
+                event["o"] = None if item.get("old") is None else str(item["old"])
+                event["n"] = None if item.get("new") is None else str(item["new"])
+                if event["o"] == event["n"]:
+                    continue
+            else:
+                old, new = Counter(as_list(item.get("old"))), Counter(as_list(item.get("new")))
+                added, removed = list((new - old).elements()), list((old - new).elements())
+                if not added and not removed:
+                    continue
+                event["a"] = json.dumps(added, ensure_ascii=False)
+                event["r"] = json.dumps(removed, ensure_ascii=False)
+            events.append(event)
+    if events:
+        conn.execute(
+            text(
+                "INSERT INTO employee_card_events "
+                "(employee_id, created_at, field, added_json, removed_json, old_value, new_value) "
+                "VALUES (:e, :t, :f, :a, :r, :o, :n)"
+            ),
+            events,
+        )
+    conn.execute(text("UPDATE employee_cards SET history_json = NULL"))
+
+
+def _m007_row_version(conn: Connection) -> None:
+    """
+    row_version в employees и employee_cards для ETag. Увеличивают его
+    триггеры на любой UPDATE — так версию не забудет ни ORM, ни Core-запрос
+    (пачки платежей, начисление, ремонт журнала). WHEN не даёт триггеру
+    сработать на собственный UPDATE.
+    """
+    for table, key in (("employees", "id"), ("employee_cards", "employee_id")):
+        add_column_if_missing(conn, table, "row_version", "INTEGER NOT NULL DEFAULT 0")
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_row_version "
+            f"AFTER UPDATE ON {table} FOR EACH ROW "
+            f"WHEN NEW.row_version = OLD.row_version "
+            f"BEGIN UPDATE {table} SET row_version = OLD.row_version + 1 "
+            f"WHERE {key} = NEW.{key}; END"
+        ))
+
+
+def _m008_wallet_snapshots(conn: Connection) -> None:
+    """
+    Таблица wallet_snapshots — готовый data ответа /api/login. Заполняется
+    не здесь: снимок собирает код приложения (первый вход сотрудника или
+    python rebuild_wallet_snapshots.py).
+    """
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS wallet_snapshots ("
+        "employee_id INTEGER NOT NULL PRIMARY KEY, "
+        "format_version INTEGER NOT NULL, "
+        "row_version INTEGER NOT NULL, "
+        "data_json TEXT NOT NULL, "
+        "built_at DATETIME NOT NULL)"
+    ))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "legacy employee/admin columns", _m001_legacy_columns),
+    (2, "unique employee_month_stats (employee_id, year, month)", _m002_month_stats_unique),
+    (3, "payments (employee_id, created_at, id) index", _m003_payments_keyset_index),
+    (4, "ledger base columns", _m004_ledger_base_columns),
+    (5, "employee_cards table from employee_cards.json", _m005_employee_cards_table),
+    (6, "employee_card_events log from card history", _m006_employee_card_events),
+    (7, "row_version columns and triggers", _m007_row_version),
+    (8, "wallet_snapshots table", _m008_wallet_snapshots),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ===============================
+#          ПРИМЕНЕНИЕ
+# ===============================
+
+def current_version(conn: Connection) -> int:
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+    ).first()
+    if not exists:
+        return 0
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar() or 0
+
+
+def is_current(engine: Engine) -> bool:
+    with engine.connect() as conn:
+        return current_version(conn) >= LATEST_VERSION
+
+
+def migrate(engine: Engine) -> List[int]:
+    """
+    Применяет недостающие миграции, каждую в своей транзакции.
+    Возвращает номера применённых.
+    """
+    applied: List[int] = []
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA_VERSION_DDL))
+        version = current_version(conn)
+
+    for number, name, fn in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": number, "n": name, "t": datetime.utcnow()},
+            )
+        applied.append(number)
+    return applied
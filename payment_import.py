@@ -0,0 +1,247 @@
+"""
+Чтение и проверка файла массового импорта платежей (XLSX / CSV).
+
+Файл читается потоково: XLSX — openpyxl в режиме read_only (строки по одной,
+без загрузки листа в память), CSV — csv.reader поверх TextIOWrapper. Наружу
+отдаётся генератор (номер строки, платёж | None, ошибка | None), пачки и
+запись в БД — на стороне main.import_payments_from_file.
+
+Первая строка — заголовок. Колонки (регистр не важен, есть русские имена):
+  employee_id | login   — сотрудник (хотя бы одна из двух)
+  type                  — salary / bonus / overtime / night / fine / other
+  amount                — целые рубли, "1 500", "-300"; по модулю не больше AMOUNT_MAX
+  comment               — необязательно
+  date                  — необязательно: 2025-03-15, 15.03.2025, 2025-03-15 12:00
+"""
+import csv
+import io
+import itertools
+from datetime import date, datetime
+from typing import Dict, Iterator, Optional, Sequence, Set, Tuple
+
+PAYMENT_TYPES = ("salary", "bonus", "overtime", "night", "fine", "other")
+
+COLUMN_ALIASES = {
+    "employee_id": "employee_id",
+    "id": "employee_id",
+    "id сотрудника": "employee_id",
+    "login": "login",
+    "логин": "login",
+    "type": "type",
+    "тип": "type",
+    "amount": "amount",
+    "сумма": "amount",
+    "comment": "comment",
+    "комментарий": "comment",
+    "date": "created_at",
+    "created_at": "created_at",
+    "дата": "created_at",
+}
+
+DATE_FORMATS = ("%d.%m.%Y", "%d.%m.%Y %H:%M")
+
+COMMENT_MAX_LEN = 255
+# сумма одной строки по модулю; сильно ниже предела INTEGER SQLite (2**63 - 1),
+# чтобы и сумма пачки по сотруднику не переполнялась
+AMOUNT_MAX = 1_000_000_000
+
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+
+class ImportFormatError(ValueError):
+    """Файл целиком не подходит: не читается или нет обязательных колонок."""
+
+
+class RowError(ValueError):
+    """Ошибка в одной строке — попадает в отчёт, импорт продолжается."""
+
+
+# ===============================
+#           ЧТЕНИЕ ФАЙЛА
+# ===============================
+
+def _iter_xlsx(fileobj) -> Iterator[Sequence]:
+    # openpyxl тяжёлый на импорт — грузим только при импорте XLSX
+    from openpyxl import load_workbook
+
+    try:
+        wb = load_workbook(fileobj, read_only=True, data_only=True)
+    except Exception as exc:
+        raise ImportFormatError(f"не удалось открыть XLSX: {exc}") from exc
+    try:
+        yield from wb.worksheets[0].iter_rows(values_only=True)
+    except Exception as exc:
+        # read_only распаковывает лист по ходу чтения: битый архив или XML
+        # обнаруживается только на середине файла
+        raise ImportFormatError(f"не удалось прочитать XLSX: {exc}") from exc
+    finally:
+        wb.close()
+
+
+def _iter_csv(fileobj) -> Iterator[Sequence]:
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        header = text.readline()
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError("CSV должен быть в UTF-8") from exc
+    # Excel в русской локали сохраняет CSV через ';'
+    delimiter = ";" if header.count(";") > header.count(",") else ","
+    try:
+        yield from csv.reader(itertools.chain([header], text), delimiter=delimiter)
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError("CSV должен быть в UTF-8") from exc
+    finally:
+        # файл закрывает владелец (UploadFile), TextIOWrapper его не трогает
+        if not fileobj.closed:
+            text.detach()
+
+
+def iter_file_rows(fileobj, filename: str) -> Iterator[Sequence]:
+    """Строки файла как последовательности ячеек; формат — по расширению."""
+    name = filename.lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        return _iter_xlsx(fileobj)
+    if name.endswith((".csv", ".txt")):
+        return _iter_csv(fileobj)
+    raise ImportFormatError("поддерживаются только .xlsx и .csv")
+
+
+# ===============================
+#          РАЗБОР СТРОК
+# ===============================
+
+def _is_empty(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _parse_amount(value) -> int:
+    if isinstance(value, bool):
+        raise RowError("amount: ожидается число")
+    if isinstance(value, int):
+        amount = value
+    elif isinstance(value, float):
+        if not value.is_integer():
+            raise RowError("amount: только целые рубли")
+        amount = int(value)
+    else:
+        raw = str(value)
+        for junk in (" ", "\u00a0", "\u202f", "₽"):
+            raw = raw.replace(junk, "")
+        try:
+            amount = int(raw)
+        except ValueError:
+            raise RowError(f"amount: не число ({value!r})") from None
+    if amount == 0:
+        raise RowError("amount: сумма не может быть нулевой")
+    if abs(amount) > AMOUNT_MAX:
+        raise RowError(f"amount: по модулю больше {AMOUNT_MAX}")
+    return amount
+
+
+def _parse_date(value, default: datetime) -> datetime:
+    if _is_empty(value):
+        return default
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    raw = str(value).strip()
+    try:
+        # ISO (2025-03-15, 2025-03-15 12:00) — основной формат, без strptime
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(raw, fmt)
+        except ValueError:
+            continue
+    raise RowError(f"date: не разобрать дату ({raw!r})")
+
+
+def _parse_employee_id(value) -> int:
+    """Целое; 12.0 из XLSX и "12.0" из CSV — тоже, но не "1.9" и не "inf"."""
+    if isinstance(value, bool):
+        raise RowError("employee_id: ожидается число")
+    if isinstance(value, int):
+        return value
+    raw = str(value).strip()
+    try:
+        return int(raw)
+    except ValueError:
+        pass
+    try:
+        number = float(raw)
+        if not number.is_integer():
+            raise ValueError(raw)
+        return int(number)
+    except (ValueError, OverflowError):
+        raise RowError(f"employee_id: не целое число ({value!r})") from None
+
+
+def _resolve_employee(
+    cells: Dict[str, object], employee_ids: Set[int], employees_by_login: Dict[str, int]
+) -> int:
+    raw_id = cells.get("employee_id")
+    if not _is_empty(raw_id):
+        emp_id = _parse_employee_id(raw_id)
+        if emp_id not in employee_ids:
+            raise RowError(f"сотрудник {emp_id} не найден")
+        return emp_id
+
+    login = cells.get("login")
+    if _is_empty(login):
+        raise RowError("не указан сотрудник (employee_id или login)")
+    emp_id = employees_by_login.get(str(login).strip())
+    if emp_id is None:
+        raise RowError(f"сотрудник с логином {str(login).strip()!r} не найден")
+    return emp_id
+
+
+def parse_payment_rows(
+    rows: Iterator[Sequence],
+    employee_ids: Set[int],
+    employees_by_login: Dict[str, int],
+    now: datetime,
+) -> Iterator[ParsedRow]:
+    """
+    (номер строки в файле, платёж, None) для корректных строк и
+    (номер строки, None, текст ошибки) для остальных. Пустые строки пропускаются.
+    """
+    header = next(rows, None)
+    if header is None:
+        raise ImportFormatError("файл пустой")
+    columns: Dict[str, int] = {}
+    for index, title in enumerate(header):
+        name = COLUMN_ALIASES.get(str(title or "").strip().lower())
+        if name and name not in columns:
+            columns[name] = index
+    missing = [c for c in ("type", "amount") if c not in columns]
+    if "employee_id" not in columns and "login" not in columns:
+        missing.append("employee_id | login")
+    if missing:
+        raise ImportFormatError(f"нет обязательных колонок: {', '.join(missing)}")
+
+    for row_no, row in enumerate(rows, start=2):
+        if all(_is_empty(v) for v in row):
+            continue
+        cells = {name: (row[i] if i < len(row) else None) for name, i in columns.items()}
+        try:
+            payment_type = str(cells.get("type") or "").strip().lower()
+            if payment_type not in PAYMENT_TYPES:
+                raise RowError(f"type: ожидается одно из {', '.join(PAYMENT_TYPES)}")
+            comment = cells.get("comment")
+            comment = None if _is_empty(comment) else str(comment).strip()
+            if comment and len(comment) > COMMENT_MAX_LEN:
+                raise RowError(f"comment: длиннее {COMMENT_MAX_LEN} символов")
+            payment = {
+                "employee_id": _resolve_employee(cells, employee_ids, employees_by_login),
+                "type": payment_type,
+                "amount": _parse_amount(cells.get("amount")),
+                "comment": comment,
+                "created_at": _parse_date(cells.get("created_at"), now),
+            }
+        except RowError as exc:
+            yield row_no, None, str(exc)
+            continue
+        yield row_no, payment, None
@@ -0,0 +1,121 @@
+"""
+Векторный прогноз почасовых начислений для всех сотрудников сразу.
+
+Вместо вызова расчёта на каждый ORM-объект данные всех сотрудников
+грузятся в массивы NumPy (ставка, окно смены, склад, баланс, момент
+последнего начисления), и часы до заданной даты считаются одним проходом:
+  - для каждой уникальной комбинации (окно смены, склад) берётся битовая
+    карта часов из производственного календаря и сворачивается в префиксные
+    суммы на общем отрезке [самое раннее начало, until];
+  - часы сотрудника = prefix[комбинация, until] - prefix[комбинация, начало].
+"""
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from work_calendar import WorkCalendar
+
+
+HOUR = np.timedelta64(1, "h")
+
+
+def _hour_bits(
+    calendar: WorkCalendar,
+    base: np.datetime64,
+    span: int,
+    start_hour: int,
+    end_hour: int,
+    warehouse: Optional[str],
+) -> np.ndarray:
+    """Рабочие часы (0/1) на отрезке [base, base + span часов)."""
+    first_year = int(str(base)[:4])
+    last_year = int(str(base + span * HOUR)[:4])
+    chunks = [
+        np.frombuffer(calendar.hour_bitmap(year, start_hour, end_hour, warehouse), dtype=np.uint8)
+        for year in range(first_year, last_year + 1)
+    ]
+    offset = int((base - np.datetime64(f"{first_year}-01-01T00", "h")) / HOUR)
+    return np.concatenate(chunks)[offset:offset + span]
+
+
+def project_hours(
+    calendar: WorkCalendar,
+    starts: np.ndarray,
+    until: np.datetime64,
+    window_start: np.ndarray,
+    window_end: np.ndarray,
+    warehouse_idx: np.ndarray,
+    warehouses: Sequence[Optional[str]],
+) -> np.ndarray:
+    """
+    Рабочие часы каждого сотрудника в [starts[i], until).
+    starts — datetime64[h]; warehouse_idx — индексы в warehouses.
+    """
+    n = len(starts)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    until = np.datetime64(until, "h")
+    starts = np.minimum(starts.astype("datetime64[h]"), until)
+    base = starts.min()
+    span = int((until - base) / HOUR)
+
+    # комбинация (начало, конец, склад) → одно целое, чтобы unique был одномерным
+    keys = (window_start.astype(np.int64) * 24 + window_end) * len(warehouses) + warehouse_idx
+    combos, combo_idx = np.unique(keys, return_inverse=True)
+    combo_idx = combo_idx.reshape(-1)
+
+    prefix = np.zeros((len(combos), span + 1), dtype=np.int64)
+    for k, key in enumerate(combos.tolist()):
+        window, wh = divmod(key, len(warehouses))
+        start_hour, end_hour = divmod(window, 24)
+        bits = _hour_bits(calendar, base, span, start_hour, end_hour, warehouses[wh])
+        np.cumsum(bits, out=prefix[k, 1:])
+
+    start_off = ((starts - base) / HOUR).astype(np.int64)
+    return prefix[combo_idx, span] - prefix[combo_idx, start_off]
+
+
+def project_payroll(
+    calendar: WorkCalendar,
+    balances: np.ndarray,
+    hourly_rates: np.ndarray,
+    starts: np.ndarray,
+    until: np.datetime64,
+    window_start: np.ndarray,
+    window_end: np.ndarray,
+    warehouse_idx: np.ndarray,
+    warehouses: List[Optional[str]],
+) -> dict:
+    """
+    Прогноз на момент until: начисления и балансы по сотрудникам и итоги по складам.
+    hourly_rates = 0 для тех, кому почасовое начисление не положено.
+    """
+    hours = project_hours(
+        calendar, starts, until, window_start, window_end, warehouse_idx, warehouses
+    )
+    hours = np.where(hourly_rates > 0, hours, 0)
+    accrual = hours * hourly_rates.astype(np.int64)
+    projected = balances.astype(np.int64) + accrual
+
+    n_wh = len(warehouses)
+    per_wh_count = np.bincount(warehouse_idx, minlength=n_wh)
+    per_wh_balance = np.bincount(warehouse_idx, weights=balances, minlength=n_wh)
+    per_wh_accrual = np.bincount(warehouse_idx, weights=accrual, minlength=n_wh)
+
+    return {
+        "hours": hours,
+        "accrual": accrual,
+        "projected_balance": projected,
+        "warehouses": [
+            {
+                "warehouse": warehouses[i],
+                "employees": int(per_wh_count[i]),
+                "current_balance": int(per_wh_balance[i]),
+                "projected_accrual": int(per_wh_accrual[i]),
+                "projected_balance": int(per_wh_balance[i] + per_wh_accrual[i]),
+            }
+            for i in range(n_wh)
+            if per_wh_count[i]
+        ],
+    }
@@ -0,0 +1,168 @@
+"""
+Кэш read-моделей сотрудника в памяти процесса (LRU + TTL).
+
+Ключ — (вид, employee_id): "detail" — EmployeeDetail админки, "card" —
+карточка сотрудника. Данные входа в кошелёк сюда не попадают: они хранятся
+готовыми в таблице wallet_snapshots (см. main.write_wallet_snapshots).
+Вместе со значением хранится версия данных, которую вызывающий и так знает
+(row_version из ETag, см. main.make_etag): запись с другой версией считается
+промахом, поэтому правка мимо этого процесса (другой воркер, скрипт, прямой
+SQL) не отдаётся из кэша дольше, чем до следующего чтения версии.
+
+Пути записи в main.py дополнительно явно сбрасывают кэш сотрудника
+(invalidate) после коммита. Поколение на employee_id защищает от гонки:
+чтение, начатое до коммита, не положит в кэш старые данные после сброса.
+TTL — страховка для того, что версией не покрыто.
+
+Значения отдаются всем запросам общими — их нельзя изменять.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class ReadCache:
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        # max_entries = 0 — кэш выключен, всё идёт в loader
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[Hashable, float, Any]]" = OrderedDict()
+        self._generations: Dict[int, int] = defaultdict(int)
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "skipped_stores": 0,
+        }
+        self._by_kind: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    # ===============================
+    #            ЧТЕНИЕ
+    # ===============================
+
+    def lookup(self, kind: str, employee_id: int, version: Hashable) -> Tuple[bool, Any, tuple]:
+        """
+        (попадание, значение, токен). Токен при промахе передаётся в store:
+        значение сохранится, только если сотрудника с тех пор не сбрасывали.
+        """
+        key = (kind, employee_id)
+        now = self.clock()
+        with self._lock:
+            token = (self._epoch, self._generations[employee_id])
+            entry = self._entries.get(key)
+            if entry is not None:
+                cached_version, expires_at, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    self._counters["expired"] += 1
+                elif cached_version != version:
+                    del self._entries[key]
+                    self._counters["stale"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    self._by_kind[kind]["hits"] += 1
+                    return True, value, token
+            self._counters["misses"] += 1
+            self._by_kind[kind]["misses"] += 1
+            return False, None, token
+
+    def store(self, kind: str, employee_id: int, version: Hashable, value: Any, token: tuple) -> None:
+        if not self.enabled:
+            return
+        key = (kind, employee_id)
+        with self._lock:
+            if token != (self._epoch, self._generations[employee_id]):
+                # между чтением из БД и сохранением была запись — значение могло устареть
+                self._counters["skipped_stores"] += 1
+                return
+            self._entries[key] = (version, self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def get(self, kind: str, employee_id: int, version: Hashable, loader: Callable[[], Any]) -> Any:
+        hit, value, token = self.lookup(kind, employee_id, version)
+        if hit:
+            return value
+        value = loader()
+        self.store(kind, employee_id, version, value, token)
+        return value
+
+    async def get_async(
+        self, kind: str, employee_id: int, version: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        hit, value, token = self.lookup(kind, employee_id, version)
+        if hit:
+            return value
+        value = await loader()
+        self.store(kind, employee_id, version, value, token)
+        return value
+
+    # ===============================
+    #            СБРОС
+    # ===============================
+
+    def invalidate(self, *employee_ids: int) -> None:
+        """Сбросить все виды записей сотрудников — после коммита их изменений."""
+        with self._lock:
+            for employee_id in employee_ids:
+                self._generations[employee_id] += 1
+                # виды известны по статистике: store бывает только после lookup
+                for kind in self._by_kind:
+                    self._entries.pop((kind, employee_id), None)
+                self._counters["invalidations"] += 1
+
+    def invalidate_all(self) -> None:
+        """Массовые записи (импорт, ведомость, начисление, ремонт журнала)."""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        """Сброс вместе со статистикой — на старте приложения (и между тестами)."""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._generations.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+            self._by_kind.clear()
+
+    # ===============================
+    #            МЕТРИКИ
+    # ===============================
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            by_kind = {kind: dict(values) for kind, values in self._by_kind.items()}
+            size = len(self._entries)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "size": size,
+            **counters,
+            "hit_ratio": round(counters["hits"] / lookups, 3) if lookups else None,
+            "by_kind": by_kind,
+        }
@@ -0,0 +1,24 @@
+"""
+Пересборка всех снимков кошелька (таблица wallet_snapshots, см. main.py).
+
+Вход сотрудника и так пересобирает свой устаревший снимок, команда нужна,
+чтобы этого не ждать: после смены WALLET_SNAPSHOT_FORMAT, массовых правок
+базы мимо API или на новой базе перед открытием входа.
+
+    python rebuild_wallet_snapshots.py --batch-size 500
+"""
+import argparse
+import json
+
+from main import WALLET_SNAPSHOT_BATCH, WALLET_SNAPSHOT_STATS, init_db, rebuild_all_wallet_snapshots
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересборка снимков кошелька для /api/login")
+    parser.add_argument("--batch-size", type=int, default=WALLET_SNAPSHOT_BATCH,
+                        help="сотрудников в одной транзакции")
+    args = parser.parse_args()
+
+    init_db()
+    rebuild_all_wallet_snapshots(args.batch_size)
+    print(json.dumps(WALLET_SNAPSHOT_STATS["last_rebuild_all"], ensure_ascii=False, indent=2))
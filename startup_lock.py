@@ -0,0 +1,75 @@
+"""
+Межпроцессная блокировка для работы, которую на старте нужно сделать один раз.
+
+`uvicorn main:app --workers N` и gunicorn запускают on_startup в каждом
+воркере одновременно: миграции, демо-данные и калибровка argon2 шли
+наперегонки. Здесь — эксклюзивная блокировка файла (fcntl.flock, на Windows
+msvcrt.locking): первый воркер делает работу, остальные ждут и, получив
+блокировку, видят, что делать уже нечего. Блокировка снимается ОС и при
+падении процесса, так что «залипшего» замка не бывает.
+"""
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+STARTUP_LOCK_TIMEOUT = float(os.getenv("LW_STARTUP_LOCK_TIMEOUT", "120"))
+
+# сколько ждали и сколько держали блокировку (для метрик)
+LOCK_STATS = {"acquired": 0, "wait_ms": 0.0, "held_ms": 0.0}
+
+
+class StartupLockTimeout(RuntimeError):
+    """Другой процесс слишком долго держит блокировку старта."""
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def startup_lock(
+    path: Path, timeout: float = STARTUP_LOCK_TIMEOUT, poll_interval: float = 0.05
+) -> Iterator[None]:
+    """Эксклюзивная блокировка файла path на время блока with."""
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        started = time.monotonic()
+        while not _try_lock(fd):
+            if time.monotonic() - started > timeout:
+                raise StartupLockTimeout(f"не дождались блокировки {path} за {timeout:.0f} с")
+            time.sleep(poll_interval)
+        acquired = time.monotonic()
+        LOCK_STATS["acquired"] += 1
+        LOCK_STATS["wait_ms"] += round((acquired - started) * 1000, 1)
+        try:
+            yield
+        finally:
+            LOCK_STATS["held_ms"] += round((time.monotonic() - acquired) * 1000, 1)
+            _unlock(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,55 @@
+"""
+Общая настройка тестов: main импортируется на временной базе, argon2 —
+в процессе (без пула), демо-данные не сидятся.
+
+    python -m pytest -q                   # все тесты
+    python -m pytest -q -m "not slow"     # без запуска процессов и нагрузки
+"""
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_TMP = tempfile.mkdtemp(prefix="lw-tests-")
+os.environ.setdefault("LW_DATABASE_URL", f"sqlite:///{Path(_TMP, 'tests.db').as_posix()}")
+os.environ.setdefault("LW_HASH_WORKERS", "0")
+os.environ.setdefault("LW_ACCRUAL_INTERVAL_SEC", "0")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: долгие тесты (процессы, нагрузка на SQLite)")
+
+
+@pytest.fixture
+def make_employee():
+    """
+    Фабрика сотрудников в тестовой базе: make_employee(**поля) -> id.
+    Логин уникальный, остальные обязательные поля — заглушки.
+    """
+    import main
+
+    main.init_db()
+
+    def make(**fields) -> int:
+        values = {
+            "login": f"test-{uuid.uuid4().hex[:8]}",
+            "password_hash": "x",
+            "initials": "ТТ",
+            "name": "Тест",
+            "position": "test",
+            "salary": "0",
+            **fields,
+        }
+        with main.SessionLocal() as db:
+            emp = main.Employee(**values)
+            db.add(emp)
+            db.commit()
+            return emp.id
+
+    return make
@@ -0,0 +1,60 @@
+"""
+Пишущие эндпоинты /api/async/...: сотрудник, фото, своя карточка — через
+WRITE_QUEUE и без него (async_write_transaction), результат виден sync API.
+"""
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+# демо-менеджер пускается по одному заголовку (require_admin)
+ADMIN = {"X-Admin-Login": "manager"}
+
+
+@pytest.fixture(params=["write_queue", "transaction"])
+def client(request, monkeypatch):
+    with TestClient(main.app) as client:
+        if request.param == "transaction":
+            monkeypatch.setattr(main.WriteQueue, "running", property(lambda self: False))
+        yield client
+        # писатель остановит shutdown — он должен видеть настоящий running
+        monkeypatch.undo()
+
+
+def test_async_employee_and_card_writes(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "PHOTOS_DIR", tmp_path)
+    login = f"async-{uuid.uuid4().hex[:8]}"
+    new = {"login": login, "password": "1111", "initials": "АА", "name": "Async", "position": "склад"}
+
+    created = client.post("/api/async/employees", headers=ADMIN, json=new)
+    assert created.status_code == 200
+    emp_id = created.json()["id"]
+    assert client.post("/api/async/employees", headers=ADMIN, json=new).status_code == 400
+
+    updated = client.put(
+        f"/api/async/employees/{emp_id}", headers=ADMIN, json={"position": "кладовщик", "password": "2222"}
+    )
+    assert updated.json()["position"] == "кладовщик"
+    assert client.get(f"/api/employees/{emp_id}", headers=ADMIN).json()["position"] == "кладовщик"
+
+    photo = client.post(
+        f"/api/async/employees/{emp_id}/photo", headers=ADMIN, files={"file": ("me.PNG", b"png")}
+    )
+    assert photo.json() == {"photo_url": f"/static/emp_{emp_id}.png"}
+    assert (tmp_path / f"emp_{emp_id}.png").read_bytes() == b"png"
+
+    creds = {"login": login, "password": "2222"}
+    card = client.post("/api/async/employee/card/update", json={**creds, "skills": ["погрузчик"]})
+    assert card.status_code == 200
+    assert card.json()["skills"] == ["погрузчик"]
+    assert card.json()["photo_url"] == f"/static/emp_{emp_id}.png"
+    again = client.post("/api/async/employee/card", json=creds, headers={"If-None-Match": card.headers["ETag"]})
+    assert again.status_code == 304
+    assert client.post("/api/employee/card", json=creds).json()["skills"] == ["погрузчик"]
+    history = client.post("/api/async/employee/card/history", json=creds).json()
+    assert [entry["field"] for entry in history] == ["skills"]
+
+    assert client.delete(f"/api/async/employees/{emp_id}", headers=ADMIN).json() == {"status": "ok", "id": emp_id}
+    assert client.post("/api/async/employee/card", json=creds).status_code == 401
@@ -0,0 +1,27 @@
+"""
+ETag истории платежей: удаление последнего платежа и ввод нового (SQLite
+отдаёт ему тот же id) не должны давать 304 со старыми данными.
+"""
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_payments_etag_changes_after_delete_and_reenter(make_employee):
+    with TestClient(main.app) as client:
+        emp_id = make_employee()
+        # демо-менеджер пускается по одному заголовку (require_admin)
+        admin = {"X-Admin-Login": "manager"}
+        url = f"/api/employees/{emp_id}/payments"
+
+        client.post(url, headers=admin, json={"type": "bonus", "amount": 100})
+        last = client.post(url, headers=admin, json={"type": "bonus", "amount": 200}).json()
+        first = client.get(url, headers=admin)
+
+        client.delete(f"{url}/{last['id']}", headers=admin)
+        again = client.post(url, headers=admin, json={"type": "bonus", "amount": 300}).json()
+        assert again["id"] == last["id"]
+
+        second = client.get(url, headers={**admin, "If-None-Match": first.headers["ETag"]})
+        assert second.status_code == 200
+        assert [p["amount"] for p in second.json()] == [300, 100]
@@ -0,0 +1,78 @@
+import pytest
+from fastapi import HTTPException
+
+import main
+from main import TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_bucket_burst_then_refill():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(capacity=3, refill_per_sec=0.5, clock=clock)
+    assert [limiter.try_acquire("ivan") for _ in range(3)] == [0, 0, 0]
+    assert limiter.try_acquire("ivan") == pytest.approx(2.0)
+    clock.now += 2
+    assert limiter.try_acquire("ivan") == 0
+    assert limiter.try_acquire("anna") == 0
+
+
+def test_wait_time_does_not_consume():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(capacity=1, refill_per_sec=1, clock=clock)
+    assert limiter.wait_time("ivan") == 0
+    assert limiter.wait_time("ivan") == 0
+    assert limiter.try_acquire("ivan") == 0
+    assert limiter.wait_time("ivan") == pytest.approx(1.0)
+    assert limiter.stats() == {"allowed": 1, "rejected": 1, "tracked_keys": 1}
+
+
+def test_refund_restores_attempt():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(capacity=1, refill_per_sec=0.1, clock=clock)
+    limiter.try_acquire("ivan")
+    limiter.refund("ivan")
+    assert limiter.try_acquire("ivan") == 0
+
+
+def test_max_keys_evicts_oldest():
+    limiter = TokenBucketLimiter(capacity=1, refill_per_sec=1, clock=FakeClock(), max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.try_acquire(key)
+    assert limiter.stats()["tracked_keys"] == 2
+    # "a" вытеснен — снова полная корзина
+    assert limiter.try_acquire("a") == 0
+
+
+def test_locked_login_does_not_drain_ip_bucket(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main, "LOGIN_LIMITER", TokenBucketLimiter(2, 1 / 12, clock=clock))
+    monkeypatch.setattr(main, "IP_LIMITER", TokenBucketLimiter(5, 1 / 2, clock=clock))
+
+    for _ in range(2):
+        main.enforce_login_throttle("10.0.0.1", "ivan")
+    for _ in range(20):
+        with pytest.raises(HTTPException) as exc:
+            main.enforce_login_throttle("10.0.0.1", "Ivan ")
+        assert exc.value.status_code == 429
+        assert int(exc.value.headers["Retry-After"]) >= 1
+
+    # за тем же NAT другой сотрудник входит: отказы по ivan лимит IP не тратили
+    for login in ("anna", "anna", "petrov"):
+        main.enforce_login_throttle("10.0.0.1", login)
+    # а вот теперь лимит IP (5) исчерпан
+    with pytest.raises(HTTPException):
+        main.enforce_login_throttle("10.0.0.1", "sidorov")
+
+
+@pytest.mark.parametrize("raw", ["0", "-5", "abc", "inf"])
+def test_bad_refill_env_falls_back_to_default(monkeypatch, raw):
+    monkeypatch.setenv("LW_LOGIN_REFILL_SEC", raw)
+    limiter = main._login_throttle_limiter("LOGIN", 5, 12)
+    assert limiter.refill_per_sec == pytest.approx(1 / 12)
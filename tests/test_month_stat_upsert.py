@@ -0,0 +1,15 @@
+"""
+Параллельные платежи в один месяц через update_month_stat_on_payment:
+ни одно приращение не теряется, строка месяца одна (bench_month_stat_upsert).
+"""
+from pathlib import Path
+
+import pytest
+
+from benchmarks import bench_month_stat_upsert
+
+
+@pytest.mark.slow
+def test_parallel_payments_keep_one_row_and_every_increment(tmp_path: Path):
+    url = f"sqlite:///{(tmp_path / 'upsert.db').as_posix()}"
+    assert bench_month_stat_upsert.run("upsert", url, threads=8, ops=50)
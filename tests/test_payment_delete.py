@@ -0,0 +1,29 @@
+"""
+Удаление платежа по URL чужого сотрудника: 404, платёж и кэш владельца целы.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+# демо-менеджер пускается по одному заголовку (require_admin)
+ADMIN = {"X-Admin-Login": "manager"}
+
+
+@pytest.mark.parametrize("prefix", ["/api", "/api/async"])
+def test_delete_via_other_employee_is_404(prefix, make_employee):
+    with TestClient(main.app) as client:
+        owner, other = make_employee(), make_employee()
+        payment = client.post(
+            f"/api/employees/{owner}/payments", headers=ADMIN, json={"type": "bonus", "amount": 100}
+        ).json()
+        # прогреваем кэш владельца
+        assert client.get(f"/api/employees/{owner}", headers=ADMIN).json()["salary"] == main.int_to_money(100)
+
+        wrong = client.delete(f"{prefix}/employees/{other}/payments/{payment['id']}", headers=ADMIN)
+        assert wrong.status_code == 404
+        assert len(client.get(f"/api/employees/{owner}/payments", headers=ADMIN).json()) == 1
+
+        right = client.delete(f"{prefix}/employees/{owner}/payments/{payment['id']}", headers=ADMIN)
+        assert right.status_code == 200
+        assert client.get(f"/api/employees/{owner}", headers=ADMIN).json()["salary"] == main.int_to_money(0)
@@ -0,0 +1,95 @@
+"""
+Массовый импорт платежей: файл, сломавшийся посреди чтения, не теряет
+отчёт о том, что уже закоммичено.
+"""
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+import main
+import payment_import
+from main import Employee, Payment, SessionLocal, import_payments_from_file
+
+
+@pytest.fixture
+def employee_id(make_employee):
+    return make_employee(balance_int=0)
+
+
+def csv_file(employee_id: int, rows: int, tail: bytes = b"") -> io.BytesIO:
+    lines = ["employee_id,type,amount"] + [f"{employee_id},bonus,10" for _ in range(rows)]
+    return io.BytesIO(("\n".join(lines) + "\n").encode() + tail)
+
+
+def committed(employee_id: int):
+    with SessionLocal() as db:
+        count = db.scalar(select(func.count()).where(Payment.employee_id == employee_id))
+        balance = db.scalar(select(Employee.balance_int).where(Employee.id == employee_id))
+    return count, balance
+
+
+def test_bad_byte_mid_stream_returns_partial_report(employee_id):
+    fileobj = csv_file(employee_id, 2000, tail=f"{employee_id},bonus,1\xff0\n".encode("latin-1"))
+    report = import_payments_from_file(SessionLocal(), fileobj, "payments.csv", chunk_size=100)
+
+    assert report["complete"] is False
+    assert report["stopped"]["error"] == "CSV должен быть в UTF-8"
+    # TextIOWrapper декодирует блоками: строки из блока с битым байтом не
+    # прочитаны, отчёт говорит, с какой строки загружать файл заново
+    assert 0 < report["imported"] == report["rows"] < 2000
+    assert report["stopped"]["after_row"] == report["rows"] + 1
+    assert committed(employee_id) == (report["imported"], report["imported"] * 10)
+
+
+def test_bad_header_is_still_format_error(employee_id):
+    with pytest.raises(payment_import.ImportFormatError):
+        import_payments_from_file(SessionLocal(), io.BytesIO(b"\xff\xfe,type\n"), "payments.csv")
+    assert committed(employee_id) == (0, 0)
+
+
+def test_clean_file_has_no_stopped(employee_id):
+    report = import_payments_from_file(SessionLocal(), csv_file(employee_id, 250), "payments.csv", chunk_size=100)
+    assert report["complete"] is True
+    assert "stopped" not in report
+    assert committed(employee_id) == (250, 2500)
+
+
+def test_endpoint_reports_partial_import_with_200(employee_id):
+    body = csv_file(employee_id, 2000, tail=b"\xff\n").getvalue()
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/api/admin/payments/import?chunk_size=100",
+            headers={"X-Admin-Login": "manager"},
+            files={"file": ("payments.csv", body)},
+        )
+    assert response.status_code == 200
+    assert response.json()["complete"] is False
+    assert response.json()["imported"] == committed(employee_id)[0]
+
+
+@pytest.mark.parametrize("raw", ["1.9", "inf", "1e999", "nan", "abc", 2.5, float("inf")])
+def test_bad_employee_id_is_row_error(raw):
+    with pytest.raises(payment_import.RowError):
+        payment_import._resolve_employee({"employee_id": raw}, {1, 2}, {})
+
+
+@pytest.mark.parametrize("raw", ["2", " 2 ", "2.0", 2, 2.0])
+def test_integer_employee_id(raw):
+    assert payment_import._resolve_employee({"employee_id": raw}, {1, 2}, {}) == 2
+
+
+@pytest.mark.parametrize("raw", ["10000000000000000000000", "-1000000001", 1e12])
+def test_huge_amount_is_row_error(raw):
+    with pytest.raises(payment_import.RowError):
+        payment_import._parse_amount(raw)
+
+
+def test_huge_amount_does_not_abort_import(employee_id):
+    fileobj = io.BytesIO(
+        f"employee_id,type,amount\n{employee_id},bonus,10000000000000000000000\n{employee_id},bonus,10\n".encode()
+    )
+    report = import_payments_from_file(SessionLocal(), fileobj, "payments.csv")
+    assert (report["imported"], report["error_count"], report["complete"]) == (1, 1, True)
+    assert committed(employee_id) == (1, 10)
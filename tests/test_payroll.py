@@ -0,0 +1,44 @@
+"""
+Ведомость: проверка входных данных build_payroll_lines до записи в БД.
+"""
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+import main
+from main import PayrollRunRequest, SessionLocal, build_payroll_lines
+
+
+@pytest.fixture
+def db():
+    main.init_db()
+    with SessionLocal() as session:
+        yield session
+
+
+def test_negative_shifts_rejected():
+    with pytest.raises(ValidationError):
+        PayrollRunRequest(rule="shift_rate", shifts_by_employee={1: -3})
+    with pytest.raises(ValidationError):
+        PayrollRunRequest(rule="shift_rate", shifts=-1)
+
+
+@pytest.mark.parametrize(
+    "payload, message",
+    [
+        (PayrollRunRequest(rule="fixed", amount_by_role={"picker": -500}), "type=fine"),
+        (PayrollRunRequest(rule="fixed", type="bonus", amount=-100), "type=fine"),
+        (PayrollRunRequest(rule="fixed", amount=100, comment="x" * 256), "comment"),
+        (PayrollRunRequest(lines=[{"employee_id": 1, "amount": 100, "comment": "x" * 256}]), "comment"),
+    ],
+    ids=["role-negative", "amount-negative", "comment", "line-comment"],
+)
+def test_bad_payroll_is_rejected(db, payload, message):
+    with pytest.raises(HTTPException) as exc:
+        build_payroll_lines(db, payload)
+    assert exc.value.status_code == 400
+    assert message in str(exc.value.detail)
+
+
+def test_fine_may_be_negative(db):
+    build_payroll_lines(db, PayrollRunRequest(rule="fixed", type="fine", amount_by_role={"picker": -500}))
@@ -0,0 +1,26 @@
+"""
+Лимиты классов маршрутов из LW_LIMIT_<CLASS>: опечатка в окружении даёт
+значение по умолчанию, а не падение импорта main.
+"""
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize(
+    "raw, limit, timeout",
+    [
+        ("16:0.5", 16, 0.5),
+        ("16", 16, 2.0),
+        (":0", 8, 0.0),       # без очереди — допустимо
+        ("abc:1", 8, 1.0),
+        ("-3:-1", 8, 2.0),
+        ("0:nan", 8, 2.0),
+        ("8.5:x", 8, 2.0),
+        ("1e999:inf", 8, 2.0),
+    ],
+)
+def test_route_class_env(monkeypatch, raw, limit, timeout):
+    monkeypatch.setenv("LW_LIMIT_AUTH", raw)
+    limiter = main._route_class_limiter("auth", 8, 2.0)
+    assert (limiter.limit, limiter.queue_timeout) == (limit, timeout)
@@ -0,0 +1,30 @@
+"""
+Старт приложения в отдельных процессах (benchmarks/bench_cold_start.py,
+bench_multiworker_startup.py) — регрессии старта валят CI.
+"""
+import os
+
+import pytest
+
+import migrations
+from benchmarks import bench_cold_start
+
+# бюджет медианного warm-старта (import + on_startup); на медленном CI — поднять
+MAX_WARM_MS = float(os.getenv("LW_TEST_MAX_WARM_MS", "3000"))
+
+
+@pytest.mark.slow
+def test_cold_and_warm_start():
+    fresh, warm = bench_cold_start.measure(runs=3)
+    assert fresh["migrations"] == [version for version, _, _ in migrations.MIGRATIONS]
+    assert bench_cold_start.find_failures(fresh, warm, MAX_WARM_MS) == []
+
+
+@pytest.mark.slow
+def test_parallel_workers_migrate_and_seed_once():
+    from benchmarks import bench_multiworker_startup
+
+    results, versions, failures = bench_multiworker_startup.run_workers(workers=3)
+    assert failures == []
+    assert len(results) == 3
+    assert sorted(versions) == [version for version, _, _ in migrations.MIGRATIONS]
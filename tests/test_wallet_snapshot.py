@@ -0,0 +1,36 @@
+"""
+Снимки кошелька: почасовое начисление их не пишет, вход после начисления
+всё равно отдаёт свежий баланс (пересборка по row_version).
+"""
+import json
+from datetime import datetime
+
+import main
+from main import Employee, SessionLocal, WalletSnapshot
+
+
+def test_login_after_accrual_rebuilds_snapshot(make_employee):
+    emp_id = make_employee(
+        salary=main.int_to_money(0),
+        balance_int=0,
+        hourly_rate=100,
+        schedule_type="office",
+        work_start_hour=8,
+        work_end_hour=19,
+        last_balance_update=datetime(2024, 6, 3, 8),  # понедельник
+    )
+    with SessionLocal() as db:
+        main.write_wallet_snapshots(db, [emp_id])
+        db.commit()
+
+    with SessionLocal() as db:
+        assert main.accrue_all_office_employees(db, now=datetime(2024, 6, 3, 12)) >= 1
+        db.commit()
+        snapshot = db.get(WalletSnapshot, emp_id)
+        emp = db.get(Employee, emp_id)
+        assert snapshot.row_version != emp.row_version
+
+        rebuilt = main.WALLET_SNAPSHOT_STATS["rebuilt_on_login"]
+        data = json.loads(main.wallet_snapshot_json(db, emp, snapshot))
+        assert main.WALLET_SNAPSHOT_STATS["rebuilt_on_login"] == rebuilt + 1
+        assert data["salary"] == main.int_to_money(400)
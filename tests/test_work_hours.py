@@ -0,0 +1,194 @@
+"""
+Рабочие часы офисника: расчёт по префиксным суммам календаря против
+исходного почасового цикла (accrue_balance_for_employee до user-006).
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+from work_calendar import WorkCalendar
+
+SEED = 6
+CASES = 300
+
+
+def original_is_office_work_time(dt: datetime, start_hour: int, end_hour: int) -> bool:
+    """is_office_work_time до производственного календаря."""
+    if dt.weekday() >= 5:
+        return False
+    h = dt.hour
+    if start_hour <= end_hour:
+        return start_hour <= h < end_hour
+    return h >= start_hour or h < end_hour
+
+
+def original_hours(start: datetime, end: datetime, start_hour: int, end_hour: int) -> int:
+    """Почасовой цикл из accrue_balance_for_employee."""
+    hours = 0
+    cursor = start
+    while cursor + timedelta(hours=1) <= end:
+        if original_is_office_work_time(cursor, start_hour, end_hour):
+            hours += 1
+        cursor += timedelta(hours=1)
+    return hours
+
+
+def original_accrual(last_update: datetime, balance: int, rate: int, start_hour, end_hour, now: datetime):
+    """Исходное начисление: (баланс, новый last_balance_update)."""
+    cursor = last_update.replace(minute=0, second=0, microsecond=0)
+    if cursor >= now:
+        return balance, last_update
+    hours = 0
+    while cursor + timedelta(hours=1) <= now:
+        if original_is_office_work_time(cursor, start_hour or 8, end_hour or 19):
+            hours += 1
+        cursor += timedelta(hours=1)
+    return balance + hours * rate, cursor
+
+
+def random_window(rng: random.Random):
+    """Начало, конец и окно смены; примерно треть окон — «через ночь»."""
+    start = datetime(2023, 1, 1) + timedelta(hours=rng.randrange(5 * 365 * 24))
+    if rng.random() < 0.2:
+        # длинный разрыв — начисление «догоняет» месяцы простоя
+        span = timedelta(hours=rng.randrange(400 * 24))
+    else:
+        span = timedelta(hours=rng.randrange(96))
+    start_hour, end_hour = rng.randrange(24), rng.randrange(24)
+    return start, start + span, start_hour, end_hour
+
+
+def year_boundary_windows():
+    for year in (2023, 2024, 2025, 2026):
+        new_year = datetime(year + 1, 1, 1)
+        for start_hour, end_hour in ((8, 19), (22, 6), (20, 0), (6, 18), (23, 1)):
+            yield new_year - timedelta(hours=30), new_year + timedelta(hours=30), start_hour, end_hour
+
+
+def test_closed_form_matches_original_loop():
+    rng = random.Random(SEED)
+    calendar = WorkCalendar()
+    cases = [random_window(rng) for _ in range(CASES)] + list(year_boundary_windows())
+    for start, end, start_hour, end_hour in cases:
+        expected = original_hours(start, end, start_hour, end_hour)
+        got = calendar.working_hours_between(start, end, start_hour, end_hour)
+        assert got == expected, (start, end, start_hour, end_hour)
+
+
+def test_compute_accrual_matches_original_loop(monkeypatch):
+    monkeypatch.setattr(main, "WORK_CALENDAR", WorkCalendar())
+    rng = random.Random(SEED + 1)
+    for _ in range(CASES):
+        start, now, start_hour, end_hour = random_window(rng)
+        last_update = start + timedelta(minutes=rng.randrange(60))
+        rate = rng.randrange(1, 500)
+        expected_balance, expected_last = original_accrual(last_update, 1000, rate, start_hour, end_hour, now)
+
+        result = main.compute_accrual(last_update, 1000, main.int_to_money(1000), rate, start_hour, end_hour, None, now)
+        if result is None:
+            assert (expected_balance, expected_last) == (1000, last_update)
+            continue
+        balance, salary, new_last = result
+        assert (balance, new_last) == (expected_balance, expected_last)
+        assert salary == main.int_to_money(balance)
+
+
+@pytest.mark.parametrize(
+    "start_hour, end_hour, expected",
+    [
+        (8, 19, 55),   # Пн–Пт по 11 часов
+        (22, 6, 40),   # через ночь: часы относятся к своей календарной дате
+        (20, 0, 20),   # окно до полуночи
+        (9, 9, 0),     # пустое окно
+    ],
+)
+def test_plain_week(start_hour, end_hour, expected):
+    monday = datetime(2024, 6, 3)
+    got = WorkCalendar().working_hours_between(monday, monday + timedelta(days=7), start_hour, end_hour)
+    assert got == expected == original_hours(monday, monday + timedelta(days=7), start_hour, end_hour)
+
+
+# ---------- производственный календарь ----------
+
+def reference_day_kind(data: dict, day, warehouse=None) -> str:
+    kind = "full" if day.weekday() < 5 else "off"
+    entries = [(data.get("years") or {}).get(str(day.year)) or {}]
+    if warehouse in (data.get("warehouses") or {}):
+        entries.append(data["warehouses"][warehouse].get(str(day.year)) or {})
+    for entry in entries:
+        for key, value in (("holidays", "off"), ("workdays", "full"), ("short_days", "short")):
+            if day.isoformat() in (entry.get(key) or []):
+                kind = value
+    return kind
+
+
+def reference_hours(data: dict, start, end, start_hour, end_hour, warehouse=None) -> int:
+    """
+    Определение «по-человечески», час за часом: час рабочий, если он в окне
+    смены и его дата не выходной; в предпраздничный день сокращается смена,
+    которая в этот день НАЧАЛАСЬ, — её последний час.
+    """
+    last_hour = (end_hour - 1) % 24
+    spills = start_hour > end_hour and end_hour > 0
+    hours = 0
+    cursor = start
+    while cursor < end:
+        h, day = cursor.hour, cursor.date()
+        in_window = start_hour <= h < end_hour if start_hour <= end_hour else (h >= start_hour or h < end_hour)
+        if in_window and reference_day_kind(data, day, warehouse) != "off":
+            shift_day = day - timedelta(days=1) if spills and h < end_hour else day
+            if not (h == last_hour and reference_day_kind(data, shift_day, warehouse) == "short"):
+                hours += 1
+        cursor += timedelta(hours=1)
+    return hours
+
+
+SYNTHETIC_CALENDAR = {
+    "years": {
+        "2025": {
+            "holidays": ["2025-01-01", "2025-05-01"],
+            # четверг перед обычной рабочей пятницей — видно утро следующих суток
+            "short_days": ["2025-04-30", "2025-07-10", "2025-12-31"],
+        },
+        "2026": {"workdays": ["2026-01-01", "2026-01-03"]},
+    },
+    "warehouses": {
+        "Склад №2": {"2025": {"holidays": ["2025-07-11"], "short_days": ["2025-07-08"]}},
+    },
+}
+
+
+@pytest.mark.parametrize("data", [SYNTHETIC_CALENDAR, None], ids=["synthetic", "work_calendar.json"])
+@pytest.mark.parametrize("warehouse", [None, "Склад №2", "Челябинск · Склад №2"])
+def test_calendar_matches_reference(data, warehouse):
+    calendar = WorkCalendar(data) if data is not None else main.load_work_calendar()
+    data = data if data is not None else {"years": calendar._years, "warehouses": calendar._warehouses}
+    rng = random.Random(SEED + 7)
+    for _ in range(CASES // 3):
+        start = datetime(2024, 12, 1) + timedelta(hours=rng.randrange(760 * 24))
+        end = start + timedelta(hours=rng.randrange(24 * (60 if rng.random() < 0.2 else 4)))
+        start_hour, end_hour = rng.randrange(24), rng.randrange(24)
+        expected = reference_hours(data, start, end, start_hour, end_hour, warehouse)
+        got = calendar.working_hours_between(start, end, start_hour, end_hour, warehouse)
+        assert got == expected, (start, end, start_hour, end_hour, warehouse)
+
+
+@pytest.mark.parametrize(
+    "start, end, expected",
+    [
+        # смена 22–6, начатая в сокращённый четверг 10.07, кончается в 05:00 пятницы;
+        # утро самого четверга (смена среды) — полное
+        (datetime(2025, 7, 9, 22), datetime(2025, 7, 11, 6), 8 + 7),
+        # 30.04 перед праздником: утро 30.04 — хвост смены 29.04, не сокращается
+        (datetime(2025, 4, 29, 22), datetime(2025, 5, 1, 6), 2 + 6 + 2),
+        # 31.12 сокращённый, 01.01.2026 рабочий: последний час — уже в новом году
+        (datetime(2025, 12, 31, 22), datetime(2026, 1, 1, 6), 2 + 5),
+    ],
+)
+def test_short_day_shortens_overnight_shift_that_starts_on_it(start, end, expected):
+    calendar = WorkCalendar(SYNTHETIC_CALENDAR)
+    assert calendar.working_hours_between(start, end, 22, 6) == expected
+    assert not calendar.is_working_hour(datetime(2025, 7, 11, 5), 22, 6)
+    assert calendar.is_working_hour(datetime(2025, 7, 10, 5), 22, 6)
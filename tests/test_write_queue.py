@@ -0,0 +1,84 @@
+"""
+WriteQueue: таймаут ожидания снимает ещё не начатую операцию
+(WriteQueueTimeout, записи не будет), а начатую дожидается до конца.
+"""
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import main
+from write_queue import WriteQueue, WriteQueueTimeout
+
+
+@pytest.fixture
+def wq(tmp_path):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'wq.db').as_posix()}")
+    queue = WriteQueue(sessionmaker(bind=engine, expire_on_commit=False), max_wait_ms=0, result_timeout=0.2)
+    queue.start()
+    yield queue
+    queue.stop()
+    engine.dispose()
+
+
+def blocking_op(started: threading.Event, release: threading.Event, result="done"):
+    def op(session):
+        started.set()
+        release.wait(5)
+        return result
+    return op
+
+
+def test_queued_op_is_withdrawn_on_timeout(wq):
+    started, release = threading.Event(), threading.Event()
+    busy = wq.submit(blocking_op(started, release))
+    started.wait(5)
+    ran = []
+    with pytest.raises(WriteQueueTimeout):
+        wq.run(lambda session: ran.append(1))
+    release.set()
+    assert busy.result(5) == "done"
+    wq.run(lambda session: None)  # очередь разобрана
+    assert ran == []
+    assert wq.stats()["timeouts"] == 1
+
+
+def test_running_op_result_is_awaited_past_timeout(wq):
+    started, release = threading.Event(), threading.Event()
+    threading.Timer(0.5, release.set).start()
+    assert wq.run(blocking_op(started, release, "committed")) == "committed"
+    assert wq.stats()["timeouts"] == 0
+
+
+def test_async_paths(wq):
+    async def scenario():
+        started, release = threading.Event(), threading.Event()
+        busy = asyncio.ensure_future(wq.run_async(blocking_op(started, release)))
+        await asyncio.to_thread(started.wait, 5)
+        with pytest.raises(WriteQueueTimeout):
+            await wq.run_async(lambda session: "never")
+        release.set()
+        assert await busy == "done"
+
+        started, release = threading.Event(), threading.Event()
+        asyncio.get_running_loop().call_later(0.5, release.set)
+        assert await wq.run_async(blocking_op(started, release, "late")) == "late"
+
+    asyncio.run(scenario())
+
+
+def test_timeout_is_503_with_retry_after(monkeypatch):
+    def timeout(*args, **kwargs):
+        raise WriteQueueTimeout("busy")
+
+    with TestClient(main.app) as client:
+        monkeypatch.setattr(main.WRITE_QUEUE, "run", timeout)
+        response = client.post(
+            "/api/employees/1/payments", headers={"X-Admin-Login": "manager"}, json={"type": "bonus", "amount": 1}
+        )
+        monkeypatch.undo()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
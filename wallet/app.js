@@ -173,16 +173,78 @@ const isCoarsePointer = window.matchMedia("(pointer: coarse)").matches;
 const btnViewWallet = document.getElementById("btn-view-wallet");
 const btnViewCard = document.getElementById("btn-view-card");
 
-let adminAuth = null;       // { login, password }
+let adminAuth = null;       // { login, password, token }
 let adminCurrentId = null;  // id выбранного сотрудника (null = новый)
 let currentEmployeeMonths = []; // массив месяцев с бэка
-let employeeAuth = null;    // { login, password } для сотрудника
+let employeeAuth = null;    // { login, token } для сотрудника (или { login, password })
 let currentEmployeeId = null;
 
 // ===============================
 //          ВСПОМОГАТЕЛЬНЫЕ
 // ===============================
 
+// Заголовки для админских запросов: сессионный токен из /api/login,
+// а логин/пароль — только если токена нет
+function adminAuthHeaders(extra = {}) {
+  if (adminAuth && adminAuth.token) {
+    return { ...extra, Authorization: `Bearer ${adminAuth.token}` };
+  }
+  return {
+    ...extra,
+    "X-Admin-Login": adminAuth.login,
+    "X-Admin-Password": adminAuth.password,
+  };
+}
+
+function employeeAuthHeaders() {
+  const headers = { "Content-Type": "application/json" };
+  if (employeeAuth && employeeAuth.token) {
+    headers.Authorization = `Bearer ${employeeAuth.token}`;
+  }
+  return headers;
+}
+
+// Тело запроса сотрудника: с токеном пароль не отправляем
+function employeeAuthBody(extra = {}) {
+  if (employeeAuth && employeeAuth.token) return { ...extra };
+  return { login: employeeAuth.login, password: employeeAuth.password, ...extra };
+}
+
+// ===============================
+//   ETag-КЭШ ЧТЕНИЙ
+// ===============================
+// Ответ с ETag запоминаем; следующий такой же запрос уходит с If-None-Match,
+// и на 304 возвращаем сохранённое тело как обычный 200-ответ.
+const etagCache = new Map();
+
+function etagCacheKey(url, options = {}) {
+  return `${options.method || "GET"} ${url} ${options.body || ""}`;
+}
+
+async function storeEtagResponse(key, resp) {
+  const etag = resp.headers.get("ETag");
+  if (!resp.ok || !etag) return;
+  etagCache.set(key, {
+    etag,
+    body: await resp.clone().text(),
+    headers: Object.fromEntries(resp.headers.entries()),
+  });
+}
+
+async function fetchWithEtag(url, options = {}) {
+  const key = etagCacheKey(url, options);
+  const cached = etagCache.get(key);
+  const headers = { ...(options.headers || {}) };
+  if (cached) headers["If-None-Match"] = cached.etag;
+
+  const resp = await fetch(url, { ...options, headers });
+  if (resp.status === 304 && cached) {
+    return new Response(cached.body, { status: 200, headers: cached.headers });
+  }
+  await storeEtagResponse(key, resp);
+  return resp;
+}
+
 function formatRub(num) {
   if (num == null) return "—";
   const n = Number(num) || 0;
@@ -308,7 +370,43 @@ function setEmployeeCardMode(mode) {
   if (cardCancelBtn) cardCancelBtn.style.display = isEdit ? "inline-flex" : "none";
 }
 
-function renderEmployeeCardHistory(history) {
+// правка карточки: для списков — что добавлено/удалено, для статуса — было/стало
+function cardHistoryItem(item) {
+  const li = document.createElement("li");
+  const lines = [
+    `<div><strong>${item.timestamp || ""}</strong></div>`,
+    `<div>Поле: <strong>${item.field || ""}</strong></div>`,
+  ];
+  if (item.field === "status") {
+    lines.push(`<div>Было: ${item.old ?? "—"}</div>`, `<div>Стало: ${item.new ?? "—"}</div>`);
+  } else {
+    if (item.added && item.added.length) lines.push(`<div>Добавлено: ${item.added.join(", ")}</div>`);
+    if (item.removed && item.removed.length) lines.push(`<div>Удалено: ${item.removed.join(", ")}</div>`);
+  }
+  li.innerHTML = lines.join("");
+  return li;
+}
+
+// «Показать ещё» в конце списка: старые правки с /api/employee/card/history
+function renderCardHistoryMore(cursor) {
+  const old = cardHistoryList.querySelector(".history-more");
+  if (old) old.remove();
+  if (!cursor) return;
+
+  const li = document.createElement("li");
+  li.className = "history-empty history-more";
+  li.innerHTML = `<button type="button" class="btn-small">Показать ещё</button>`;
+  const btn = li.querySelector("button");
+  btn.addEventListener("click", () => {
+    btn.disabled = true;
+    btn.textContent = "Загрузка...";
+    loadEmployeeCardHistoryPage(cursor);
+  });
+  cardHistoryList.appendChild(li);
+}
+
+// history — последние правки (старые -> новые), cursor — если есть правки старше
+function renderEmployeeCardHistory(history, cursor) {
   if (!cardHistoryList) return;
 
   cardHistoryList.innerHTML = "";
@@ -324,21 +422,38 @@ function renderEmployeeCardHistory(history) {
   history
     .slice()
     .reverse()
-    .forEach(item => {
-      const li = document.createElement("li");
-      const ts = item.timestamp || "";
-      const field = item.field || "";
-      const oldVal = item.old ?? "—";
-      const newVal = item.new ?? "—";
-
-      li.innerHTML =
-        `<div><strong>${ts}</strong></div>` +
-        `<div>Поле: <strong>${field}</strong></div>` +
-        `<div>Было: ${oldVal}</div>` +
-        `<div>Стало: ${newVal}</div>`;
-
-      cardHistoryList.appendChild(li);
+    .forEach(item => cardHistoryList.appendChild(cardHistoryItem(item)));
+  renderCardHistoryMore(cursor);
+}
+
+async function loadEmployeeCardHistoryPage(cursor) {
+  if (!employeeAuth || !cardHistoryList) return;
+
+  try {
+    const resp = await fetchWithEtag(`${API_BASE}/api/employee/card/history`, {
+      method: "POST",
+      headers: employeeAuthHeaders(),
+      body: JSON.stringify(employeeAuthBody({ cursor })),
     });
+    if (resp.status === 401) {
+      doLogout();
+      return;
+    }
+    if (!resp.ok) {
+      console.error("Не удалось загрузить историю карточки", await resp.text());
+      renderCardHistoryMore(cursor);
+      return;
+    }
+
+    const list = await resp.json();
+    const more = cardHistoryList.querySelector(".history-more");
+    if (more) more.remove();
+    list.forEach(item => cardHistoryList.appendChild(cardHistoryItem(item)));
+    renderCardHistoryMore(resp.headers.get("X-Next-Cursor"));
+  } catch (e) {
+    console.error("Ошибка загрузки истории карточки:", e);
+    renderCardHistoryMore(cursor);
+  }
 }
 
 function applyEmployeeCard(card) {
@@ -373,23 +488,24 @@ function applyEmployeeCard(card) {
     cardRolesInput.value = (card.roles || []).join("\n");
   }
 
-  renderEmployeeCardHistory(card.history || []);
+  renderEmployeeCardHistory(card.history || [], card.history_cursor);
   setEmployeeCardMode("view");
 }
 
 async function loadEmployeeCardSelf() {
-  if (!employeeAuth || !employeeAuth.login || !employeeAuth.password) return;
+  if (!employeeAuth) return;
 
   try {
-    const resp = await fetch(`${API_BASE}/api/employee/card`, {
+    const resp = await fetchWithEtag(`${API_BASE}/api/employee/card`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        login: employeeAuth.login,
-        password: employeeAuth.password,
-      }),
+      headers: employeeAuthHeaders(),
+      body: JSON.stringify(employeeAuthBody()),
     });
 
+    if (resp.status === 401) {
+      doLogout();
+      return;
+    }
     if (!resp.ok) {
       console.error("Не удалось получить карточку сотрудника", await resp.text());
       return;
@@ -403,7 +519,7 @@ async function loadEmployeeCardSelf() {
 }
 
 async function saveEmployeeCard() {
-  if (!employeeAuth || !employeeAuth.login || !employeeAuth.password) return;
+  if (!employeeAuth) return;
 
   const responsibilities = splitLines(cardResponsibilitiesInput?.value || "");
   const skills = splitLines(cardSkillsInput?.value || "");
@@ -415,15 +531,13 @@ async function saveEmployeeCard() {
   try {
     const resp = await fetch(`${API_BASE}/api/employee/card/update`, {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        login: employeeAuth.login,
-        password: employeeAuth.password,
+      headers: employeeAuthHeaders(),
+      body: JSON.stringify(employeeAuthBody({
         responsibilities,
         skills,
         roles,
         status,
-      }),
+      })),
     });
 
     if (!resp.ok) {
@@ -432,6 +546,14 @@ async function saveEmployeeCard() {
       return;
     }
 
+    // ответ — уже новая карточка со своим ETag: следующая загрузка получит 304
+    await storeEtagResponse(
+      etagCacheKey(`${API_BASE}/api/employee/card`, {
+        method: "POST",
+        body: JSON.stringify(employeeAuthBody()),
+      }),
+      resp,
+    );
     const card = await resp.json();
     applyEmployeeCard(card);
   } catch (e) {
@@ -504,6 +626,7 @@ function doLogout() {
   adminCurrentId = null;
   employeeAuth = null;
   currentEmployeeId = null;
+  etagCache.clear();
   showLogin();
 }
 
@@ -534,7 +657,9 @@ document.addEventListener("DOMContentLoaded", () => {
   try {
     const user = JSON.parse(stored);
     if (user.role === "employee") {
-      if (user.password) {
+      if (user.token) {
+        employeeAuth = { login: user.login, token: user.token };
+      } else if (user.password) {
         employeeAuth = { login: user.login, password: user.password };
       }
       applyEmployee(user.data, user.login);
@@ -581,12 +706,13 @@ async function handleLogin() {
     const json = await resp.json();
 
     if (json.role === "employee") {
-      employeeAuth = { login, password };
-      const stored = { ...json, password };
+      employeeAuth = json.token ? { login, token: json.token } : { login, password };
+      // пароль в localStorage больше не храним — только токен сессии
+      const stored = json.token ? { ...json } : { ...json, password };
       localStorage.setItem("lw_user", JSON.stringify(stored));
       applyEmployee(json.data, json.login);
     } else if (json.role === "admin") {
-      applyAdmin(json.login, password);
+      applyAdmin(json.login, password, json.token);
     }
     loginError.style.display = "none";
   } catch (e) {
@@ -789,6 +915,40 @@ function applyEmployee(user, login) {
 //   ИСТОРИЯ БАЛАНСА (модалка)
 // ===============================
 
+const PAYMENTS_PAGE_SIZE = 50;
+
+// строка «Показать ещё» в конце таблицы; cursor — из X-Next-Cursor
+function renderLoadMoreRow(tbody, colspan, cursor, onLoadMore) {
+  const old = tbody.querySelector(".load-more-row");
+  if (old) old.remove();
+  if (!cursor) return;
+
+  const tr = document.createElement("tr");
+  tr.className = "load-more-row";
+  tr.innerHTML = `
+    <td colspan="${colspan}" class="balance-history-empty">
+      <button type="button" class="btn-small">Показать ещё</button>
+    </td>
+  `;
+  const btn = tr.querySelector("button");
+  btn.addEventListener("click", () => {
+    btn.disabled = true;
+    btn.textContent = "Загрузка...";
+    onLoadMore(cursor);
+  });
+  tbody.appendChild(tr);
+}
+
+function formatPaymentDate(value) {
+  return new Date(value).toLocaleString("ru-RU", {
+    day: "2-digit",
+    month: "2-digit",
+    year: "numeric",
+    hour: "2-digit",
+    minute: "2-digit",
+  });
+}
+
 function openBalanceHistory() {
   if (!employeeAuth || !currentEmployeeId) return;
   balanceHistoryOverlay.style.display = "flex";
@@ -801,15 +961,22 @@ function openBalanceHistory() {
   balanceHistoryBody.innerHTML =
     `<tr><td colspan="4" class="balance-history-empty">Загрузка...</td></tr>`;
 
-  fetch(`${API_BASE}/api/employee/payments`, {
+  loadBalanceHistoryPage(null);
+}
+
+// одна страница истории; cursor = null — первая страница
+function loadBalanceHistoryPage(cursor) {
+  fetchWithEtag(`${API_BASE}/api/employee/payments`, {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({
-      login: employeeAuth.login,
-      password: employeeAuth.password,
-    }),
+    headers: employeeAuthHeaders(),
+    body: JSON.stringify(employeeAuthBody({ cursor, limit: PAYMENTS_PAGE_SIZE })),
   })
     .then(async (resp) => {
+      if (resp.status === 401) {
+        closeBalanceHistory();
+        doLogout();
+        return;
+      }
       if (!resp.ok) {
         const err = await resp.json().catch(() => ({}));
         console.error("Ошибка загрузки истории баланса", err);
@@ -818,33 +985,30 @@ function openBalanceHistory() {
         return;
       }
       const list = await resp.json();
-      if (!Array.isArray(list) || !list.length) {
-        balanceHistoryBody.innerHTML =
-          `<tr><td colspan="4" class="balance-history-empty">Операций пока нет</td></tr>`;
-        return;
+      const nextCursor = resp.headers.get("X-Next-Cursor");
+
+      if (!cursor) {
+        if (!Array.isArray(list) || !list.length) {
+          balanceHistoryBody.innerHTML =
+            `<tr><td colspan="4" class="balance-history-empty">Операций пока нет</td></tr>`;
+          return;
+        }
+        balanceHistoryBody.innerHTML = "";
       }
 
-      balanceHistoryBody.innerHTML = "";
       list.forEach((p) => {
         const tr = document.createElement("tr");
-        const dt = new Date(p.created_at);
-        const dateStr = dt.toLocaleString("ru-RU", {
-          day: "2-digit",
-          month: "2-digit",
-          year: "numeric",
-          hour: "2-digit",
-          minute: "2-digit",
-        });
-
         const amountStr = formatRub(p.amount);
         tr.innerHTML = `
-          <td>${dateStr}</td>
+          <td>${formatPaymentDate(p.created_at)}</td>
           <td>${p.type}</td>
           <td style="text-align:right;">${amountStr}</td>
           <td>${p.comment || ""}</td>
         `;
         balanceHistoryBody.appendChild(tr);
       });
+
+      renderLoadMoreRow(balanceHistoryBody, 4, nextCursor, loadBalanceHistoryPage);
     })
     .catch((e) => {
       console.error(e);
@@ -876,8 +1040,8 @@ if (balanceHistoryOverlay) {
 //       ADMIN / АДМИНКА
 // ===============================
 
-function applyAdmin(login, password) {
-  adminAuth = { login, password };
+function applyAdmin(login, password, token) {
+  adminAuth = { login, password, token };
   topUserInfo.innerHTML = `Вы вошли как администратор <strong>${login}</strong>`;
   adminCurrentId = null;
   clearAdminForm();
@@ -947,10 +1111,7 @@ if (admPhotoUploadBtn && admPhotoFile) {
     try {
       const resp = await fetch(`${API_BASE}/api/employees/${adminCurrentId}/photo`, {
         method: "POST",
-        headers: {
-          "X-Admin-Login": adminAuth.login,
-          "X-Admin-Password": adminAuth.password,
-        },
+        headers: adminAuthHeaders(),
         body: formData,
       });
 
@@ -1114,11 +1275,7 @@ if (adminSaveBtn) {
 
       const resp = await fetch(url, {
         method,
-        headers: {
-          "Content-Type": "application/json",
-          "X-Admin-Login": adminAuth.login,
-          "X-Admin-Password": adminAuth.password,
-        },
+        headers: adminAuthHeaders({ "Content-Type": "application/json" }),
         body: JSON.stringify(payloadBase),
       });
 
@@ -1152,10 +1309,7 @@ if (adminExportBtn) {
 
       const resp = await fetch(url, {
         method: "GET",
-        headers: {
-          "X-Admin-Login": adminAuth.login,
-          "X-Admin-Password": adminAuth.password,
-        },
+        headers: adminAuthHeaders(),
       });
 
       if (!resp.ok) {
@@ -1191,10 +1345,7 @@ if (adminDeleteBtn) {
     try {
       const resp = await fetch(`${API_BASE}/api/employees/${adminCurrentId}`, {
         method: "DELETE",
-        headers: {
-          "X-Admin-Login": adminAuth.login,
-          "X-Admin-Password": adminAuth.password,
-        },
+        headers: adminAuthHeaders(),
       });
 
       if (!resp.ok) {
@@ -1222,11 +1373,8 @@ async function loadEmployees() {
     '<tr><td colspan="6" class="admin-table-empty">Загрузка...</td></tr>';
 
   try {
-    const resp = await fetch(`${API_BASE}/api/employees`, {
-      headers: {
-        "X-Admin-Login": adminAuth.login,
-        "X-Admin-Password": adminAuth.password,
-      },
+    const resp = await fetchWithEtag(`${API_BASE}/api/employees`, {
+      headers: adminAuthHeaders(),
     });
 
     if (!resp.ok) {
@@ -1277,11 +1425,7 @@ async function loadEmployees() {
           try {
             const resp = await fetch(`${API_BASE}/api/employees/${emp.id}`, {
               method: "PUT",
-              headers: {
-                "Content-Type": "application/json",
-                "X-Admin-Login": adminAuth.login,
-                "X-Admin-Password": adminAuth.password,
-              },
+              headers: adminAuthHeaders({ "Content-Type": "application/json" }),
               body: JSON.stringify({ on_shift: checked }),
             });
 
@@ -1315,11 +1459,8 @@ async function loadEmployeeDetails(id) {
   if (!adminAuth) return;
 
   try {
-    const resp = await fetch(`${API_BASE}/api/employees/${id}`, {
-      headers: {
-        "X-Admin-Login": adminAuth.login,
-        "X-Admin-Password": adminAuth.password,
-      },
+    const resp = await fetchWithEtag(`${API_BASE}/api/employees/${id}`, {
+      headers: adminAuthHeaders(),
     });
 
     if (!resp.ok) {
@@ -1382,17 +1523,18 @@ function fillAdminForm(emp) {
 
 // Платежи / история начислений в админке
 
-async function loadPaymentsForEmployee(empId) {
+async function loadPaymentsForEmployee(empId, cursor = null) {
   if (!adminAuth || empId == null) return;
-  paymentsTableBody.innerHTML =
-    '<tr><td colspan="5" class="admin-table-empty">Загрузка...</td></tr>';
+  if (!cursor) {
+    paymentsTableBody.innerHTML =
+      '<tr><td colspan="5" class="admin-table-empty">Загрузка...</td></tr>';
+  }
 
   try {
-    const resp = await fetch(`${API_BASE}/api/employees/${empId}/payments`, {
-      headers: {
-        "X-Admin-Login": adminAuth.login,
-        "X-Admin-Password": adminAuth.password,
-      },
+    const params = new URLSearchParams({ limit: String(PAYMENTS_PAGE_SIZE) });
+    if (cursor) params.set("cursor", cursor);
+    const resp = await fetchWithEtag(`${API_BASE}/api/employees/${empId}/payments?${params}`, {
+      headers: adminAuthHeaders(),
     });
 
     if (!resp.ok) {
@@ -1403,27 +1545,22 @@ async function loadPaymentsForEmployee(empId) {
     }
 
     const list = await resp.json();
-    if (!Array.isArray(list) || !list.length) {
-      paymentsTableBody.innerHTML =
-        '<tr><td colspan="5" class="admin-table-empty">Операций пока нет</td></tr>';
-      return;
+    const nextCursor = resp.headers.get("X-Next-Cursor");
+
+    if (!cursor) {
+      if (!Array.isArray(list) || !list.length) {
+        paymentsTableBody.innerHTML =
+          '<tr><td colspan="5" class="admin-table-empty">Операций пока нет</td></tr>';
+        return;
+      }
+      paymentsTableBody.innerHTML = "";
     }
 
-    paymentsTableBody.innerHTML = "";
     list.forEach(p => {
       const tr = document.createElement("tr");
-      const dt = new Date(p.created_at);
-      const dateStr = dt.toLocaleString("ru-RU", {
-        day: "2-digit",
-        month: "2-digit",
-        year: "numeric",
-        hour: "2-digit",
-        minute: "2-digit",
-      });
-
       const amountStr = formatRub(p.amount);
       tr.innerHTML = `
-        <td>${dateStr}</td>
+        <td>${formatPaymentDate(p.created_at)}</td>
         <td>${p.type}</td>
         <td style="text-align:right;">${amountStr}</td>
         <td>${p.comment || ""}</td>
@@ -1437,6 +1574,10 @@ async function loadPaymentsForEmployee(empId) {
 
       paymentsTableBody.appendChild(tr);
     });
+
+    renderLoadMoreRow(paymentsTableBody, 5, nextCursor, next =>
+      loadPaymentsForEmployee(empId, next)
+    );
   } catch (e) {
     console.error(e);
     paymentsTableBody.innerHTML =
@@ -1451,10 +1592,7 @@ async function deletePayment(empId, paymentId) {
   try {
     const resp = await fetch(`${API_BASE}/api/employees/${empId}/payments/${paymentId}`, {
       method: "DELETE",
-      headers: {
-        "X-Admin-Login": adminAuth.login,
-        "X-Admin-Password": adminAuth.password,
-      },
+      headers: adminAuthHeaders(),
     });
 
     if (!resp.ok) {
@@ -1490,11 +1628,7 @@ if (payAddBtn) {
     try {
       const resp = await fetch(`${API_BASE}/api/employees/${adminCurrentId}/payments`, {
         method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-          "X-Admin-Login": adminAuth.login,
-          "X-Admin-Password": adminAuth.password,
-        },
+        headers: adminAuthHeaders({ "Content-Type": "application/json" }),
         body: JSON.stringify({ type, amount, comment }),
       });
 
@@ -0,0 +1,206 @@
+"""
+Производственный календарь для расчёта рабочих часов.
+
+Данные — work_calendar.json (путь можно переопределить LW_WORK_CALENDAR):
+{
+  "years": {
+    "2025": {
+      "holidays":   ["2025-01-01", ...],   # нерабочие будни (праздники, переносы)
+      "workdays":   ["2025-11-01"],        # рабочие выходные (переносы)
+      "short_days": ["2025-03-07", ...]    # предпраздничные: на час короче
+    }
+  },
+  "warehouses": {
+    "Челябинск · Склад №1": {
+      "2025": { "holidays": [...], "workdays": [...], "short_days": [...] }
+    }
+  }
+}
+Для года без данных действует обычное правило «Пн–Пт рабочие».
+Переопределения склада применяются поверх общего календаря.
+
+Для каждой комбинации (год, окно смены, склад) один раз строится битовая
+карта часов года и префиксные суммы по ней, после чего «сколько рабочих
+часов между t1 и t2» — две выборки из массива на каждый затронутый год.
+"""
+import json
+import os
+import threading
+from array import array
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+BASE_DIR = Path(__file__).resolve().parent
+WORK_CALENDAR_JSON = Path(os.getenv("LW_WORK_CALENDAR", str(BASE_DIR / "work_calendar.json")))
+
+# одна таблица ≈ 44 КБ (8784 часа: байт карты + 4 байта префикса)
+MAX_CACHED_TABLES = 256
+
+DAY_OFF = 0
+DAY_FULL = 1
+DAY_SHORT = 2
+
+
+def window_hours(start_hour: int, end_hour: int) -> Tuple[int, ...]:
+    """
+    Часы суток, входящие в окно смены [start_hour, end_hour).
+    Если start_hour > end_hour — смена «через ночь».
+    """
+    if start_hour <= end_hour:
+        return tuple(range(start_hour, end_hour))
+    return tuple(h for h in range(24) if h >= start_hour or h < end_hour)
+
+
+class WorkCalendar:
+    def __init__(self, data: Optional[dict] = None):
+        data = data or {}
+        self._years: Dict[str, dict] = data.get("years") or {}
+        self._warehouses: Dict[str, dict] = data.get("warehouses") or {}
+        self._prefix_cache: Dict[tuple, Tuple[bytes, array]] = {}
+        self._lock = threading.Lock()
+
+    # ---------- типы дней ----------
+
+    def day_kinds(self, year: int, warehouse: Optional[str] = None) -> bytearray:
+        """Тип каждого дня года: DAY_OFF / DAY_FULL / DAY_SHORT."""
+        first = date(year, 1, 1)
+        n_days = (date(year + 1, 1, 1) - first).days
+        kinds = bytearray(
+            DAY_FULL if (first + timedelta(days=i)).weekday() < 5 else DAY_OFF
+            for i in range(n_days)
+        )
+
+        overrides = [self._years.get(str(year)) or {}]
+        if warehouse and warehouse in self._warehouses:
+            overrides.append(self._warehouses[warehouse].get(str(year)) or {})
+
+        for entry in overrides:
+            for key, kind in (
+                ("holidays", DAY_OFF),
+                ("workdays", DAY_FULL),
+                ("short_days", DAY_SHORT),
+            ):
+                for raw in entry.get(key) or []:
+                    d = date.fromisoformat(raw)
+                    if d.year == year:
+                        kinds[(d - first).days] = kind
+        return kinds
+
+    def _warehouse_key(self, warehouse: Optional[str]) -> Optional[str]:
+        # склады без своих правил делят кэш с общим календарём
+        return warehouse if warehouse in self._warehouses else None
+
+    def _year_tables(
+        self, year: int, start_hour: int, end_hour: int, warehouse: Optional[str]
+    ) -> Tuple[bytes, array]:
+        """
+        (битовая карта часов года, префиксные суммы).
+        prefix[i] — число рабочих часов среди первых i часов года.
+        """
+        key = (year, start_hour, end_hour, self._warehouse_key(warehouse))
+        cached = self._prefix_cache.get(key)
+        if cached is not None:
+            return cached
+
+        hours = window_hours(start_hour, end_hour)
+        full_mask = bytearray(24)
+        for h in hours:
+            full_mask[h] = 1
+        # в сокращённый день смена заканчивается на час раньше; у смены
+        # «через ночь» этот час — уже утро следующих суток
+        last_hour = (end_hour - 1) % 24
+        spills = start_hour > end_hour and end_hour > 0
+        short_mask = bytearray(full_mask)
+        if hours and not spills:
+            short_mask[last_hour] = 0
+        off_mask = bytes(24)
+
+        kinds = self.day_kinds(year, key[3])
+        bitmap = bytearray()
+        for kind in kinds:
+            if kind == DAY_FULL:
+                bitmap += full_mask
+            elif kind == DAY_SHORT:
+                bitmap += short_mask
+            else:
+                bitmap += off_mask
+
+        if hours and spills:
+            # смена, начатая 31 декабря прошлого года, кончается 1 января этого
+            if self.day_kinds(year - 1, key[3])[-1] == DAY_SHORT:
+                bitmap[last_hour] = 0
+            for day, kind in enumerate(kinds[:-1]):
+                if kind == DAY_SHORT:
+                    bitmap[(day + 1) * 24 + last_hour] = 0
+
+        prefix = array("I", [0])
+        total = 0
+        for bit in bitmap:
+            total += bit
+            prefix.append(total)
+
+        tables = (bytes(bitmap), prefix)
+        with self._lock:
+            while len(self._prefix_cache) >= MAX_CACHED_TABLES:
+                self._prefix_cache.pop(next(iter(self._prefix_cache)))
+            self._prefix_cache[key] = tables
+        return tables
+
+    # ---------- запросы ----------
+
+    def hour_bitmap(
+        self, year: int, start_hour: int, end_hour: int, warehouse: Optional[str] = None
+    ) -> bytes:
+        """Битовая карта часов года: 1 байт на час, 1 — рабочий."""
+        bitmap, _ = self._year_tables(year, start_hour, end_hour, warehouse)
+        return bitmap
+
+    def is_working_hour(
+        self, moment: datetime, start_hour: int, end_hour: int, warehouse: Optional[str] = None
+    ) -> bool:
+        bitmap, _ = self._year_tables(moment.year, start_hour, end_hour, warehouse)
+        return bool(bitmap[_hour_of_year(moment)])
+
+    def working_hours_between(
+        self,
+        start: datetime,
+        end: datetime,
+        start_hour: int,
+        end_hour: int,
+        warehouse: Optional[str] = None,
+    ) -> int:
+        """
+        Рабочие часы-слоты в [start, end); start/end выровнены по часу.
+        """
+        if end <= start:
+            return 0
+        total = 0
+        for year in range(start.year, end.year + 1):
+            _, prefix = self._year_tables(year, start_hour, end_hour, warehouse)
+            lo = _hour_of_year(start) if year == start.year else 0
+            hi = _hour_of_year(end) if year == end.year else len(prefix) - 1
+            total += prefix[hi] - prefix[lo]
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "years": sorted(self._years),
+            "warehouses": sorted(self._warehouses),
+            "cached_tables": len(self._prefix_cache),
+        }
+
+
+def _hour_of_year(moment: datetime) -> int:
+    return (moment.timetuple().tm_yday - 1) * 24 + moment.hour
+
+
+def load_work_calendar(path: Path = WORK_CALENDAR_JSON) -> WorkCalendar:
+    if not path.exists():
+        return WorkCalendar()
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return WorkCalendar(json.load(f))
+    except Exception:
+        return WorkCalendar()
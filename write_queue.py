@@ -0,0 +1,277 @@
+"""
+Очередь записи с групповым коммитом (group commit) для SQLite.
+
+SQLite пускает одного писателя, а каждый пишущий запрос открывал свою
+транзакцию и коммитил сам: при всплеске действий админов запросы стояли
+в очереди на блокировке базы и падали по busy_timeout. Здесь всю запись
+делает один поток-писатель. Операции разных запросов (функции от Session)
+собираются в пачку — до max_batch штук или max_wait_ms ожидания — и
+выполняются в одной транзакции, каждая в своём SAVEPOINT:
+
+  - ошибка операции откатывает только её SAVEPOINT и возвращается её
+    вызывающему, остальные операции пачки коммитятся;
+  - ошибка самого COMMIT возвращается всем операциям пачки.
+
+Вызывающий получает Future со своим результатом (run блокирует поток
+запроса, run_async — await). Если за result_timeout операция так и не
+началась, она снимается с очереди и вызывающий получает WriteQueueTimeout —
+запись гарантированно не случится, запрос можно повторить. Начавшуюся
+операцию дожидаются до конца: отказ после неё означал бы «ошибку» у уже
+закоммиченного платежа и дубль при повторе. Пока писатель не запущен
+(скрипты, бенчмарки, LW_WRITE_QUEUE=0), run выполняет операцию сразу на
+переданной сессии.
+Операции не должны коммитить сами и не должны делать тяжёлую работу
+(argon2 и т.п.) — её считают до постановки в очередь.
+"""
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+WriteOp = Callable[[Session], Any]
+
+
+class WriteQueueTimeout(RuntimeError):
+    """Операция не дождалась писателя и снята с очереди — записи не было."""
+
+
+class _Pending:
+    __slots__ = ("fn", "future", "enqueued")
+
+    def __init__(self, fn: WriteOp):
+        self.fn = fn
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class WriteQueue:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_batch: int = 64,
+        max_wait_ms: float = 2.0,
+        result_timeout: float = 30.0,
+        begin_sql: Optional[str] = "BEGIN IMMEDIATE",
+        name: str = "write-queue",
+    ):
+        # session_factory — с expire_on_commit=False: результаты операций
+        # (ORM-объекты) читаются вызывающим уже после коммита в другом потоке
+        self._session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.result_timeout = result_timeout
+        self._begin_sql = begin_sql
+        self._name = name
+        self._queue: "queue.Queue[Optional[_Pending]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._commit_ms: deque = deque(maxlen=1024)
+        self._wait_ms: deque = deque(maxlen=1024)
+        self._counters = {
+            "ops": 0,
+            "op_errors": 0,
+            "batches": 0,
+            "commit_failures": 0,
+            "timeouts": 0,
+            "max_batch_size": 0,
+            "last_batch_size": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Дописывает уже поставленные операции и останавливает писателя."""
+        if not self.running:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ===============================
+    #          ПОСТАНОВКА
+    # ===============================
+
+    def submit(self, fn: WriteOp) -> Future:
+        pending = _Pending(fn)
+        self._queue.put(pending)
+        return pending.future
+
+    def run(self, fn: WriteOp, db: Optional[Session] = None) -> Any:
+        """
+        Выполнить операцию записи и вернуть её результат (или поднять её ошибку).
+        Без запущенного писателя — сразу на db (или новой сессии) со своим коммитом.
+        """
+        if self.running:
+            future = self.submit(fn)
+            try:
+                return future.result(self.result_timeout)
+            except FutureTimeoutError:
+                self._withdraw(future)
+                return future.result()
+        if db is None:
+            with self._session_factory() as session:
+                return self._run_inline(fn, session)
+        return self._run_inline(fn, db)
+
+    async def run_async(self, fn: WriteOp) -> Any:
+        if self.running:
+            future = self.submit(fn)
+            waiter = asyncio.wrap_future(future)
+            try:
+                # shield: отмена по таймауту не должна сама снимать операцию
+                return await asyncio.wait_for(asyncio.shield(waiter), self.result_timeout)
+            except asyncio.TimeoutError:
+                self._withdraw(future)
+                return await waiter
+        return await asyncio.to_thread(self.run, fn)
+
+    def _withdraw(self, future: Future) -> None:
+        """
+        Таймаут ожидания: снимаем операцию, если писатель её ещё не взял
+        (WriteQueueTimeout). Иначе она уже выполняется — вызывающий ждёт
+        её настоящий результат.
+        """
+        if future.cancel():
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise WriteQueueTimeout(f"операция ждала писателя дольше {self.result_timeout} с")
+
+    @staticmethod
+    def _run_inline(fn: WriteOp, db: Session) -> Any:
+        try:
+            result = fn(db)
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        return result
+
+    # ===============================
+    #           ПИСАТЕЛЬ
+    # ===============================
+
+    def _collect(self, first: _Pending) -> tuple:
+        """Пачка: всё, что уже ждёт, плюс то, что успеет прийти за max_wait."""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        stopping = False
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+        return batch, stopping
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = self._collect(first)
+            self._commit_batch(batch)
+            if stopping:
+                return
+
+    def _commit_batch(self, batch: List[_Pending]) -> None:
+        started = time.perf_counter()
+        done: List[tuple] = []
+        failed = 0
+        with self._session_factory() as session:
+            try:
+                if self._begin_sql:
+                    # pysqlite сам не открывает транзакцию под SAVEPOINT; без явного
+                    # BEGIN первый RELEASE закоммитил бы операцию отдельно
+                    session.execute(text(self._begin_sql))
+                for pending in batch:
+                    if not pending.future.set_running_or_notify_cancel():
+                        continue
+                    savepoint = session.begin_nested()
+                    try:
+                        result = pending.fn(session)
+                        session.flush()
+                        savepoint.commit()
+                        done.append((pending, result, None))
+                    except Exception as exc:
+                        savepoint.rollback()
+                        failed += 1
+                        done.append((pending, None, exc))
+                commit_started = time.perf_counter()
+                session.commit()
+                commit_ms = (time.perf_counter() - commit_started) * 1000
+            except Exception as exc:
+                session.rollback()
+                with self._lock:
+                    self._counters["commit_failures"] += 1
+                for pending, _, error in done:
+                    pending.future.set_exception(error or exc)
+                for pending in batch[len(done):]:
+                    if not pending.future.done():
+                        pending.future.set_exception(exc)
+                return
+
+        for pending, result, error in done:
+            if error is not None:
+                pending.future.set_exception(error)
+            else:
+                pending.future.set_result(result)
+
+        with self._lock:
+            self._counters["ops"] += len(done)
+            self._counters["op_errors"] += failed
+            self._counters["batches"] += 1
+            self._counters["last_batch_size"] = len(batch)
+            self._counters["max_batch_size"] = max(self._counters["max_batch_size"], len(batch))
+            self._commit_ms.append(commit_ms)
+            self._wait_ms.extend((started - p.enqueued) * 1000 for p in batch)
+
+    # ===============================
+    #            МЕТРИКИ
+    # ===============================
+
+    @staticmethod
+    def _percentiles(values) -> dict:
+        if not values:
+            return {"p50": None, "p99": None, "max": None}
+        ordered = sorted(values)
+        return {
+            "p50": round(ordered[len(ordered) // 2], 2),
+            "p99": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 2),
+            "max": round(ordered[-1], 2),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            commit_ms = list(self._commit_ms)
+            wait_ms = list(self._wait_ms)
+        batches = counters["batches"]
+        return {
+            "running": self.running,
+            "pending": self._queue.qsize(),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            **counters,
+            "avg_batch_size": round(counters["ops"] / batches, 2) if batches else None,
+            "commit_ms": self._percentiles(commit_ms),
+            "queue_wait_ms": self._percentiles(wait_ms),
+        }